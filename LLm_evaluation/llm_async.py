@@ -0,0 +1,191 @@
+import asyncio
+import random
+import sys
+import time
+
+import openai
+
+from llm_backends import DEFAULT_MODEL
+from llm_cache import replaying, request_key
+from llm_eval import MAX_TOKENS, TEMPERATURE, prepare_code, render_messages, rubric_name
+from llm_results import ScoreStream, extract_score
+from llm_rubrics import combined_params, parse_combined, render_combined_messages, section_row, stream_row
+
+# statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+# Token bucket refilled continuously at rate_per_minute; acquire() waits until enough budget is available.
+# Used for both requests per minute (amount=1) and tokens per minute (amount=estimated tokens).
+class TokenBucket:
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+# rough prompt size in tokens (~4 characters per token) plus the completion budget
+def estimate_tokens(messages, max_tokens):
+    return sum(len(m["content"]) for m in messages) // 4 + max_tokens
+
+
+# Runs rubric evaluations concurrently: at most `concurrency` requests in flight, optional rpm/tpm
+# token buckets, and retries with jittered exponential backoff on 429/5xx and connection errors.
+class AsyncEvaluator:
+    # stream=None waits for full answers; "until_score" streams and stops once the score is out,
+    # "full" streams the whole rationale. until_score answers are cached as cut off, under their own key.
+    def __init__(self, client, model=DEFAULT_MODEL, endpoint=None, concurrency=8, rpm=None, tpm=None, cache=None, stream=None,
+                 max_tokens=MAX_TOKENS, temperature=TEMPERATURE, max_retries=6, backoff=1.0, max_backoff=60.0):
+        self.client = client
+        self.stream = stream
+        self.cache = cache
+        self.model = model
+        # names the server in cache keys, see Backend.endpoint
+        self.endpoint = endpoint
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retries = 0
+
+    async def complete(self, messages, **params):
+        params.setdefault("max_tokens", self.max_tokens)
+        if self.cache is None:
+            return await self.request(messages, **params)
+        key_params = dict(params)
+        if key_params.get("stream"):
+            key_params["stream"] = self.stream
+        key = request_key(self.model, messages, endpoint=self.endpoint, temperature=self.temperature, **key_params)
+        content = self.cache.get(key)
+        if content is None:
+            content = await self.request(messages, **params)
+            self.cache.put(key, self.model, content)
+        return content
+
+    async def request(self, messages, **params):
+        for attempt in range(self.max_retries + 1):
+            if self.requests:
+                await self.requests.acquire()
+            if self.tokens:
+                await self.tokens.acquire(estimate_tokens(messages, params["max_tokens"]))
+            try:
+                async with self.semaphore:
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=self.temperature,
+                        **params,
+                    )
+                    if params.get("stream"):
+                        return await self.read_stream(response)
+                return response.choices[0].message.content
+            except (openai.APIConnectionError, openai.APIStatusError) as e:
+                status = getattr(e, "status_code", None)
+                if attempt == self.max_retries or (status is not None and status not in RETRY_STATUSES):
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self.retry_delay(attempt, e))
+
+    # reads deltas until the score is known; closing the stream cancels the rest of the generation
+    async def read_stream(self, stream):
+        parser = ScoreStream()
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parser.feed(chunk.choices[0].delta.content)
+                    if parser.score is not None and self.stream == "until_score":
+                        break
+        finally:
+            await stream.close()
+        return parser.text
+
+    # full jitter, but never earlier than a Retry-After the server asked for
+    def retry_delay(self, attempt, error):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            return delay
+
+    async def evaluate_one(self, file_path, code, prompt):
+        try:
+            with replaying(file_path, rubric_name(prompt)):
+                if self.stream:
+                    content = await self.complete(render_messages(code, prompt), stream=True)
+                    return [stream_row(file_path, prompt, content, extract_score(content))]
+                return [section_row(file_path, prompt, await self.complete(render_messages(code, prompt)))]
+        except openai.OpenAIError as e:
+            return [{"file": file_path, "rubric": rubric_name(prompt), "mode": "per_section", "error": str(e)}]
+
+    # all sections in one request, falling back to per-section requests on a malformed answer
+    async def evaluate_combined(self, file_path, code, prompts):
+        try:
+            with replaying(file_path, "all sections"):
+                content = await self.complete(render_combined_messages(code, prompts), **combined_params(prompts))
+            rows = parse_combined(content, prompts)
+        except ValueError:
+            rows = await asyncio.gather(*(self.evaluate_one(file_path, code, prompt) for prompt in prompts))
+            return [row for section in rows for row in section]
+        except openai.OpenAIError as e:
+            return [{"file": file_path, "rubric": rubric_name(p), "mode": "combined", "error": str(e)} for p in prompts]
+        for row in rows:
+            row["file"] = file_path
+        return rows
+
+    # jobs are (file_path, code, prompt), or (file_path, code, prompts) when combined;
+    # yields result rows in completion order
+    async def evaluate(self, jobs, combined=False):
+        evaluate_job = self.evaluate_combined if combined else self.evaluate_one
+        tasks = [asyncio.ensure_future(evaluate_job(*job)) for job in jobs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for row in await next_done:
+                    yield row
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def run_concurrent(files, prompts, args, cache=None, table=None, backend=None):
+    stream = ("full" if args.rationale else "until_score") if args.stream else None
+    evaluator = AsyncEvaluator(backend.async_client, model=backend.model, endpoint=backend.endpoint,
+                               concurrency=args.concurrency, rpm=args.rpm,
+                               tpm=args.tpm, cache=cache, stream=stream)
+    if args.combined:
+        jobs = [(path, prepare_code(path, args.condense, args.keep_comments), prompts) for path in files]
+    else:
+        codes = {path: prepare_code(path, args.condense, args.keep_comments) for path in files}
+        jobs = [(path, codes[path], prompt) for path in files for prompt in prompts]
+    start = time.monotonic()
+    try:
+        async for row in evaluator.evaluate(jobs, combined=args.combined):
+            if table is not None:
+                table.add(row)
+                continue
+            print(f"{row['file']} | {row['rubric']}")
+            print(row["rationale"] if row.get("error") is None else f"ERROR: {row['error']}")
+    finally:
+        await backend.aclose()
+    elapsed = time.monotonic() - start
+    print(f"Evaluated {len(jobs)} requests with {evaluator.retries} retries in {elapsed:.1f}s "
+          f"({len(jobs) / elapsed if elapsed else 0:.1f} requests/s)", file=sys.stderr)
@@ -0,0 +1,116 @@
+import os
+
+import httpx
+import openai
+
+from llm_cache import request_key
+
+DEFAULT_MODEL = "gpt-4.1"
+OPENAI_URL = "https://api.openai.com/v1"
+# connections kept open to the endpoint; requests past max_connections wait for a free one instead of
+# opening more, so the pool size is also a cap on load against an on-prem server
+MAX_CONNECTIONS = 64
+KEEPALIVE_EXPIRY = 30.0
+TIMEOUT = 120.0
+
+
+# API key from LLM_API_KEY / OPENAI_API_KEY, falling back to API_KEY in a local config.py
+def default_api_key():
+    key = os.environ.get("LLM_API_KEY") or os.environ.get("OPENAI_API_KEY")
+    if key:
+        return key
+    try:
+        from config import API_KEY
+    except ImportError:
+        return None
+    return API_KEY
+
+
+# An OpenAI-compatible chat completions endpoint: OpenAI itself, an on-prem inference server (vLLM,
+# TGI, llama.cpp, ...) or the bundled mock_server.py. Sync and async clients are created on first use
+# and each holds one pooled keep-alive httpx client that every request goes through, instead of a new
+# connection per call. The async client doesn't retry, llm_async does that with its own backoff.
+class Backend:
+    def __init__(self, model=DEFAULT_MODEL, base_url=None, api_key=None, max_connections=None, timeout=TIMEOUT):
+        self.model = model
+        self.base_url = base_url
+        # what response cache keys name the server by
+        self.endpoint = (base_url or OPENAI_URL).rstrip("/")
+        # local servers usually ignore the key, but the client insists on one
+        self.api_key = api_key or default_api_key() or ("unused" if base_url else None)
+        self.max_connections = max_connections or MAX_CONNECTIONS
+        self.timeout = timeout
+        self._client = None
+        self._async_client = None
+        # the mock server this backend started, see mock()
+        self.server = None
+
+    # LLM_MODEL / LLM_BASE_URL / LLM_API_KEY select the endpoint without code or flag changes
+    @classmethod
+    def from_environment(cls, **overrides):
+        settings = {"model": os.environ.get("LLM_MODEL") or DEFAULT_MODEL,
+                    "base_url": os.environ.get("LLM_BASE_URL") or None}
+        settings.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**settings)
+
+    # starts mock_server.py on a background thread and points a backend at it, for offline load tests
+    @classmethod
+    def mock(cls, model="mock", max_connections=None, **server_options):
+        from mock_server import start_server
+        server, url = start_server(**server_options)
+        backend = cls(model=model, base_url=url, api_key="mock", max_connections=max_connections)
+        # the port changes every run, the answers don't
+        backend.endpoint = "mock"
+        backend.server = server
+        return backend
+
+    def limits(self):
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections,
+                            keepalive_expiry=KEEPALIVE_EXPIRY)
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = openai.OpenAI(
+                api_key=self.api_key, base_url=self.base_url, timeout=self.timeout,
+                http_client=openai.DefaultHttpxClient(limits=self.limits(), timeout=self.timeout))
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = openai.AsyncOpenAI(
+                api_key=self.api_key, base_url=self.base_url, max_retries=0, timeout=self.timeout,
+                http_client=openai.DefaultAsyncHttpxClient(limits=self.limits(), timeout=self.timeout))
+        return self._async_client
+
+    def request_key(self, messages, **params):
+        return request_key(self.model, messages, endpoint=self.endpoint, **params)
+
+    def create(self, messages, **params):
+        return self.client.chat.completions.create(model=self.model, messages=messages, **params)
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+
+    def describe(self):
+        return f"{self.model} at {self.base_url or 'api.openai.com'}"
+
+
+_default = None
+
+
+# the backend used when none is passed in, configured from the environment and shared by every call
+def default_backend():
+    global _default
+    if _default is None:
+        _default = Backend.from_environment()
+    return _default
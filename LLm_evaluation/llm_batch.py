@@ -0,0 +1,218 @@
+import json
+import os
+import sys
+import time
+
+from llm_eval import MAX_TOKENS, TEMPERATURE, prepare_code, render_messages, rubric_name
+from llm_rubrics import combined_params, parse_combined, render_combined_messages, section_row
+
+ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+# limits of one batch job; bigger sweeps are split over several
+MAX_BATCH_REQUESTS = 50000
+MAX_BATCH_BYTES = 190 * 1024 * 1024
+# batch states that still end in an output file; any other state is final
+PENDING = {"validating", "in_progress", "finalizing", "cancelling"}
+POLL_INTERVAL = 30.0
+
+
+# One line of a batch input file. The custom_id is the response cache key of the same request, so an
+# identical request always gets the same id and a cached or batched answer serves both paths.
+def batch_request(backend, messages, **params):
+    params = dict(params, temperature=TEMPERATURE)
+    custom_id = backend.request_key(messages, **params)
+    return custom_id, {"custom_id": custom_id, "method": "POST", "url": ENDPOINT,
+                       "body": dict(params, model=backend.model, messages=messages)}
+
+
+# the completion text of one output file line, or raises ValueError with the reason it has none
+def answer_content(result):
+    response = result.get("response") or {}
+    if result.get("error") or response.get("status_code") != 200:
+        error = result.get("error") or (response.get("body") or {}).get("error") or {}
+        raise ValueError(error.get("message") or f"status {response.get('status_code')}")
+    return response["body"]["choices"][0]["message"]["content"]
+
+
+def read_jsonl(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Submits requests as batch jobs and collects their answers. Everything is recorded under directory:
+# batches.jsonl has a line per submitted batch, its custom_ids and whether its output has been
+# collected (a later line for the same batch replaces the earlier one), answers.jsonl a line per
+# answered custom_id. A rerun only submits requests that have no answer yet and aren't part of a batch
+# still to be collected, so resubmitting a sweep after a crash or a --no-wait run picks up where it
+# left off instead of paying twice.
+class BatchJobs:
+    def __init__(self, backend, directory=".llm_batches", cache=None, poll_interval=POLL_INTERVAL):
+        self.backend = backend
+        self.directory = directory
+        self.cache = cache
+        self.poll_interval = poll_interval
+        os.makedirs(directory, exist_ok=True)
+        self.batches = {batch["id"]: batch for batch in read_jsonl(os.path.join(directory, "batches.jsonl"))}
+        self.answers = {answer["custom_id"]: answer for answer in read_jsonl(os.path.join(directory, "answers.jsonl"))}
+
+    def record(self, name, row):
+        with open(os.path.join(self.directory, name), "a") as f:
+            f.write(json.dumps(row) + "\n")
+
+    def answered(self, custom_id):
+        answer = self.answers.get(custom_id)
+        if answer is not None and answer.get("error") is None:
+            return True
+        # answer() reads it, so only that lookup counts towards the cache summary
+        return self.cache is not None and self.cache.contains(custom_id)
+
+    # batches whose output hasn't been downloaded yet, whether or not they are still running
+    def uncollected(self):
+        return [batch for batch in self.batches.values() if not batch.get("collected")]
+
+    # requests is {custom_id: input line}; returns the number of requests submitted
+    def submit(self, requests):
+        waiting = {custom_id for batch in self.uncollected() for custom_id in batch["custom_ids"]}
+        todo = [line for custom_id, line in requests.items()
+                if custom_id not in waiting and not self.answered(custom_id)]
+        chunk, size = [], 0
+        for line in todo:
+            data = json.dumps(line) + "\n"
+            if chunk and (len(chunk) == MAX_BATCH_REQUESTS or size + len(data) > MAX_BATCH_BYTES):
+                self.create(chunk)
+                chunk, size = [], 0
+            chunk.append(data)
+            size += len(data)
+        if chunk:
+            self.create(chunk)
+        return len(todo)
+
+    def create(self, lines):
+        path = os.path.join(self.directory, f"input-{len(self.batches) + 1:04d}.jsonl")
+        with open(path, "w") as f:
+            f.writelines(lines)
+        client = self.backend.client
+        with open(path, "rb") as f:
+            upload = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(input_file_id=upload.id, endpoint=ENDPOINT, completion_window=COMPLETION_WINDOW,
+                                      metadata={"source": "llm_eval", "requests": str(len(lines))})
+        self.update({"id": batch.id, "status": batch.status, "collected": False, "input": path,
+                     "custom_ids": [json.loads(line)["custom_id"] for line in lines]})
+        print(f"Submitted batch {batch.id} with {len(lines)} requests", file=sys.stderr)
+
+    def update(self, batch):
+        self.batches[batch["id"]] = batch
+        self.record("batches.jsonl", batch)
+
+    # polls every uncollected batch until it is final and collects its output and error files
+    def wait(self):
+        client = self.backend.client
+        while True:
+            for batch in self.uncollected():
+                remote = client.batches.retrieve(batch["id"])
+                counts = remote.request_counts
+                print(f"Batch {remote.id}: {remote.status}"
+                      + (f", {counts.completed + counts.failed}/{counts.total} done" if counts else ""), file=sys.stderr)
+                if remote.status in PENDING:
+                    continue
+                # expired and cancelled batches still return what was finished
+                for file_id in (remote.output_file_id, remote.error_file_id):
+                    if file_id:
+                        self.collect(client.files.content(file_id).text)
+                self.update(dict(batch, status=remote.status, collected=True))
+            if not self.uncollected():
+                return
+            time.sleep(self.poll_interval)
+
+    def collect(self, text):
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            try:
+                answer = {"custom_id": result["custom_id"], "content": answer_content(result), "error": None}
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                answer = {"custom_id": result.get("custom_id"), "content": None, "error": str(e) or repr(e)}
+            self.answers[answer["custom_id"]] = answer
+            self.record("answers.jsonl", answer)
+
+    # (content, error) for a request; answers are copied into the response cache
+    def answer(self, custom_id):
+        if self.cache is not None:
+            content = self.cache.get(custom_id)
+            if content is not None:
+                return content, None
+        answer = self.answers.get(custom_id)
+        if answer is None:
+            return None, "no answer in any batch"
+        if answer["error"] is None and self.cache is not None:
+            self.cache.put(custom_id, self.backend.model, answer["content"])
+        return answer["content"], answer["error"]
+
+
+# A rubric request waiting for its batch answer; combined=True asks for all prompts in one request.
+class BatchJob:
+    def __init__(self, backend, file_path, code, prompts, combined=False):
+        self.backend = backend
+        self.file_path = file_path
+        self.code = code
+        self.prompts = prompts
+        self.combined = combined
+        if combined:
+            self.custom_id, self.line = batch_request(backend, render_combined_messages(code, prompts),
+                                                      **combined_params(prompts))
+        else:
+            self.custom_id, self.line = batch_request(backend, render_messages(code, prompts[0]), max_tokens=MAX_TOKENS)
+
+    # (result rows, follow-up jobs); a malformed combined answer is retried per section in the next round
+    def rows(self, content, error):
+        mode = "combined" if self.combined else "per_section"
+        if error is not None:
+            return [{"file": self.file_path, "rubric": rubric_name(p), "mode": mode, "error": error}
+                    for p in self.prompts], []
+        if not self.combined:
+            return [section_row(self.file_path, self.prompts[0], content)], []
+        try:
+            rows = parse_combined(content, self.prompts)
+        except ValueError:
+            return [], [BatchJob(self.backend, self.file_path, self.code, [prompt]) for prompt in self.prompts]
+        for row in rows:
+            row["file"] = self.file_path
+        return rows, []
+
+
+# Batch mode of llm_eval.py: every (file, prompt) pair, or every file with --combined, becomes one line of
+# a batch input file. Waits for the batches and adds their answers to the results table; with
+# args.no_wait it returns once submitted and a later run with the same arguments collects them.
+def run_batch(files, prompts, args, cache, table, backend):
+    batches = BatchJobs(backend, args.batch_dir, cache, args.poll_interval)
+    jobs = []
+    for path in files:
+        code = prepare_code(path, args.condense, args.keep_comments)
+        if args.combined:
+            jobs.append(BatchJob(backend, path, code, prompts, combined=True))
+        else:
+            jobs.extend(BatchJob(backend, path, code, [prompt]) for prompt in prompts)
+
+    start = time.monotonic()
+    rounds = 0
+    while jobs:
+        rounds += 1
+        submitted = batches.submit({job.custom_id: job.line for job in jobs})
+        print(f"Batch round {rounds}: {len(jobs)} requests, {submitted} submitted, "
+              f"{len(jobs) - submitted} answered or already running", file=sys.stderr)
+        if args.no_wait and batches.uncollected():
+            print(f"Not waiting; rerun without --no-wait to collect the results from {args.batch_dir}",
+                  file=sys.stderr)
+            return
+        batches.wait()
+        retries = []
+        for job in jobs:
+            rows, followups = job.rows(*batches.answer(job.custom_id))
+            for row in rows:
+                table.add(row)
+            retries.extend(followups)
+        jobs = retries
+    print(f"Batch evaluation finished in {rounds} round(s) and {time.monotonic() - start:.1f}s", file=sys.stderr)
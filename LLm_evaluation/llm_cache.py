@@ -0,0 +1,89 @@
+import contextlib
+import hashlib
+import json
+import sqlite3
+import time
+
+DEFAULT_MAX_ENTRIES = 100000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+class CacheMiss(LookupError):
+    pass
+
+
+# replay misses raised inside name the file and rubric the request was for
+@contextlib.contextmanager
+def replaying(file_path, rubric):
+    try:
+        yield
+    except CacheMiss as e:
+        raise CacheMiss(f"{file_path} | {rubric}: {e}") from None
+
+
+# hash of everything that determines a completion: the endpoint serving it, the rendered messages, model
+# and sampling parameters. Two servers with a model of the same name don't share answers.
+def request_key(model, messages, endpoint=None, **params):
+    payload = json.dumps({"endpoint": endpoint, "model": model, "messages": messages, "params": params},
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Persistent completion cache in SQLite, evicting least recently used responses beyond max_entries.
+# With replay=True a miss raises CacheMiss instead of letting the caller reach the API.
+class ResponseCache:
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, replay=False):
+        self.path = path
+        self.max_entries = max_entries
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def get(self, key):
+        row = self.db.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            if self.replay:
+                raise CacheMiss(f"no cached response for request {key[:12]} (replay mode)")
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    # whether a response is stored, without counting a hit or miss or refreshing its access time
+    def contains(self, key):
+        return self.db.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, key, model, content):
+        now = time.time()
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, model, content, now, now))
+            self.evict()
+
+    def evict(self):
+        count = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def summary(self):
+        return f"Response cache: {self.hits} hits, {self.misses} misses"
+
+    def close(self):
+        self.db.close()
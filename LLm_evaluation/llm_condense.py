@@ -0,0 +1,246 @@
+import ast
+import io
+import re
+import tokenize
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# literals with more elements than this keep their first items followed by "..."
+MAX_LITERAL_ITEMS = 8
+MAX_STRING_CHARS = 200
+
+TERMINATORS = (ast.Return, ast.Raise, ast.Continue, ast.Break)
+# string statements standing in for comments between ast.parse and ast.unparse, see mark_comments()
+COMMENT_MARKER = "__condensed_comment_"
+# unparsed as '<marker>' or, first in a body, as a """<marker>""" docstring
+COMMENT_LINE = re.compile(r"^(\s*)('|\"\"\")" + COMMENT_MARKER + r"(\d+)\2$", re.MULTILINE)
+# lines that continue the compound statement before them, so no statement can come in between
+CONTINUATIONS = {"else", "elif", "except", "finally"}
+# statements a trailing comment can't be moved out of with "; <marker>"
+COMPOUND = {"if", "elif", "else", "for", "while", "try", "except", "finally", "with", "def", "class", "async",
+            "match", "case", "@"}
+
+
+# tokens as the model would count them when tiktoken is installed, otherwise a word/punctuation estimate
+def count_tokens(text):
+    if tiktoken is not None:
+        return len(tiktoken.get_encoding("o200k_base").encode(text))
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def is_docstring(stmt):
+    return isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant) and isinstance(stmt.value.value, str)
+
+
+# Comments never reach the AST, so every comment outside brackets is replaced with a marker string
+# statement. A comment on a line of its own becomes a statement indented as the parser expects one
+# there: like the next line of code, or like the previous one when the next continues a compound
+# statement (else:, except:). A comment after a simple statement is appended to it as "; <marker>".
+# Comments between a decorator and its definition or after a compound statement's header have nowhere
+# to go and are dropped. Returns the marked source and the comments by marker number; the source keeps
+# its line numbers.
+def mark_comments(source):
+    lines = source.splitlines(keepends=True)
+    comments = []
+    trailing = []
+    starts = []  # (row, indentation, first token) of every logical line
+    depth = 0
+    at_start = True
+    for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+        if tok.type == tokenize.COMMENT and depth == 0:
+            if not tok.line[:tok.start[1]].strip():
+                comments.append((tok.start[0], tok.string))
+            elif starts[-1][2] not in COMPOUND:
+                trailing.append((tok.start[0], tok.start[1], tok.string))
+        elif tok.type in (tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT):
+            at_start = True
+        elif tok.type not in (tokenize.NL, tokenize.COMMENT, tokenize.ENDMARKER):
+            if at_start:
+                starts.append((tok.start[0], tok.line[:tok.start[1]], tok.string))
+                at_start = False
+            if tok.type == tokenize.OP and tok.string in "([{":
+                depth += 1
+            elif tok.type == tokenize.OP and tok.string in ")]}":
+                depth -= 1
+
+    texts = {}
+    for row, text in comments:
+        before = [start for start in starts if start[0] < row]
+        after = [start for start in starts if start[0] > row]
+        if before and before[-1][2] == "@":
+            continue
+        if after and after[0][2] in CONTINUATIONS:
+            indent = before[-1][1] if before else ""
+        else:
+            indent = after[0][1] if after else ""
+        lines[row - 1] = f"{indent}'{COMMENT_MARKER}{len(texts)}'\n"
+        texts[len(texts)] = text
+    for row, column, text in trailing:
+        lines[row - 1] = f"{lines[row - 1][:column].rstrip().rstrip(';')}; '{COMMENT_MARKER}{len(texts)}'\n"
+        texts[len(texts)] = text
+    return "".join(lines), texts
+
+
+def constant_test(node):
+    if isinstance(node, ast.Constant) and not isinstance(node.value, str):
+        return bool(node.value)
+    return None
+
+
+class Condenser(ast.NodeTransformer):
+    def __init__(self, max_items=MAX_LITERAL_ITEMS, max_chars=MAX_STRING_CHARS, keep_comments=False):
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.keep_comments = keep_comments
+
+    # drops docstrings and bare string statements (kept whole with keep_comments, comments are marked
+    # as such strings then), statements after return/raise/break/continue and the dead branch of
+    # `if False:` / `if True:`
+    def condense_body(self, body):
+        out = []
+        for stmt in body:
+            if is_docstring(stmt):
+                if self.keep_comments:
+                    out.append(stmt)
+                continue
+            if isinstance(stmt, (ast.If, ast.While)):
+                test = constant_test(stmt.test)
+                if test is False:
+                    out.extend(self.condense_body(stmt.orelse))
+                    continue
+                if test is True and isinstance(stmt, ast.If):
+                    out.extend(self.condense_body(stmt.body))
+                    continue
+            stmt = self.visit(stmt)
+            out.append(stmt)
+            if isinstance(stmt, TERMINATORS):
+                break
+        return out
+
+    def generic_visit(self, node):
+        for field in ("body", "orelse", "finalbody"):
+            body = getattr(node, field, None)
+            if isinstance(body, list) and body and isinstance(body[0], ast.stmt):
+                condensed = self.condense_body(body)
+                # a try needs a body and, without handlers, its finally block
+                if not condensed and (field == "body" or field == "finalbody" and not node.handlers):
+                    condensed = [ast.Pass()]
+                setattr(node, field, condensed)
+        for name, value in ast.iter_fields(node):
+            if name in ("body", "orelse", "finalbody") and isinstance(value, list) and value and isinstance(value[0], ast.stmt):
+                continue
+            if isinstance(value, list):
+                setattr(node, name, [self.visit(v) if isinstance(v, ast.AST) else v for v in value])
+            elif isinstance(value, ast.AST):
+                setattr(node, name, self.visit(value))
+        return node
+
+    def visit_List(self, node):
+        return self.collapse_sequence(node)
+
+    visit_Tuple = visit_Set = visit_List
+
+    def collapse_sequence(self, node):
+        self.generic_visit(node)
+        # only values; targets of assignments and del must keep every name
+        if len(node.elts) > self.max_items and isinstance(getattr(node, "ctx", ast.Load()), ast.Load):
+            node.elts = node.elts[:self.max_items] + [ast.Constant(Ellipsis)]
+        return node
+
+    def visit_Dict(self, node):
+        self.generic_visit(node)
+        if len(node.keys) > self.max_items:
+            node.keys = node.keys[:self.max_items] + [ast.Constant(Ellipsis)]
+            node.values = node.values[:self.max_items] + [ast.Constant(Ellipsis)]
+        return node
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, str) and len(node.value) > self.max_chars:
+            return ast.copy_location(ast.Constant(node.value[:self.max_chars] + "..."), node)
+        return node
+
+
+def referenced_names(tree):
+    used = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            used.add(node.id)
+        elif isinstance(node, ast.Attribute):
+            used.add(node.attr)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            used.add(node.value)  # names listed in __all__ or looked up by string
+    return used
+
+
+# a script does its work at the top level after defining its helpers; calls before the last definition
+# (pytest.importorskip, logging setup) don't make a library or a test module a script
+def is_script(tree):
+    definitions = [i for i, stmt in enumerate(tree.body)
+                   if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]
+    last = definitions[-1] if definitions else -1
+    return any(isinstance(node, ast.Call) for stmt in tree.body[last + 1:] for node in ast.walk(stmt))
+
+
+# Only scripts lose unreferenced functions; a module that just defines things is a library and keeps
+# them. Imported names that are never used are dropped everywhere.
+def drop_unused(tree):
+    used = referenced_names(tree)
+    script = is_script(tree)
+    body = []
+    for stmt in tree.body:
+        # decorated functions are registered somewhere (routes, fixtures, hooks) and so in use
+        if script and isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)) and stmt.name not in used \
+                and not stmt.decorator_list:
+            continue
+        if isinstance(stmt, (ast.Import, ast.ImportFrom)) and not (isinstance(stmt, ast.ImportFrom) and stmt.module == "__future__"):
+            stmt.names = [a for a in stmt.names
+                          if a.name == "*" or (a.asname or a.name.split(".", 1)[0]) in used]
+            if not stmt.names:
+                continue
+        body.append(stmt)
+    tree.body = body
+
+
+# Condensed source for the LLM prompt: comments and docstrings stripped, large literals collapsed,
+# unreachable and unused top-level code removed. keep_comments keeps comments and docstrings for the
+# documentation rubric (comments inside brackets are lost). Whenever a top-level statement would otherwise
+# be more than anchor_slack lines away from its original position, a "# L<n>" anchor is inserted
+# before it so answers can still cite original lines. The source is returned unchanged when condensing
+# doesn't make it smaller.
+def condense(source, max_items=MAX_LITERAL_ITEMS, max_chars=MAX_STRING_CHARS, anchor_slack=3, keep_comments=False):
+    tree, comments = None, {}
+    if keep_comments:
+        try:
+            marked, comments = mark_comments(source)
+            tree = ast.parse(marked)
+        except (SyntaxError, tokenize.TokenError):
+            # a comment placed where no statement fits; condense without comments
+            comments = {}
+    if tree is None:
+        try:
+            tree = ast.parse(source)
+        except SyntaxError:
+            return source
+    tree.body = Condenser(max_items, max_chars, keep_comments).condense_body(tree.body)
+    drop_unused(tree)
+
+    lines = []
+    offset = 0
+    for stmt in tree.body:
+        if abs(stmt.lineno - (len(lines) + 1 + offset)) > anchor_slack:
+            lines.append(f"# L{stmt.lineno}")
+            offset = stmt.lineno - len(lines) - 1
+        lines.extend(ast.unparse(stmt).splitlines())
+    condensed = COMMENT_LINE.sub(lambda m: m.group(1) + comments[int(m.group(3))], "\n".join(lines) + "\n")
+    # ast.unparse normalizes quotes and layout, which can cost more than a file with little to drop saves
+    return condensed if count_tokens(condensed) < count_tokens(source) else source
+
+
+def condense_stats(source, condensed):
+    original = count_tokens(source)
+    reduced = count_tokens(condensed)
+    return {"original_tokens": original, "condensed_tokens": reduced,
+            "ratio": reduced / original if original else 1.0}
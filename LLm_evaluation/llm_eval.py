@@ -1,50 +1,231 @@
-import openai
-from config import API_KEY  # Import the API key from the config file
+import argparse
+import asyncio
+import functools
+import sys
+from llm_backends import Backend, default_backend
+from llm_cache import DEFAULT_MAX_ENTRIES, CacheMiss, ResponseCache, replaying
+from llm_condense import condense, condense_stats
+# the static evaluator's corpus walker; pip install -e ../flake8_pluggin
+from fairness_corpus import discover
+from llm_results import ScoreStream, extract_score
+
+MAX_TOKENS = 500
+TEMPERATURE = 0.7
+SYSTEM_PROMPT = "You are an assistant that evaluates code based on fairness rubric."
 
-openai.api_key = API_KEY
 
- 
 def read_code(file_path: str):
-        with open(file_path, 'r') as file:
-             code = file.read()
+    with open(file_path, 'r') as file:
+        return file.read()
+
+# the code as sent to the model, condensed first when requested
+def prepare_code(file_path: str, condensed=False, keep_comments=False):
+    code = read_code(file_path)
+    if not condensed:
         return code
+    short = condense(code, keep_comments=keep_comments)
+    stats = condense_stats(code, short)
+    print(f"{file_path}: {stats['original_tokens']} -> {stats['condensed_tokens']} tokens "
+          f"({stats['ratio']:.0%})", file=sys.stderr)
+    return short
+
+# chat messages for one rubric prompt with the code pasted in
+def render_messages(code: str, prompt_template: str):
+    prompt = prompt_template.replace("[Insert Code Here]", code)
+    return [{
+        "role": "system",
+        "content": SYSTEM_PROMPT
+    }, {
+        "role": "user",
+        "content": prompt
+    }]
+
+# one chat completion, served from the response cache when possible
+def complete(messages, cache=None, max_tokens=MAX_TOKENS, backend=None, **params):
+    backend = backend or default_backend()
+    if cache is not None:
+        key = backend.request_key(messages, max_tokens=max_tokens, temperature=TEMPERATURE, **params)
+        content = cache.get(key)
+        if content is not None:
+            return content
+    response = backend.create(
+        messages,
+        max_tokens=max_tokens,
+        temperature=TEMPERATURE,
+        **params,
+    )
+
+    content = response.choices[0].message.content
+    if cache is not None:
+        cache.put(key, backend.model, content)
+    return content
+
+# Streams a completion and stops reading (closing the connection, which cancels generation) as soon
+# as a score has been emitted, unless the full rationale is wanted. Returns (text, score).
+# An until_score answer is cached cut off as it was read: it keeps only the rationale written before
+# the score, and its own cache key keeps it from ever standing in for a full answer.
+def stream_score(messages, cache=None, keep_rationale=False, backend=None):
+    backend = backend or default_backend()
+    mode = "full" if keep_rationale else "until_score"
+    if cache is not None:
+        key = backend.request_key(messages, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, stream=mode)
+        content = cache.get(key)
+        if content is not None:
+            return content, extract_score(content)
+    stream = backend.create(
+        messages,
+        max_tokens=MAX_TOKENS,
+        temperature=TEMPERATURE,
+        stream=True,
+    )
+    parser = ScoreStream()
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parser.feed(chunk.choices[0].delta.content)
+                if parser.score is not None and not keep_rationale:
+                    break
+    finally:
+        stream.close()
+
+    content = parser.text
+    if cache is not None:
+        cache.put(key, backend.model, content)
+    return content, extract_score(content)
+
+def llm_evaluation(code: str, prompt_template: str, cache=None, backend=None):
+    messages = render_messages(code, prompt_template)
+    print(messages[1]["content"])
+    return complete(messages, cache, backend=backend)
 
-def llm_evaluation(code: str, prompt_template: str):
-        prompt = prompt_template.replace("[Insert Code Here]", code)
-        print(prompt)
-        response = openai.chat.completions.create(
-            model="gpt-4.1",  
-            messages=[{
-               "role": "system", 
-               "content": "You are an assistant that evaluates code based on fairness rubric."
-            }, {
-               "role": "user", 
-               "content": prompt
-            }],
-            max_tokens=500,  
-            temperature=0.7,  
-        )
-    
-        return response.choices[0].message.content
-
-file_path = 'train_updated.py'  # Path to the file containing the code
-
-    # Read the code from the file
-code = read_code(file_path)
-
-    # Read the prompts from a file (for evaluation)
-prompt_file = 'prompt.txt'  # Path to the file containing multiple prompts
-
-    # Function to read the prompts from a file
+# Function to read the prompts from a file
 def read_prompts(file_path: str):
-        with open(file_path, 'r') as file:
-            prompts = file.read().split('---')  # Split by the delimiter (---)
-        return prompts
+    with open(file_path, 'r') as file:
+        prompts = file.read().split('---')  # Split by the delimiter (---)
+    # the dashed separator lines split into empty pieces, which are not prompts
+    return [p for p in prompts if p.strip()]
+
+# short label for a rubric section, taken from its "# 1.  Data representation" heading
+def rubric_name(prompt: str):
+    for line in prompt.splitlines():
+        # separators that are not a multiple of three dashes leave stray dashes behind
+        if line.strip().strip("-"):
+            return line.strip().lstrip("#").strip()
+    return ""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate code against the fairness rubric prompts")
+    parser.add_argument("files", nargs="*", default=["train_updated.py"],
+                        help="code files or directories to evaluate; checkpoint copies and caches are skipped")
+    parser.add_argument("--prompts", default="prompt.txt", help="rubric prompts separated by ---")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="evaluate concurrently with this many requests in flight (default: one at a time)")
+    parser.add_argument("--rpm", type=float, default=None, help="requests per minute limit for concurrent mode")
+    parser.add_argument("--tpm", type=float, default=None, help="tokens per minute limit for concurrent mode")
+    parser.add_argument("--base-url", default=None,
+                        help="OpenAI-compatible endpoint, e.g. an on-prem server or mock_server.py (default: $LLM_BASE_URL)")
+    parser.add_argument("--model", default=None, help="model name at the endpoint (default: $LLM_MODEL or gpt-4.1)")
+    parser.add_argument("--max-connections", type=int, default=None,
+                        help="size of the keep-alive connection pool to the endpoint")
+    parser.add_argument("--mock", action="store_true",
+                        help="evaluate against the bundled mock server started in-process, for offline load tests")
+    parser.add_argument("--mock-latency", type=float, default=0.0, help="with --mock, seconds before each response")
+    parser.add_argument("--mock-batch-latency", type=float, default=0.0,
+                        help="with --mock, seconds a batch job stays in progress")
+    parser.add_argument("--combined", action="store_true",
+                        help="send each file once with all rubric sections and ask for JSON scores")
+    parser.add_argument("--results", default=None,
+                        help="write scores to this CSV/JSONL file instead of printing responses (JSONL on stdout with --combined)")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream each answer and stop once its score is emitted; scores go to the results table")
+    parser.add_argument("--rationale", action="store_true",
+                        help="with --stream, keep reading to record the full rationale")
+    parser.add_argument("--condense", action="store_true",
+                        help="strip comments, docstrings, large literals and dead code before sending")
+    parser.add_argument("--keep-comments", action="store_true",
+                        help="with --condense, keep comments and docstrings, e.g. for the documentation rubric")
+    parser.add_argument("--batch", action="store_true",
+                        help="submit every request as an offline batch job, poll for it and add the answers to the results")
+    parser.add_argument("--batch-dir", default=".llm_batches",
+                        help="batch inputs, ids and answers; rerunning resubmits only unanswered requests")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="seconds between batch status checks")
+    parser.add_argument("--no-wait", action="store_true",
+                        help="with --batch, exit once submitted; rerun to collect the results")
+    parser.add_argument("--cache", default=None, help="SQLite file caching responses between runs")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES, help="maximum cached responses")
+    parser.add_argument("--replay", action="store_true",
+                        help="only use cached responses and fail on the first miss, making no API calls")
+    args = parser.parse_args(argv)
+    if args.replay and not args.cache:
+        parser.error("--replay requires --cache")
+    if args.stream and args.combined:
+        parser.error("--stream scores one rubric per request and cannot be used with --combined")
+    if args.batch and (args.stream or args.concurrency or args.replay):
+        parser.error("--batch cannot be used with --stream, --concurrency or --replay")
+
+    # these modules import helpers from this one
+    from llm_results import ResultsTable
+    from llm_rubrics import evaluate_combined, section_row, stream_row
+
+    if args.mock:
+        backend = Backend.mock(args.model or "mock", args.max_connections, latency=args.mock_latency,
+                               batch_latency=args.mock_batch_latency)
+    else:
+        backend = Backend.from_environment(model=args.model, base_url=args.base_url,
+                                           max_connections=args.max_connections)
+    print(f"Evaluating with {backend.describe()}", file=sys.stderr)
+    prompts = read_prompts(args.prompts)
+    cache = ResponseCache(args.cache, args.cache_size, args.replay) if args.cache else None
+    # byte-identical files are sent once; their rows are copied to every path in the results table
+    corpus = discover(args.files, (".py",))
+    files = corpus.unique()
+    print(f"Found {corpus.summary()}", file=sys.stderr)
+    table = None
+    if args.results or args.combined or args.stream or args.batch:
+        table = ResultsTable(args.results, functools.partial(corpus.fan_out, key="file"))
+
+    try:
+        if args.batch:
+            from llm_batch import run_batch
+            run_batch(files, prompts, args, cache, table, backend)
+            return
+        if args.concurrency:
+            from llm_async import run_concurrent
+            asyncio.run(run_concurrent(files, prompts, args, cache, table, backend))
+            return
+
+        # Loop through all the files and prompts and evaluate the code with each prompt
+        for file_path in files:
+            code = prepare_code(file_path, args.condense, args.keep_comments)
+            if args.combined:
+                with replaying(file_path, "all sections"):
+                    rows = evaluate_combined(file_path, code, prompts,
+                                             functools.partial(complete, cache=cache, backend=backend))
+                for row in rows:
+                    table.add(row)
+                continue
+            for fairness_prompt in prompts:
+                with replaying(file_path, rubric_name(fairness_prompt)):
+                    if args.stream:
+                        messages = render_messages(code, fairness_prompt)
+                        table.add(stream_row(file_path, fairness_prompt,
+                                             *stream_score(messages, cache, args.rationale, backend)))
+                    elif table is not None:
+                        content = complete(render_messages(code, fairness_prompt), cache, backend=backend)
+                        table.add(section_row(file_path, fairness_prompt, content))
+                    else:
+                        print(llm_evaluation(code, fairness_prompt, cache, backend))
+    except CacheMiss as e:
+        print(f"Replay stopped: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if table is not None:
+            table.close()
+        if cache is not None:
+            print(cache.summary(), file=sys.stderr)
+        backend.close()
 
-    # Read the prompts
-prompts = read_prompts(prompt_file)
 
-    # Loop through all the prompts and evaluate the code with each prompt
-for fairness_prompt in prompts:
-        result = llm_evaluation(code, fairness_prompt)
-        print(result)
+if __name__ == "__main__":
+    sys.exit(main())
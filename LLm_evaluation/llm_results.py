@@ -0,0 +1,91 @@
+import csv
+import json
+import re
+import sys
+
+# duplicate_of names the file a duplicate copied its row from, see fairness_corpus.Corpus.fan_out
+FIELDS = ["file", "rubric", "score", "rationale", "mode", "error", "duplicate_of"]
+
+SCORE = r"(\d{1,2}(?:\.\d+)?)"
+# "Score: 7", "Overall score: 7/10", "**Score:** 7.5", "score of 7", "score is 7"
+LABELLED_SCORE = re.compile(r"\bscore\b\W{0,5}(?:of\s+|is\s+|=\s*)?" + SCORE, re.IGNORECASE)
+# "7/10" and "7 out of 10" anywhere, e.g. per-criterion lines
+OUT_OF_TEN = re.compile(r"\b" + SCORE + r"\s*(?:/|out of)\s*10\b", re.IGNORECASE)
+# what has to follow a number before a partial answer's score is final: "/10" or "out of 10" and then
+# something that isn't a digit, or the end of the line. A number before "." may still get decimals.
+TERMINATOR = re.compile(r"\s*(?:/|out of)\s*10(?=\D)|[ \t]*[.,;)*]?[ \t*]*\n", re.IGNORECASE)
+
+
+def in_range(match):
+    score = float(match.group(1))
+    if 0 <= score <= 10:
+        return int(score) if score.is_integer() else score
+    return None
+
+
+# The 0-10 score of a free-text rubric answer, or None: the first labelled score ("Score: 7/10"), else
+# the first "N/10" or "N out of 10". With partial=True the text is still streaming in, and a score is
+# only returned once it can't change any more: it has to be labelled, since an overall score can still
+# follow "N/10" lines of single criteria, and a terminator has to follow it ("Score: 1" may become "10",
+# "Score: 7." may become "7.5").
+def extract_score(text, partial=False):
+    text = text or ""
+    for match in LABELLED_SCORE.finditer(text):
+        if partial and not TERMINATOR.match(text, match.end()):
+            return None
+        score = in_range(match)
+        if score is not None:
+            return score
+    if partial:
+        return None
+    for match in OUT_OF_TEN.finditer(text):
+        score = in_range(match)
+        if score is not None:
+            return score
+    return None
+
+
+# accumulates a streamed answer and reports the score as soon as it is certain
+class ScoreStream:
+    def __init__(self):
+        self.parts = []
+        self.score = None
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def feed(self, chunk):
+        self.parts.append(chunk)
+        if self.score is None:
+            self.score = extract_score(self.text, partial=True)
+        return self.score
+
+
+# One row per (file, rubric) evaluation, streamed to a CSV or JSONL file as results arrive,
+# or to stdout as JSONL when no path is given. fan_out(row) can expand a row into several, e.g. one
+# per copy of a file that was evaluated only once.
+class ResultsTable:
+    def __init__(self, path=None, fan_out=None):
+        self.path = path
+        self.fan_out = fan_out
+        self.csv = path is not None and path.endswith(".csv")
+        self.out = sys.stdout if path is None else open(path, "w", newline="")
+        self.rows = 0
+        if self.csv:
+            self.writer = csv.DictWriter(self.out, fieldnames=FIELDS, extrasaction="ignore")
+            self.writer.writeheader()
+
+    def add(self, row):
+        for row in self.fan_out(row) if self.fan_out else (row,):
+            row = {field: row.get(field) for field in FIELDS}
+            if self.csv:
+                self.writer.writerow(row)
+            else:
+                self.out.write(json.dumps(row) + "\n")
+            self.rows += 1
+        self.out.flush()
+
+    def close(self):
+        if self.out is not sys.stdout:
+            self.out.close()
@@ -0,0 +1,83 @@
+import json
+
+from llm_eval import SYSTEM_PROMPT, render_messages, rubric_name
+from llm_results import extract_score
+
+# asks for machine-readable output; the mock server also keys off these section headings
+COMBINED_INSTRUCTIONS = """Evaluate the code below against each of the following fairness rubric sections.
+Give every section a score from 0 to 10 and a short rationale (one or two sentences).
+
+Respond with only a JSON object of the form:
+{"sections": [{"section": "<section id>", "score": <0-10>, "rationale": "<short rationale>"}]}
+with one entry per section, using the section ids below.
+"""
+
+# completion budget per section for a score and a one or two sentence rationale
+TOKENS_PER_SECTION = 120
+
+
+# the instructions of one prompt.txt section, without its variable wrapper and code placeholder
+def rubric_body(prompt):
+    body = prompt.split('"""', 1)[1] if '"""' in prompt else prompt
+    body = body.split("**Code:**", 1)[0]
+    return body.strip()
+
+
+# one request carrying every rubric section and the code once
+def render_combined_messages(code, prompts):
+    parts = [COMBINED_INSTRUCTIONS]
+    for i, prompt in enumerate(prompts, 1):
+        parts.append(f"## Section {i}: {rubric_name(prompt)}\n{rubric_body(prompt)}\n")
+    parts.append(f"**Code:**\n{code}\n")
+    return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": "\n".join(parts)}]
+
+
+# rows for every section of a combined answer; raises ValueError when the answer is not usable JSON
+def parse_combined(content, prompts):
+    text = (content or "").strip()
+    if text.startswith("```"):
+        text = text.strip("`").split("\n", 1)[-1]
+    try:
+        sections = {str(s["section"]): s for s in json.loads(text)["sections"]}
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"unexpected combined answer structure: {e!r}")
+
+    rows = []
+    for i, prompt in enumerate(prompts, 1):
+        section = sections.get(str(i))
+        if section is None:
+            raise ValueError(f"section {i} missing from combined answer")
+        score = section.get("score")
+        if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 10:
+            raise ValueError(f"section {i} has invalid score {score!r}")
+        rows.append({"rubric": rubric_name(prompt), "score": score,
+                     "rationale": str(section.get("rationale", "")), "mode": "combined"})
+    return rows
+
+
+def combined_params(prompts):
+    return {"max_tokens": TOKENS_PER_SECTION * len(prompts), "response_format": {"type": "json_object"}}
+
+
+def section_row(file_path, prompt, content):
+    return {"file": file_path, "rubric": rubric_name(prompt), "score": extract_score(content),
+            "rationale": content, "mode": "per_section"}
+
+
+# the rationale of a streamed answer is whatever was read before generation was cut off
+def stream_row(file_path, prompt, content, score):
+    return {"file": file_path, "rubric": rubric_name(prompt), "score": score,
+            "rationale": content, "mode": "stream"}
+
+
+# Scores all sections with one request; falls back to one request per section when the combined
+# answer is malformed. complete(messages, **params) returns the completion text.
+def evaluate_combined(file_path, code, prompts, complete):
+    content = complete(render_combined_messages(code, prompts), **combined_params(prompts))
+    try:
+        rows = parse_combined(content, prompts)
+    except ValueError:
+        return [section_row(file_path, prompt, complete(render_messages(code, prompt))) for prompt in prompts]
+    for row in rows:
+        row["file"] = file_path
+    return rows
@@ -0,0 +1,308 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# "## Section <id>:" headings of a combined multi-rubric request (see llm_rubrics.py)
+SECTION_HEADING = re.compile(r"^## Section (\S+?):", re.MULTILINE)
+
+
+def mock_score(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).digest()[0] % 11
+
+
+# deterministic rubric answer: the same messages always get the same score(s)
+def mock_reply(messages, malformed=False):
+    prompt = messages[-1].get("content", "") if messages else ""
+    sections = SECTION_HEADING.findall(prompt)
+    if sections:
+        if malformed:
+            return '{"sections": [{"section": "1", "score": '
+        return json.dumps({"sections": [
+            {"section": s, "score": mock_score(s, messages), "rationale": "Mock rationale for testing."}
+            for s in sections
+        ]})
+    score = mock_score(messages)
+    return (f"Score: {score}/10\nMock evaluation for testing; the score is derived from a hash of the prompt. "
+            "A real answer would go on to discuss how the code identifies demographic groups, which fairness "
+            "metrics it reports, how mitigation is applied during training and how results are documented, "
+            "so this rationale is padded to a comparable length.")
+
+
+def completion(body, content, completion_id):
+    prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def file_object(file_id, name, purpose, data):
+    return {"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+            "filename": name, "purpose": purpose, "status": "processed"}
+
+
+# Works through a batch input file after batch_latency seconds. Every line is answered like a chat
+# request (with the same error and malformed rates); answers go to the output file, rate-limited and
+# invalid lines to the error file, as the batch API does.
+def run_batch(server, batch_id):
+    batch = server.batches[batch_id]
+    batch.update(status="in_progress", in_progress_at=int(time.time()))
+    if server.batch_latency:
+        time.sleep(server.batch_latency)
+    output, errors = [], []
+    lines = server.files[batch["input_file_id"]][2].decode("utf-8").splitlines()
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        result = {"id": f"batch_req_mock_{number}", "custom_id": request.get("custom_id"), "error": None}
+        body = request.get("body", {})
+        if request.get("url") != "/v1/chat/completions":
+            errors.append(dict(result, response=None,
+                               error={"code": "invalid_url", "message": f"unsupported url {request.get('url')}"}))
+        elif server.error_rate and server.random.random() < server.error_rate:
+            errors.append(dict(result, response={"status_code": 429, "request_id": result["id"],
+                                                 "body": {"error": {"message": "mock rate limit"}}}))
+        else:
+            malformed = server.malformed_rate and server.random.random() < server.malformed_rate
+            content = mock_reply(body.get("messages", []), malformed)
+            output.append(dict(result, response={"status_code": 200, "request_id": result["id"],
+                                                 "body": completion(body, content, f"chatcmpl-{result['id']}")}))
+        batch["request_counts"].update(completed=len(output), failed=len(errors))
+
+    batch["status"] = "finalizing"
+    for key, results in (("output_file_id", output), ("error_file_id", errors)):
+        if results:
+            data = "".join(json.dumps(result) + "\n" for result in results).encode("utf-8")
+            batch[key] = server.add_file(f"{batch_id}_{key[:-8]}.jsonl", "batch_output", data)
+    batch.update(status="completed", completed_at=int(time.time()))
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    # keep-alive, so pooled clients reuse their connections as they would against a real endpoint
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path == "/v1/models":
+            return self.send_json(200, {"object": "list",
+                                        "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+        parts = path.split("/")
+        if path.startswith("/v1/files/") and parts[3] in self.server.files:
+            name, purpose, data = self.server.files[parts[3]]
+            if parts[4:] == ["content"]:
+                return self.send_bytes(200, data, "application/octet-stream")
+            return self.send_json(200, file_object(parts[3], name, purpose, data))
+        if path.startswith("/v1/batches/") and parts[3] in self.server.batches:
+            return self.send_json(200, self.server.batches[parts[3]])
+        self.send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        data = self.rfile.read(length)
+        server = self.server
+        server.requests += 1
+
+        path = self.path.rstrip("/")
+        if path == "/v1/files":
+            return self.upload(data)
+        if path == "/v1/batches":
+            return self.create_batch(json.loads(data or b"{}"))
+        if path != "/v1/chat/completions":
+            return self.send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+        body = json.loads(data or b"{}")
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            self.chat(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def chat(self, body):
+        server = self.server
+        if server.latency or server.latency_jitter:
+            time.sleep(server.latency + server.random.uniform(0, server.latency_jitter))
+        if server.error_rate and server.random.random() < server.error_rate:
+            return self.send_json(429, {"error": {"message": "mock rate limit"}}, {"Retry-After": "0"})
+
+        malformed = server.malformed_rate and server.random.random() < server.malformed_rate
+        content = mock_reply(body.get("messages", []), malformed)
+        if body.get("stream"):
+            return self.send_stream(body, content)
+        self.send_json(200, completion(body, content, f"chatcmpl-mock-{server.requests}"))
+
+    # multipart upload of a batch input file
+    def upload(self, data):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode("latin-1") + data)
+        fields = {}
+        for part in message.iter_parts():
+            fields[part.get_param("name", header="content-disposition")] = (part.get_filename(),
+                                                                            part.get_payload(decode=True))
+        if "file" not in fields:
+            return self.send_json(400, {"error": {"message": "missing file"}})
+        name, content = fields["file"]
+        purpose = fields.get("purpose", (None, b"batch"))[1].decode("utf-8")
+        file_id = self.server.add_file(name or "upload.jsonl", purpose, content)
+        self.send_json(200, file_object(file_id, name, purpose, content))
+
+    def create_batch(self, body):
+        server = self.server
+        if body.get("input_file_id") not in server.files:
+            return self.send_json(400, {"error": {"message": f"no file {body.get('input_file_id')}"}})
+        total = sum(1 for line in server.files[body["input_file_id"]][2].splitlines() if line.strip())
+        with server.lock:
+            batch_id = f"batch_mock_{len(server.batches) + 1}"
+            server.batches[batch_id] = {
+                "id": batch_id, "object": "batch", "endpoint": body.get("endpoint"), "errors": None,
+                "input_file_id": body["input_file_id"], "completion_window": body.get("completion_window", "24h"),
+                "status": "validating", "output_file_id": None, "error_file_id": None,
+                "created_at": int(time.time()), "in_progress_at": None, "completed_at": None,
+                "request_counts": {"total": total, "completed": 0, "failed": 0}, "metadata": body.get("metadata"),
+            }
+            # the batch as created; run_batch may finish it before the response goes out
+            created = json.loads(json.dumps(server.batches[batch_id]))
+        threading.Thread(target=run_batch, args=(server, batch_id), daemon=True).start()
+        self.send_json(200, created)
+
+    # server-sent events, one word per chunk; a client that hangs up early cancels the rest
+    def send_stream(self, body, content):
+        server = self.server
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # no Content-Length, so the end of the stream is the end of the connection
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = content.split(" ")
+        try:
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": f"chatcmpl-mock-{server.requests}",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word},
+                                 "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                server.streamed_tokens += 1
+                if server.token_latency:
+                    time.sleep(server.token_latency)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            server.cancelled += 1
+        self.close_connection = True
+
+    def send_json(self, status, payload, headers=None):
+        self.send_bytes(status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+    def send_bytes(self, status, data, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # room for a pooled client opening all of its connections at once
+    request_queue_size = 256
+
+    def add_file(self, name, purpose, data):
+        with self.lock:
+            file_id = f"file-mock-{len(self.files) + 1}"
+            self.files[file_id] = (name, purpose, data)
+        return file_id
+
+
+# Local stand-in for the OpenAI chat completions, files and batches APIs. Point a client at
+# http://host:port/v1 (see llm_eval.py --base-url) to evaluate without network or API key.
+def make_server(host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, malformed_rate=0.0, token_latency=0.0,
+                seed=0, verbose=False, latency_jitter=0.0, batch_latency=0.0):
+    server = MockServer((host, port), MockHandler)
+    server.latency = latency
+    # extra latency drawn uniformly from [0, latency_jitter], from the seeded generator
+    server.latency_jitter = latency_jitter
+    server.error_rate = error_rate
+    server.malformed_rate = malformed_rate
+    server.token_latency = token_latency
+    server.random = random.Random(seed)
+    server.verbose = verbose
+    server.requests = 0
+    server.connections = 0
+    server.streamed_tokens = 0
+    server.cancelled = 0
+    # chat requests being answered right now, and the most there have been at once
+    server.in_flight = 0
+    server.max_in_flight = 0
+    # seconds a batch stays in progress before its results are ready
+    server.batch_latency = batch_latency
+    server.files = {}
+    server.batches = {}
+    server.lock = threading.Lock()
+    return server
+
+
+# starts a server on a background thread and returns it with its base URL
+def start_server(**kwargs):
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible server returning deterministic rubric scores")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before each response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0,
+                        help="extra random latency of up to this many seconds per response")
+    parser.add_argument("--seed", type=int, default=0, help="seed for latency jitter, errors and malformed answers")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="fraction of combined requests answered with broken JSON")
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="seconds between streamed chunks when the client asks for stream=true")
+    parser.add_argument("--batch-latency", type=float, default=0.0,
+                        help="seconds a batch job stays in progress before its results are ready")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.error_rate, args.malformed_rate,
+                         args.token_latency, args.seed, args.verbose, args.latency_jitter, args.batch_latency)
+    print(f"Mock server listening on http://{args.host}:{server.server_address[1]}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import pytest
+
+
+# backend(**server_options) starts mock_server.py in-process and returns a Backend pointed at it
+@pytest.fixture
+def backend():
+    pytest.importorskip("openai")
+    from llm_backends import Backend
+    started = []
+
+    def start(**server_options):
+        started.append(Backend.mock(**server_options))
+        return started[-1]
+    yield start
+    for backend in started:
+        backend.close()
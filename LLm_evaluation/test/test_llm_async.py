@@ -0,0 +1,90 @@
+import asyncio
+import time
+import pytest
+
+pytest.importorskip("openai")
+from llm_async import AsyncEvaluator, TokenBucket
+from llm_eval import render_messages
+from llm_results import extract_score
+from mock_server import mock_reply
+
+PROMPTS = ["# 1.  Data representation\nRate:\n[Insert Code Here]", "# 2.  Documentation\nRate:\n[Insert Code Here]"]
+
+def jobs(count):
+    return [(f"train_{i}.py", f"x = {i}\n", prompt) for i in range(count) for prompt in PROMPTS]
+
+def evaluate(backend, jobs, **options):
+    async def run():
+        evaluator = AsyncEvaluator(backend.async_client, model=backend.model, **options)
+        try:
+            return evaluator, [row async for row in evaluator.evaluate(jobs)]
+        finally:
+            await backend.aclose()
+    return asyncio.run(run())
+
+def test_rows_map_back_to_their_requests(backend):
+    # jitter finishes requests out of submission order
+    backend = backend(latency=0.01, latency_jitter=0.05, seed=1)
+    evaluator, rows = evaluate(backend, jobs(10), concurrency=8)
+
+    assert len(rows) == 20
+    order = [(row["file"], row["rubric"]) for row in rows]
+    assert order != sorted(order)
+    for row in rows:
+        i = int(row["file"][6:-3])
+        prompt = PROMPTS[0] if row["rubric"].startswith("1.") else PROMPTS[1]
+        assert row["rationale"] == mock_reply(render_messages(f"x = {i}\n", prompt))
+        assert row.get("error") is None
+
+def test_concurrency_stays_within_the_limit(backend):
+    backend = backend(latency=0.05)
+    evaluate(backend, jobs(10), concurrency=3)
+    assert backend.server.max_in_flight == 3
+
+def test_rate_limited_requests_are_retried(backend):
+    backend = backend(error_rate=0.3, seed=2)
+    evaluator, rows = evaluate(backend, jobs(10), concurrency=4, backoff=0.01)
+    assert evaluator.retries > 0
+    assert all(row.get("error") is None for row in rows)
+    assert backend.server.requests == 20 + evaluator.retries
+
+def test_exhausted_retries_become_error_rows(backend):
+    backend = backend(error_rate=1.0)
+    evaluator, rows = evaluate(backend, jobs(1), max_retries=2, backoff=0.01)
+    assert [row["error"] for row in rows] == ["Error code: 429 - {'error': {'message': 'mock rate limit'}}"] * 2
+    assert backend.server.requests == 6
+
+def test_cut_off_streams_are_cached_and_replayed(tmp_path, backend):
+    from llm_cache import ResponseCache
+    backend = backend()
+    path = str(tmp_path / "cache.db")
+    messages = render_messages("x = 1\n", PROMPTS[0])
+
+    async def complete(cache):
+        evaluator = AsyncEvaluator(backend.async_client, model=backend.model, cache=cache, stream="until_score")
+        return await evaluator.complete(messages, stream=True)
+
+    async def run():
+        try:
+            cache = ResponseCache(path)
+            first = await complete(cache)
+            second = await complete(cache)
+            cache.close()
+            return first, second, await complete(ResponseCache(path, replay=True))
+        finally:
+            await backend.aclose()
+    first, second, replayed = asyncio.run(run())
+
+    assert first == second == replayed
+    assert extract_score(first) is not None and first != mock_reply(messages)
+    assert backend.server.requests == 1
+
+def test_token_bucket_paces_requests():
+    async def run():
+        bucket = TokenBucket(600, capacity=1)
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.monotonic() - start
+    # one token up front, then one every 0.1s
+    assert 0.35 < asyncio.run(run()) < 1.0
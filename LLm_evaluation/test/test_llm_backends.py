@@ -0,0 +1,69 @@
+import sys
+import types
+import pytest
+
+pytest.importorskip("openai")
+from llm_backends import DEFAULT_MODEL, MAX_CONNECTIONS, OPENAI_URL, Backend, default_api_key
+
+@pytest.fixture
+def environment(monkeypatch):
+    for name in ("LLM_MODEL", "LLM_BASE_URL", "LLM_API_KEY", "OPENAI_API_KEY"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setitem(sys.modules, "config", None)
+    return monkeypatch
+
+def test_api_key_precedence(environment):
+    assert default_api_key() is None
+    environment.setitem(sys.modules, "config", types.SimpleNamespace(API_KEY="from-config"))
+    assert default_api_key() == "from-config"
+    environment.setenv("OPENAI_API_KEY", "openai")
+    assert default_api_key() == "openai"
+    environment.setenv("LLM_API_KEY", "llm")
+    assert default_api_key() == "llm"
+
+def test_backend_from_environment(environment):
+    backend = Backend.from_environment()
+    assert (backend.model, backend.base_url, backend.endpoint) == (DEFAULT_MODEL, None, OPENAI_URL)
+    assert backend.max_connections == MAX_CONNECTIONS
+
+    environment.setenv("LLM_MODEL", "llama-3-70b")
+    environment.setenv("LLM_BASE_URL", "http://inference:8000/v1/")
+    backend = Backend.from_environment(max_connections=None)
+    assert (backend.model, backend.endpoint) == ("llama-3-70b", "http://inference:8000/v1")
+    # local servers get a placeholder key
+    assert backend.api_key == "unused"
+    assert backend.describe() == "llama-3-70b at http://inference:8000/v1/"
+
+    backend = Backend.from_environment(model="qwen", max_connections=4)
+    assert (backend.model, backend.max_connections) == ("qwen", 4)
+    assert backend.client.base_url == "http://inference:8000/v1/"
+
+def test_requests_share_pooled_connections(backend):
+    backend = backend(latency=0.001)
+    for i in range(10):
+        response = backend.create([{"role": "user", "content": f"q{i}"}], max_tokens=10)
+        assert response.choices[0].message.content.startswith("Score: ")
+    assert (backend.server.requests, backend.server.connections) == (10, 1)
+    assert backend.client.models.list().data[0].id == "mock"
+
+def test_mock_backends_share_cache_keys(backend):
+    first, second = backend(), backend()
+    assert first.base_url != second.base_url
+    messages = [{"role": "user", "content": "rate"}]
+    assert first.request_key(messages, max_tokens=5) == second.request_key(messages, max_tokens=5)
+    assert first.request_key(messages, max_tokens=5) != Backend("mock").request_key(messages, max_tokens=5)
+
+def test_main_evaluates_against_the_mock(tmp_path, capsys):
+    from llm_eval import main
+    code = tmp_path / "train.py"
+    code.write_text("import pandas as pd\n")
+    (tmp_path / "copy.py").write_text("import pandas as pd\n")
+    prompts = tmp_path / "prompts.txt"
+    prompts.write_text("# 1.  Data representation\nRate:\n[Insert Code Here]\n")
+    out = tmp_path / "results.csv"
+    assert main([str(tmp_path), "--prompts", str(prompts), "--mock", "--model", "local", "--results", str(out)]) is None
+    lines = out.read_text().splitlines()
+    assert lines[0] == "file,rubric,score,rationale,mode,error,duplicate_of" and len(lines) > 2
+    err = capsys.readouterr().err
+    assert "Evaluating with local at http://127.0.0.1:" in err
+    assert "Found 2 files, 1 unique" in err
@@ -0,0 +1,113 @@
+import argparse
+import json
+import pytest
+
+pytest.importorskip("openai")
+from llm_batch import BatchJob, BatchJobs, run_batch
+from llm_eval import complete, render_messages
+from llm_results import ResultsTable
+from llm_rubrics import section_row
+
+PROMPTS = ['# 1.  Data representation\nprompt = """Rate the data handling.\n**Code:**\n[Insert Code Here]"""\n',
+           '# 2.  Documentation\nprompt = """Rate the documentation.\n**Code:**\n[Insert Code Here]"""\n']
+
+def write_files(tmp_path, count=3):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"train_{i}.py"
+        path.write_text(f"import pandas as pd\nX = pd.read_csv('data_{i}.csv')\n")
+        paths.append(str(path))
+    return paths
+
+def sweep(tmp_path, backend, files, cache=None, **options):
+    args = argparse.Namespace(batch_dir=str(tmp_path / "batches"), poll_interval=0.05, no_wait=False,
+                              combined=False, condense=False, keep_comments=False)
+    vars(args).update(options)
+    out = tmp_path / "results.jsonl"
+    table = ResultsTable(str(out))
+    run_batch(files, PROMPTS, args, cache, table, backend)
+    table.close()
+    return [json.loads(line) for line in out.read_text().splitlines()]
+
+def test_batch_answers_match_interactive_path(tmp_path, backend):
+    backend = backend()
+    files = write_files(tmp_path)
+    rows = sweep(tmp_path, backend, files)
+
+    assert len(rows) == 6
+    assert len(backend.server.batches) == 1
+    for row in rows:
+        prompt = PROMPTS[0] if row["rubric"].startswith("1.") else PROMPTS[1]
+        with open(row["file"]) as f:
+            content = complete(render_messages(f.read(), prompt), backend=backend)
+        assert row == dict(section_row(row["file"], prompt, content), error=None, duplicate_of=None)
+
+def test_resubmission_is_idempotent(tmp_path, backend):
+    backend = backend(batch_latency=0.3)
+    files = write_files(tmp_path)
+    assert sweep(tmp_path, backend, files, no_wait=True) == []
+    assert sweep(tmp_path, backend, files, no_wait=True) == []
+    assert len(backend.server.batches) == 1
+
+    rows = sweep(tmp_path, backend, files)
+    assert len(rows) == 6 and all(row["error"] is None for row in rows)
+    # answered requests are served from the batch directory
+    assert sweep(tmp_path, backend, files) == rows
+    assert len(backend.server.batches) == 1
+
+def test_cache_counts_each_request_once(tmp_path, backend):
+    from llm_cache import ResponseCache
+    backend = backend()
+    files = write_files(tmp_path)
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    rows = sweep(tmp_path, backend, files, cache)
+    assert (cache.hits, cache.misses) == (0, 6)
+
+    # a fresh batch directory is answered from the cache alone
+    assert sweep(tmp_path, backend, files, cache, batch_dir=str(tmp_path / "again")) == rows
+    assert (cache.hits, cache.misses) == (6, 6)
+    assert len(backend.server.batches) == 1
+
+def test_batch_final_at_creation_is_collected(tmp_path, backend):
+    backend = backend()
+    jobs = [BatchJob(backend, path, f"x = {i}\n", [PROMPTS[0]]) for i, path in enumerate(write_files(tmp_path))]
+    batches = BatchJobs(backend, str(tmp_path / "batches"), poll_interval=0.05)
+    assert batches.submit({job.custom_id: job.line for job in jobs}) == 3
+    # a create response that already reports the batch as done
+    for batch in batches.batches.values():
+        batch["status"] = "completed"
+    batches.wait()
+    assert all(batches.answer(job.custom_id)[1] is None for job in jobs)
+
+    # a crash before collecting leaves the batch to the next run, which doesn't submit it again
+    batches = BatchJobs(backend, str(tmp_path / "batches"))
+    assert batches.submit({job.custom_id: job.line for job in jobs}) == 0
+    assert len(backend.server.batches) == 1
+
+def test_failed_requests_are_resubmitted(tmp_path, backend):
+    backend = backend(error_rate=0.5, seed=3)
+    files = write_files(tmp_path, 6)
+    rows = sweep(tmp_path, backend, files)
+    failed = [row for row in rows if row["error"]]
+    assert 0 < len(failed) < len(rows)
+    assert failed[0]["error"] == "mock rate limit"
+
+    backend.server.error_rate = 0
+    rows = sweep(tmp_path, backend, files)
+    assert all(row["error"] is None for row in rows)
+    retried = backend.server.batches["batch_mock_2"]["request_counts"]["total"]
+    assert retried == len(failed)
+
+def test_combined_batches(tmp_path, backend):
+    backend = backend()
+    rows = sweep(tmp_path, backend, write_files(tmp_path), combined=True)
+    assert len(rows) == 6
+    assert {row["mode"] for row in rows} == {"combined"}
+    assert len(backend.server.batches) == 1
+
+def test_malformed_combined_answers_go_to_a_second_round(tmp_path, backend):
+    backend = backend(malformed_rate=1.0)
+    rows = sweep(tmp_path, backend, write_files(tmp_path), combined=True)
+    assert len(rows) == 6
+    assert {row["mode"] for row in rows} == {"per_section"}
+    assert len(backend.server.batches) == 2
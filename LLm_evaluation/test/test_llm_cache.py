@@ -0,0 +1,52 @@
+import pytest
+from llm_cache import CacheMiss, ResponseCache, replaying, request_key
+
+MESSAGES = [{"role": "user", "content": "rate this"}]
+
+def test_hits_misses_and_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_entries=2)
+    keys = [request_key("gpt", MESSAGES, max_tokens=n) for n in range(3)]
+    assert cache.get(keys[0]) is None
+    for i, key in enumerate(keys):
+        cache.put(key, "gpt", f"answer {i}")
+        cache.get(keys[-1 if i == 2 else i])
+    assert cache.get(keys[2]) == "answer 2"
+    # the least recently used answer went first
+    assert cache.get(keys[0]) is None
+    assert (cache.hits, cache.misses) == (4, 2)
+    # peeking doesn't count
+    assert cache.contains(keys[1]) and not cache.contains(keys[0])
+    assert (cache.hits, cache.misses) == (4, 2)
+    cache.close()
+    assert ResponseCache(str(tmp_path / "cache.db")).get(keys[1]) == "answer 1"
+
+def test_keys_depend_on_endpoint_model_and_params():
+    key = request_key("gpt", MESSAGES, endpoint="https://api.openai.com/v1", max_tokens=500)
+    assert key == request_key("gpt", MESSAGES, endpoint="https://api.openai.com/v1", max_tokens=500)
+    assert key != request_key("gpt", MESSAGES, endpoint="http://localhost:8000/v1", max_tokens=500)
+    assert key != request_key("gpt-mini", MESSAGES, endpoint="https://api.openai.com/v1", max_tokens=500)
+    assert key != request_key("gpt", MESSAGES, endpoint="https://api.openai.com/v1", max_tokens=100)
+
+def test_replay_misses_name_the_request(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), replay=True)
+    with pytest.raises(CacheMiss, match=r"^train\.py \| 1\.  Data representation: no cached response for request "):
+        with replaying("train.py", "1.  Data representation"):
+            cache.get(request_key("gpt", MESSAGES))
+
+def test_replay_runs_without_requests(tmp_path, capsys):
+    pytest.importorskip("openai")
+    from llm_eval import main
+    code = tmp_path / "train.py"
+    code.write_text("import pandas as pd\n")
+    prompts = tmp_path / "prompts.txt"
+    prompts.write_text("# 1.  Data representation\nRate:\n[Insert Code Here]\n---\n# 2.  Documentation\nRate:\n[Insert Code Here]\n")
+    args = [str(code), "--prompts", str(prompts), "--mock", "--cache", str(tmp_path / "cache.db")]
+
+    assert main(args + ["--results", str(tmp_path / "first.csv")]) is None
+    assert main(args + ["--results", str(tmp_path / "replay.csv"), "--replay"]) is None
+    assert (tmp_path / "replay.csv").read_text() == (tmp_path / "first.csv").read_text()
+    assert "Response cache: 2 hits, 0 misses" in capsys.readouterr().err
+
+    code.write_text("import numpy as np\n")
+    assert main(args + ["--results", str(tmp_path / "replay.csv"), "--replay"]) == 1
+    assert f"Replay stopped: {code} | 1.  Data representation: no cached response" in capsys.readouterr().err
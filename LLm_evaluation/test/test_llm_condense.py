@@ -0,0 +1,151 @@
+import ast
+import os
+import pytest
+from llm_condense import condense, condense_stats
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+AUDITED = '''"""Train a classifier on the census split and audit it for bias.
+
+Underrepresented groups are reweighted before training, and the model is
+audited with disparate impact and equal opportunity per protected group.
+"""
+import pandas as pd
+import numpy as np
+import json
+from sklearn.linear_model import LogisticRegression
+from aif360.sklearn.metrics import disparate_impact_ratio, equal_opportunity_difference
+
+# category levels seen in the census data, kept for documentation
+LEVELS = ["Private", "Self-emp-not-inc", "Self-emp-inc", "Federal-gov", "Local-gov", "State-gov",
+          "Without-pay", "Never-worked", "Unknown", "Other"]
+
+def report(name, value):
+    """Print one audit metric."""
+    print(name, value)  # printed for the audit log
+
+def unused_helper(frame):
+    """Never called."""
+    return frame.describe()
+
+@register_metric
+def selection_rate(pred):
+    """Registered with the audit framework, which calls it by name."""
+    return pred.mean()
+
+train = pd.read_csv("train.csv")
+# missing demographic values are filled instead of dropped, so no group shrinks
+train = train.fillna({"race": "Unknown"})
+# check whether any group is underrepresented before training
+print(train["sex"].value_counts())
+if False:
+    train = train.sample(100)
+X, y = train.drop(columns=["label"]), train["label"]
+# class_weight balances the classes; coefficients are logged to explain the model
+model = LogisticRegression(class_weight="balanced").fit(X, y)
+print(dict(zip(X.columns, model.coef_[0])))
+pred = model.predict(X)
+for group, rows in train.groupby("sex"):
+    report(f"accuracy for group {group}", (pred[rows.index] == y[rows.index]).mean())
+report("disparate_impact", disparate_impact_ratio(y, pred, prot_attr=train["sex"]))
+report("equal_opportunity", equal_opportunity_difference(y, pred, prot_attr=train["sex"]))
+'''
+
+# what a grader can see for each prompt.txt section; a section scores 2 per piece of evidence in the code
+EVIDENCE = {
+    "data representation": ["value_counts", "underrepresent", "missing", "fillna", "isnull"],
+    "preprocessing": ["anonymi", "privacy", "drop(columns", "hash"],
+    "transparency": ["explain", "coef_", "class_weight", "#", "document", "reweight"],
+    "disaggregated": ["groupby", "per protected group", "for group", "sex"],
+    "bias auditing": ["disparate_impact", "equal_opportunity", "audit", "bias"],
+}
+
+def grade(code):
+    code = code.lower()
+    return {section: min(10, 2 * sum(term in code for term in terms)) for section, terms in EVIDENCE.items()}
+
+def fixtures():
+    with open(os.path.join(HERE, "..", "train_updated.py")) as f:
+        return {"train_updated": f.read(), "audited": AUDITED}
+
+@pytest.mark.parametrize("name", ["train_updated", "audited"])
+def test_scores_are_stable_when_comments_are_kept(name):
+    source = fixtures()[name]
+    condensed = condense(source, keep_comments=True)
+    ast.parse(condensed)
+    assert grade(condensed) == grade(source)
+    assert condense_stats(source, condensed)["ratio"] < 1
+
+def test_comments_and_docstrings_are_stripped_by_default():
+    source = fixtures()["train_updated"]
+    condensed = condense(source)
+    ast.parse(condensed)
+    assert condense_stats(source, condensed)["ratio"] < 0.8
+    # what the code itself shows survives
+    assert "disparate_impact_ratio(" in condensed and "class_weight" in condensed
+
+    condensed = condense(AUDITED)
+    assert "Train a classifier" not in condensed and "Print one audit metric" not in condensed
+    assert "# missing demographic values" not in condensed and "# printed for the audit log" not in condensed
+    assert "def report(name, value):\n    print(name, value)\n" in condensed
+
+def test_comments_and_docstrings_are_kept():
+    condensed = condense(AUDITED, keep_comments=True)
+    assert condensed.startswith("'Train a classifier on the census split and audit it for bias.\\n\\n"
+                                "Underrepresented groups are reweighted")
+    assert "# missing demographic values are filled instead of dropped, so no group shrinks\n" in condensed
+    # trailing comments move to the line after their statement
+    assert "    print(name, value)\n    # printed for the audit log\n" in condensed
+    assert '    """Print one audit metric."""' in condensed
+
+def test_dead_code_literals_and_unused_definitions():
+    condensed = condense(AUDITED)
+    assert "import json" not in condensed and "unused_helper" not in condensed
+    assert "train.sample(100)" not in condensed
+    assert "'Never-worked', ...]" in condensed
+    # decorated definitions are reached through their decorator
+    assert "@register_metric\ndef selection_rate(pred):" in condensed
+
+def test_comments_in_awkward_places():
+    source = ("@app.route('/')\n# between decorator and def\ndef index():  # header comment\n    if x:\n"
+              "        y = 1;  # after a semicolon\n    # before else\n    else:\n        y = 2\n    return y\n"
+              "class A:\n    # first in a class body\n    pass\nindex()\n")
+    condensed = condense(source, keep_comments=True)
+    ast.parse(condensed)
+    assert "# after a semicolon" in condensed and "# before else" in condensed
+    assert "class A:\n    # first in a class body\n" in condensed
+    assert "between decorator" not in condensed and "header comment" not in condensed
+
+def test_emptied_finally_keeps_a_try_valid():
+    source = "import os\ntry:\n    os.remove('x')\nfinally:\n    if False:\n        print('never')\n"
+    condensed = condense(source)
+    ast.parse(condensed)
+    assert "finally:\n    pass" in condensed
+
+def test_unparsable_code_is_sent_as_is():
+    assert condense("def broken(:\n    pass\n") == "def broken(:\n    pass\n"
+
+def test_del_and_assignment_targets_keep_every_name():
+    source = f"a = b = c = d = e = f = g = h = i = 0\nx = {list(range(40))}\ndel (a, b, c, d, e, f, g, h, i)\n" \
+             "a, b, c, d, e, f, g, h, i = range(9)\nprint(a, x)\n"
+    condensed = condense(source)
+    ast.parse(condensed)
+    assert "del (a, b, c, d, e, f, g, h, i)" in condensed
+    assert "a, b, c, d, e, f, g, h, i = range(9)" in condensed
+    assert "x = [0, 1, 2, 3, 4, 5, 6, 7, ...]" in condensed
+
+def test_stdlib_module_still_parses():
+    import datetime
+    with open(datetime.__file__) as f:
+        ast.parse(condense(f.read()))
+
+def test_modules_that_are_not_scripts_keep_their_functions():
+    source = ("import pytest\nnp = pytest.importorskip('numpy')\npytest.importorskip('pandas')\n\n"
+              "def test_sum():\n    assert np.sum([1, 2]) == 3\n\nclass Helper:\n    pass\n")
+    assert "def test_sum" in condense(source)
+    # helpers defined before the script's top-level code are still dropped when unused
+    assert "helper" not in condense("def helper():\n    pass\n\nprint(sum(range(10)))\n")
+
+def test_nothing_to_drop_returns_the_source():
+    source = "def f(x) :\n    return {'a' : x}\n"
+    assert condense(source) == source
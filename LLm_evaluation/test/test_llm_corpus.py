@@ -0,0 +1,27 @@
+import csv
+import functools
+import json
+from fairness_corpus import discover
+from llm_results import ResultsTable
+
+
+def test_duplicates_are_scored_once(tmp_path):
+    (tmp_path / "a.py").write_text("print(1)\n")
+    (tmp_path / "b.py").write_text("print(1)\n")
+    (tmp_path / "c.py").write_text("print(2)\n")
+    (tmp_path / "notes.txt").write_text("print(1)\n")
+    corpus = discover([str(tmp_path)], (".py",))
+    assert corpus.unique() == [str(tmp_path / "a.py"), str(tmp_path / "c.py")]
+    rows = list(corpus.fan_out({"file": str(tmp_path / "a.py"), "score": 7}, key="file"))
+    assert rows[1] == {"file": str(tmp_path / "b.py"), "score": 7, "duplicate_of": str(tmp_path / "a.py")}
+    assert corpus.summary() == "3 files, 2 unique (1 duplicates skipped)"
+
+    # the results table keeps the link from a duplicate to the file that was scored
+    for name in ("results.jsonl", "results.csv"):
+        table = ResultsTable(str(tmp_path / name), functools.partial(corpus.fan_out, key="file"))
+        table.add({"file": str(tmp_path / "a.py"), "rubric": "Bias auditing", "score": 7})
+        table.close()
+        with open(tmp_path / name) as f:
+            rows = list(csv.DictReader(f)) if name.endswith(".csv") else [json.loads(line) for line in f]
+        assert [row["duplicate_of"] or None for row in rows] == [None, str(tmp_path / "a.py")]
+
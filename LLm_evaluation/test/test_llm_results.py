@@ -0,0 +1,57 @@
+import pytest
+from llm_results import ScoreStream, extract_score
+
+def streamed(chunks):
+    parser = ScoreStream()
+    for read, chunk in enumerate(chunks, 1):
+        if parser.feed(chunk) is not None:
+            return parser.score, read
+    return parser.score, None
+
+@pytest.mark.parametrize("text, score", [
+    ("Score: 7/10\nThe code...", 7),
+    ("**Score:** 7.5 out of 10", 7.5),
+    ("The overall score is 4.", 4),
+    ("- Gaps: 6/10\n- Strategy: 4/10\nOverall score: 5/10", 5),
+    ("- Gaps: 6/10\n- Strategy: 4/10", 6),
+    ("Score: 85 (percent), i.e. 8/10", 8),
+    ("no score here", None),
+])
+def test_extract_score(text, score):
+    assert extract_score(text) == score
+
+@pytest.mark.parametrize("chunks, score, read", [
+    (["Score: 7", ".", "5/10", "\n"], 7.5, 4),
+    (["Overall score: ", "8", ".", "5", " out of 10", "."], 8.5, 6),
+    (["Score: 1", "0/10", " because"], 10, 3),
+    (["Score: 7\n", "The code"], 7, 1),
+    # criterion lines don't stand in for an overall score that may still come
+    (["- Gaps: 6/10\n", "- Strategy: 4/10\n", "Overall score: 5/10", "\n"], 5, 4),
+    (["Score: 7. The code"], None, None),
+])
+def test_partial_scores_wait_for_a_terminator(chunks, score, read):
+    assert streamed(chunks) == (score, read)
+    if score is not None:
+        # a score found early is the score of the whole answer
+        assert extract_score("".join(chunks)) == score
+
+def test_cut_off_streams_are_cached_and_replayed(tmp_path, backend):
+    from llm_cache import ResponseCache
+    from llm_eval import stream_score
+    backend = backend()
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path)
+    messages = [{"role": "user", "content": "rate this"}]
+
+    content, score = stream_score(messages, cache, backend=backend)
+    assert score is not None and content.startswith(f"Score: {score}/10")
+    assert stream_score(messages, cache, backend=backend) == (content, score)
+    assert (cache.hits, backend.server.requests) == (1, 1)
+    cache.close()
+
+    replay = ResponseCache(path, replay=True)
+    assert stream_score(messages, replay, backend=backend) == (content, score)
+    # the cut-off answer never stands in for the full rationale
+    full, full_score = stream_score(messages, ResponseCache(path), keep_rationale=True, backend=backend)
+    assert full_score == score and len(full) > len(content)
+    assert backend.server.requests == 2
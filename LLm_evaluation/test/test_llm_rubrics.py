@@ -0,0 +1,54 @@
+import json
+import pytest
+
+pytest.importorskip("openai")
+from llm_rubrics import evaluate_combined, parse_combined, render_combined_messages, rubric_body
+from mock_server import mock_reply
+
+PROMPTS = ['# 1.  Data representation\nfairness_prompt="""\nCheck the gaps.\n\n**Code:**\n[Insert Code Here]\n"""\n',
+           '# 2.  Documentation\nfairness_prompt="""\nCheck the docs.\n\n**Code:**\n[Insert Code Here]\n"""\n']
+
+def answer(*scores):
+    return json.dumps({"sections": [{"section": str(i), "score": s, "rationale": f"r{i}"}
+                                    for i, s in enumerate(scores, 1)]})
+
+def test_combined_request_has_every_section_and_the_code_once():
+    assert rubric_body(PROMPTS[0]) == "Check the gaps."
+    prompt = render_combined_messages("x = 1\n", PROMPTS)[1]["content"]
+    assert "## Section 1: 1.  Data representation\nCheck the gaps." in prompt
+    assert "## Section 2: 2.  Documentation\nCheck the docs." in prompt
+    assert prompt.count("x = 1") == 1 and "[Insert Code Here]" not in prompt
+    # the mock answers every section it finds
+    assert [row["rubric"] for row in parse_combined(mock_reply([{"content": prompt}]), PROMPTS)] == \
+        ["1.  Data representation", "2.  Documentation"]
+
+def test_parse_combined():
+    rows = parse_combined("```json\n" + answer(7, 2.5) + "\n```", PROMPTS)
+    assert [(row["score"], row["rationale"], row["mode"]) for row in rows] == [(7, "r1", "combined"),
+                                                                             (2.5, "r2", "combined")]
+
+@pytest.mark.parametrize("content, message", [
+    (answer(7), "section 2 missing"),
+    (answer(7, 11), "section 2 has invalid score 11"),
+    (answer(7, True), "section 2 has invalid score True"),
+    (answer(7, "8"), "section 2 has invalid score '8'"),
+    ('{"scores": []}', "unexpected combined answer structure"),
+    ('{"sections": [{"section": "1", "score": ', "Expecting value"),
+])
+def test_parse_combined_rejects_unusable_answers(content, message):
+    with pytest.raises(ValueError, match=message):
+        parse_combined(content, PROMPTS)
+
+def test_malformed_combined_answer_falls_back_per_section():
+    requests = []
+    def complete(messages, **params):
+        requests.append(params)
+        if "## Section" in messages[1]["content"]:
+            return answer(7)
+        return "Score: 4/10\nok"
+    rows = evaluate_combined("train.py", "x = 1\n", PROMPTS, complete)
+    assert [(row["file"], row["score"], row["mode"]) for row in rows] == [("train.py", 4, "per_section")] * 2
+    assert requests[0]["response_format"] == {"type": "json_object"} and len(requests) == 3
+
+    rows = evaluate_combined("train.py", "x = 1\n", PROMPTS, lambda messages, **params: answer(7, 3))
+    assert [(row["file"], row["score"]) for row in rows] == [("train.py", 7), ("train.py", 3)]
@@ -0,0 +1,150 @@
+import argparse
+import ast
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fairness_rules import BIAS_LIBS, DATA_LIBS, ENCODERS, EVALUATION_FUNCS, METRICS, TRAINING_TERMS  # noqa: E402
+from flake8_pluggin_eval import Fairnessevaluator  # noqa: E402
+
+SIZES = [100, 1000, 10000, 100000]
+OTHER_LIBS = ["os", "json", "re", "math", "torch", "matplotlib.pyplot", "scipy.stats", "collections"]
+OTHER_CALLS = ["fit", "predict", "transform", "read_csv", "mean", "append", "print", "len", "merge", "groupby"]
+
+
+# Synthetic training script of exactly `lines` lines. The share of imports, calls and function
+# definitions is controlled; vocab_rate is the fraction of them that use rule vocabulary.
+def generate_script(lines, import_rate=0.02, call_rate=0.4, def_rate=0.05, vocab_rate=0.1, seed=0):
+    rng = random.Random(seed)
+    libs = list(DATA_LIBS) + list(BIAS_LIBS)
+    calls = list(METRICS) + list(EVALUATION_FUNCS) + list(ENCODERS) + list(TRAINING_TERMS)
+    calls = [c for c in calls if c.isidentifier()]
+    out = []
+    while len(out) < lines:
+        r = rng.random()
+        vocab = rng.random() < vocab_rate
+        if r < import_rate:
+            lib = rng.choice(libs if vocab else OTHER_LIBS)
+            out.append(f"import {lib}" if rng.random() < 0.5 else f"from {lib} import helper_{len(out)}")
+        elif r < import_rate + def_rate and len(out) + 2 <= lines:
+            name = rng.choice(list(TRAINING_TERMS)) if vocab else "step"
+            out.append(f"def {name}_{len(out)}(data, weights=None):")
+            out.append(f"    return data.{rng.choice(OTHER_CALLS)}(weights)")
+        elif r < import_rate + def_rate + call_rate:
+            fn = rng.choice(calls if vocab else OTHER_CALLS)
+            out.append(f"result_{len(out)} = model.{fn}(X_{len(out) % 7}, y, sensitive_features=group)")
+        elif r < import_rate + def_rate + call_rate + 0.1:
+            out.append(f"# step {len(out)}: prepare features for the next stage")
+        else:
+            out.append(f"value_{len(out)} = value_{max(0, len(out) - 1)} * 0.5 + {rng.randint(0, 100)}")
+    return "\n".join(out[:lines]) + "\n"
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def evaluate(tree, checks=None):
+    checker = Fairnessevaluator(tree)
+    if checks is not None:
+        checker.checks = checks
+    checker.evaluate()
+    return checker
+
+
+def bench_size(lines, repeat, **shape):
+    source = generate_script(lines, **shape)
+    tree = ast.parse(source)
+    checker = evaluate(tree)
+    row = {
+        "lines": lines,
+        "bytes": len(source.encode("utf-8")),
+        "nodes": checker.nodes_visited,
+        "score": checker.score,
+        "parse_s": best_of(repeat, lambda: ast.parse(source)),
+        "prescan_s": best_of(repeat, lambda: Fairnessevaluator.prefilter.scan(source)),
+        "run_s": best_of(repeat, lambda: evaluate(tree)),
+        # each rule on its own, i.e. a walk that only feeds that rule
+        "rules_s": {check: best_of(repeat, lambda: evaluate(tree, [check])) for check in Fairnessevaluator.checks},
+    }
+
+    gc.collect()
+    tracemalloc.start()
+    evaluate(ast.parse(source))
+    row["peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+    tracemalloc.stop()
+    return row
+
+
+# prints per-size ratios against a previous report and returns the worst run_s ratio
+def compare(report, baseline):
+    previous = {row["lines"]: row for row in baseline["results"]}
+    worst = 0.0
+    for row in report["results"]:
+        old = previous.get(row["lines"])
+        if old is None:
+            continue
+        ratio = row["run_s"] / old["run_s"] if old["run_s"] else float("inf")
+        worst = max(worst, ratio)
+        print(f"{row['lines']:>8} lines  run {old['run_s']*1e3:9.2f} -> {row['run_s']*1e3:9.2f} ms  ({ratio:.2f}x)"
+              f"  peak {old['peak_kb']} -> {row['peak_kb']} KiB")
+    return worst
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Fairnessevaluator on synthetic training scripts")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="script sizes in lines")
+    parser.add_argument("--repeat", type=int, default=3, help="timings are the best of this many runs")
+    parser.add_argument("--import-rate", type=float, default=0.02)
+    parser.add_argument("--call-rate", type=float, default=0.4)
+    parser.add_argument("--def-rate", type=float, default=0.05)
+    parser.add_argument("--vocab-rate", type=float, default=0.1)
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=1.2,
+                        help="with --compare, exit with status 1 if run time grows by more than this factor")
+    args = parser.parse_args(argv)
+
+    shape = {"import_rate": args.import_rate, "call_rate": args.call_rate,
+             "def_rate": args.def_rate, "vocab_rate": args.vocab_rate}
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "ruleset": Fairnessevaluator.ruleset_version(), "repeat": args.repeat, "shape": shape,
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": [],
+    }
+    print(f"{'lines':>8} {'nodes':>9} {'parse ms':>10} {'run ms':>10} {'peak KiB':>9}  slowest rule")
+    for lines in args.sizes:
+        row = bench_size(lines, args.repeat, **shape)
+        report["results"].append(row)
+        slowest = max(row["rules_s"], key=row["rules_s"].get)
+        print(f"{lines:>8} {row['nodes']:>9} {row['parse_s']*1e3:>10.2f} {row['run_s']*1e3:>10.2f} "
+              f"{row['peak_kb']:>9}  {slowest} ({row['rules_s'][slowest]*1e3:.2f} ms)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            worst = compare(report, json.load(f))
+        if worst > args.max_regression:
+            print(f"run time regressed by {worst:.2f}x (limit {args.max_regression}x)", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
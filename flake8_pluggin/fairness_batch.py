@@ -0,0 +1,404 @@
+import argparse
+import ast
+import csv
+import json
+import os
+import sys
+from collections import Counter
+from multiprocessing import Pool
+
+import fairness_corpus
+import fairness_runtime
+from fairness_columns import ColumnStore
+from fairness_harness import Harness, stage_data
+from fairness_cache import DEFAULT_MAX_BYTES, content_key, open_cache, prepare
+from fairness_notebook import READ_ERRORS, NotebookEvaluator, read_cells
+from fairness_project import ProjectEvaluator
+from fairness_summary import CODES, ScoreSummary
+from flake8_pluggin_eval import Fairnessevaluator
+
+
+# sources under root, skipping checkpoint copies, caches and other artifacts (fairness_corpus.EXCLUDED_DIRS)
+def find_sources(root, extensions=(".py", ".ipynb")):
+    return [path for path, _ in fairness_corpus.scan(root, extensions)]
+
+
+# (path, max_bytes) of the result cache used by score_file in this process
+_cache_config = None
+# don't parse files the lexical pre-scan rules out entirely (--skip-unmatched)
+_skip_unmatched = False
+
+
+def configure(cache=None, skip_unmatched=False):
+    global _cache_config, _skip_unmatched
+    _cache_config = tuple(cache) if cache else None
+    _skip_unmatched = skip_unmatched
+
+
+# Files --skip-unmatched doesn't parse aren't syntax-checked either (a check costs as much as the parse
+# it saves), so one with a syntax error scores 0 instead of reporting it. Results of such runs are
+# cached apart from fully checked ones.
+def cache_ruleset(version):
+    return f"{version}-unchecked" if _skip_unmatched else version
+
+
+def result_row(path, checker, cached=False, parsed=True):
+    return {"path": path, "score": checker.score, "error": None, "results": checker.results, "cached": cached,
+            "parsed": parsed, "skipped_rules": len(checker.skipped_rules())}
+
+
+# parses the file once and scores it, unless an identical file was already scored; runs in the workers.
+# Rules the pre-scan rules out are not walked; with --skip-unmatched a file no rule can match is
+# scored without parsing it at all, see cache_ruleset().
+def score_file(path):
+    if path.endswith(".ipynb"):
+        return score_notebook(path)
+    cache = open_cache(*_cache_config) if _cache_config else None
+    checker = None
+    try:
+        with open(path, "rb") as f:
+            source = f.read()
+        if cache is not None:
+            key = content_key(source, cache_ruleset(Fairnessevaluator.ruleset_version()))
+            cached = cache.get(key)
+            if cached is not None:
+                return {"path": path, "score": cached["score"], "error": None, "results": cached["results"],
+                        "cached": True, "parsed": False, "skipped_rules": 0}
+        checker = Fairnessevaluator(None, filename=path)
+        parsed = bool(checker.prescan(source)) or not _skip_unmatched
+        if parsed:
+            checker.tree = ast.parse(source, filename=path)
+    except (OSError, SyntaxError, ValueError) as e:
+        return {"path": path, "score": None, "error": f"{type(e).__name__}: {e}", "results": {}, "cached": False,
+                "parsed": False, "skipped_rules": len(checker.skipped_rules()) if checker else 0}
+
+    checker.evaluate()
+    if cache is not None:
+        cache.put(key, checker.cache_entry())
+    return result_row(path, checker, parsed=parsed)
+
+
+# notebooks are keyed on their code cells only, so re-running a notebook (new outputs) keeps its cached result.
+# Cells that don't parse are skipped and listed in error; the score is None only when no cell parses.
+def score_notebook(path):
+    cache = open_cache(*_cache_config) if _cache_config else None
+    checker = None
+    try:
+        checker = NotebookEvaluator(read_cells(path), filename=path)
+    except READ_ERRORS as e:
+        return {"path": path, "score": None, "error": f"{type(e).__name__}: {e}", "results": {}, "cached": False,
+                "parsed": False, "skipped_rules": 0}
+    code = checker.code()
+    if cache is not None:
+        key = content_key(code, cache_ruleset(checker.ruleset_version()))
+        cached = cache.get(key)
+        if cached is not None:
+            return {"path": path, "score": cached["score"], "error": cached["error"], "results": cached["results"],
+                    "cached": True, "parsed": False, "skipped_rules": 0, "issues": cached["issues"]}
+
+    parsed = bool(checker.prescan(code)) or not _skip_unmatched
+    if parsed:
+        checker.parse()
+    if checker.errors and not checker.trees:
+        return {"path": path, "score": None, "error": "; ".join(checker.errors), "results": {}, "cached": False,
+                "parsed": False, "skipped_rules": len(checker.skipped_rules())}
+    checker.evaluate()
+    row = dict(result_row(path, checker, parsed=parsed), error="; ".join(checker.errors) or None, issues=checker.issues)
+    if cache is not None:
+        cache.put(key, dict(checker.cache_entry(), error=row["error"]))
+    return row
+
+
+# scores every .py file under root as one submission; files that don't parse are skipped and listed in error
+def score_project(root):
+    trees = {}
+    errors = []
+    for path in find_sources(root, (".py",)):
+        try:
+            with open(path, "rb") as f:
+                trees[path] = ast.parse(f.read(), filename=path)
+        except (OSError, SyntaxError, ValueError) as e:
+            errors.append(f"{path}: {type(e).__name__}: {e}")
+    if not trees:
+        return {"path": root, "score": None, "error": "; ".join(errors) or "no Python files", "results": {},
+                "cached": False, "files": 0, "issues": []}
+
+    project = ProjectEvaluator(trees, root if os.path.isdir(root) else os.path.dirname(root))
+    project.evaluate()
+    return {"path": root, "score": project.score, "error": "; ".join(errors) or None, "results": project.results,
+            "cached": False, "files": len(trees), "issues": project.issues}
+
+
+# yields results as workers finish them, in no particular order
+def score_files(paths, jobs, cache=None, score=score_file, skip_unmatched=False):
+    if jobs == 1:
+        configure(cache, skip_unmatched)
+        yield from map(score, paths)
+        return
+    # a few chunks per worker keeps the pool busy without a round trip per file
+    chunksize = max(1, min(64, len(paths) // (jobs * 4)))
+    with Pool(jobs, initializer=configure, initargs=(cache, skip_unmatched)) as pool:
+        yield from pool.imap_unordered(score, paths, chunksize=chunksize)
+
+
+class JsonlWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, row):
+        self.out.write(json.dumps(row) + "\n")
+
+
+class CsvWriter:
+    def __init__(self, out):
+        self.out = out
+        fields = ["path", "score", "error"]
+        for code in CODES:
+            fields += [f"{code}_found", f"{code}_missing"]
+        self.writer = csv.DictWriter(out, fieldnames=fields)
+        self.writer.writeheader()
+
+    def write(self, row):
+        flat = {"path": row["path"], "score": row["score"], "error": row["error"]}
+        for code, result in row["results"].items():
+            flat[f"{code}_found"] = ";".join(result["found"])
+            flat[f"{code}_missing"] = ";".join(result["missing"])
+        self.writer.writerow(flat)
+
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter}
+
+
+class RuntimeCsvWriter:
+    def __init__(self, out, intervals=False):
+        fields = ["path", "error", "rows"]
+        for name in fairness_runtime.METRICS:
+            fields += [name, f"{name}_low", f"{name}_high"] if intervals else [name]
+        self.writer = csv.DictWriter(out, fieldnames=fields, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write(self, row):
+        flat = dict(row, **row["metrics"])
+        for name, (low, high) in row.get("intervals", {}).items():
+            flat[f"{name}_low"] = low
+            flat[f"{name}_high"] = high
+        self.writer.writerow(flat)
+
+
+RUNTIME_WRITERS = {"jsonl": JsonlWriter, "csv": RuntimeCsvWriter}
+
+
+def open_output(path):
+    return sys.stdout if path == "-" else open(path, "w", newline="")
+
+
+def batch(args):
+    corpus = None
+    if args.project:
+        paths = args.paths
+    else:
+        # byte-identical files are scored once and the row is copied to every path
+        corpus = fairness_corpus.discover(args.paths)
+        paths = corpus.unique()
+        print(f"Found {corpus.summary()}", file=sys.stderr)
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "csv" if args.output.endswith(".csv") else "jsonl"
+
+    out = open_output(args.output)
+    try:
+        writer = WRITERS[fmt](out)
+        summary = ScoreSummary()
+        scored = cached = scanned = skipped_rules = unparsed = 0
+        cache = (args.cache, args.cache_size) if args.cache else None
+        if cache:
+            prepare(*cache)
+        score = score_project if args.project else score_file
+        for row in score_files(paths, args.jobs or os.cpu_count() or 1, cache, score, args.skip_unmatched):
+            scored += 1
+            cached += row["cached"]
+            if "skipped_rules" in row and not row["cached"]:
+                scanned += 1
+                skipped_rules += row["skipped_rules"]
+                unparsed += not row["parsed"] and row["error"] is None
+            for copy in corpus.fan_out(row) if corpus else (row,):
+                writer.write(copy)
+                summary.add_row(copy)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.summary:
+        summary.write(args.summary)
+    print(f"Scored {scored} {'projects' if args.project else 'files'} ({cached} from cache)", file=sys.stderr)
+    if scanned:
+        runs = scanned * len(Fairnessevaluator.checks)
+        print(f"Pre-scan skipped {skipped_rules} of {runs} rule runs ({skipped_rules / runs:.1%}), "
+              f"{unparsed} of {scanned} files not parsed or syntax-checked", file=sys.stderr)
+    return 0
+
+
+# fairness metrics of what the submissions predicted, from the submission.csv files they wrote
+def runtime(args):
+    if fairness_runtime.np is None:
+        print("fairness-eval runtime needs numpy (pip install flake8_pluggin_eval[runtime])", file=sys.stderr)
+        return 2
+    intersections = None
+    if args.intersect:
+        try:
+            buckets = {name: [float(edge) for edge in edges.split(",")]
+                       for name, _, edges in (spec.partition("=") for spec in args.bucket)}
+        except ValueError:
+            print(f"--bucket expects NAME=EDGE,EDGE,..., got {' '.join(args.bucket)}", file=sys.stderr)
+            return 2
+        intersections = fairness_runtime.Intersections(args.intersect, args.max_order, args.min_support, buckets,
+                                                       args.features)
+    metrics = fairness_runtime.SubmissionMetrics(args.label, args.prediction, args.protected, args.privileged,
+                                                 args.positive, store=args.store, bootstrap=args.bootstrap,
+                                                 seed=args.seed, confidence=args.confidence,
+                                                 intersections=intersections)
+    corpus = fairness_corpus.discover(args.paths, (args.name,))
+    print(f"Found {corpus.summary()}", file=sys.stderr)
+
+    fmt = args.format or ("csv" if args.output.endswith(".csv") else "jsonl")
+    out = open_output(args.output)
+    scored = failed = 0
+    try:
+        writer = RuntimeCsvWriter(out, args.bootstrap > 0) if fmt == "csv" else RUNTIME_WRITERS[fmt](out)
+        for row in score_files(corpus.unique(), args.jobs or os.cpu_count() or 1, score=metrics):
+            scored += 1
+            failed += row["error"] is not None
+            for copy in corpus.fan_out(row):
+                writer.write(copy)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Computed metrics for {scored - failed} submissions ({failed} unreadable)", file=sys.stderr)
+    return 0
+
+
+# converts CSVs (submissions, test_X.csv, test_y.csv, ...) into the column store once, so later runs
+# with --store map them instead of parsing text
+def ingest(args):
+    if fairness_runtime.np is None:
+        print("fairness-eval ingest needs numpy (pip install flake8_pluggin_eval[runtime])", file=sys.stderr)
+        return 2
+    store = ColumnStore(args.store)
+    corpus = fairness_corpus.discover(args.paths, (".csv",))
+    print(f"Found {corpus.summary()}", file=sys.stderr)
+    ingested = cached = 0
+    for row in score_files(corpus.unique(), args.jobs or os.cpu_count() or 1, score=store.ingest):
+        if row["error"] is not None:
+            print(f"{row['path']}: {row['error']}", file=sys.stderr)
+            continue
+        ingested += not row["cached"]
+        cached += row["cached"]
+    print(f"Ingested {ingested} files into {args.store} ({cached} already stored)", file=sys.stderr)
+    return 0
+
+
+# runs submission scripts in sandboxes against the staged datasets and collects what they output
+def run(args):
+    os.makedirs(args.results, exist_ok=True)
+    harness = Harness(args.results, cpus=args.cpus, cpu_time=args.cpu_time,
+                      memory=args.memory * 1024 * 1024 if args.memory else None, timeout=args.timeout,
+                      python=args.python)
+    if args.data:
+        harness.data = stage_data(args.data, args.results)
+    metrics = None
+    if args.metrics:
+        if fairness_runtime.np is None:
+            print("fairness-eval run --metrics needs numpy (pip install flake8_pluggin_eval[runtime])", file=sys.stderr)
+            return 2
+        metrics = fairness_runtime.SubmissionMetrics(store=os.path.join(args.results, "columns"))
+    corpus = fairness_corpus.discover(args.paths, (args.script,))
+    print(f"Found {corpus.summary()}", file=sys.stderr)
+
+    statuses = Counter()
+    with open(os.path.join(args.results, "results.jsonl"), "w") as out:
+        writer = JsonlWriter(out)
+        for row in harness.run_all(corpus.unique(), args.jobs):
+            statuses[row["status"]] += 1
+            if metrics is not None and row["submission"]:
+                result = metrics.score(row["submission"])
+                row["runtime"] = {key: value for key, value in result.items() if key != "path"}
+            for copy in corpus.fan_out(row):
+                writer.write(copy)
+    print(f"Ran {sum(statuses.values())} submissions: "
+          + ", ".join(f"{count} {status}" for status, count in sorted(statuses.items())), file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="fairness-eval")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    b = commands.add_parser("batch", help="score every .py and .ipynb file under the given paths")
+    b.add_argument("paths", nargs="+", help="files or directories to score")
+    b.add_argument("-o", "--output", default="-", help="output file, '-' for stdout (default)")
+    b.add_argument("-f", "--format", choices=sorted(WRITERS), help="output format, inferred from --output when omitted")
+    b.add_argument("-j", "--jobs", type=int, default=0, help="worker processes (default: all cores)")
+    b.add_argument("--project", action="store_true",
+                   help="score each path as one multi-file submission instead of file by file (no caching)")
+    b.add_argument("--skip-unmatched", action="store_true",
+                   help="don't parse files that contain no rule vocabulary; they score 0 without a syntax check")
+    b.add_argument("--summary", help="also write per-file and aggregate statistics to this JSON or CSV file")
+    b.add_argument("--cache", help="SQLite file caching results by file content, shared between runs and workers")
+    b.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES, help="maximum cache size in bytes")
+    b.set_defaults(func=batch)
+
+    r = commands.add_parser("runtime", help="compute fairness metrics from the predictions submissions wrote")
+    r.add_argument("paths", nargs="+", help="submission files or directories holding them")
+    r.add_argument("-o", "--output", default="-", help="output file, '-' for stdout (default)")
+    r.add_argument("-f", "--format", choices=sorted(RUNTIME_WRITERS),
+                   help="output format, inferred from --output when omitted")
+    r.add_argument("-j", "--jobs", type=int, default=0, help="worker processes (default: all cores)")
+    r.add_argument("--name", default="submission.csv", help="file name of the predictions in a directory")
+    r.add_argument("--label", default=fairness_runtime.LABEL, help="column with the true labels")
+    r.add_argument("--prediction", default=fairness_runtime.PREDICTION, help="column with the predicted labels")
+    r.add_argument("--protected", default=fairness_runtime.PROTECTED, help="column with the protected attribute")
+    r.add_argument("--privileged", default=fairness_runtime.PRIVILEGED, help="value of the privileged group")
+    r.add_argument("--positive", default=fairness_runtime.POSITIVE, help="favorable label value")
+    r.add_argument("--bootstrap", type=int, default=0, metavar="N",
+                   help="add percentile confidence intervals from N bootstrap replicates")
+    r.add_argument("--seed", type=int, default=0, help="random seed for --bootstrap")
+    r.add_argument("--confidence", type=float, default=0.95, help="confidence level for --bootstrap")
+    r.add_argument("--intersect", action="append", default=[], metavar="ATTR",
+                   help="protected attribute for intersectional subgroup metrics, repeat for each attribute")
+    r.add_argument("--max-order", type=int, default=None,
+                   help="largest number of attributes combined (default: all of them)")
+    r.add_argument("--min-support", type=int, default=fairness_runtime.MIN_SUPPORT,
+                   help="rows a subgroup needs to count towards the subgroup metrics")
+    r.add_argument("--bucket", action="append", default=[], metavar="ATTR=EDGES",
+                   help="cut a numeric attribute into buckets, e.g. age=25,45,65")
+    r.add_argument("--features", help="CSV next to each submission with the --intersect attributes, e.g. test_X.csv")
+    r.add_argument("--store", help="column store to read the CSVs through, ingesting the ones not stored yet")
+    r.set_defaults(func=runtime)
+
+    i = commands.add_parser("ingest", help="convert CSV files into a memory-mappable column store")
+    i.add_argument("paths", nargs="+", help="CSV files or directories holding them")
+    i.add_argument("--store", required=True, help="column store directory")
+    i.add_argument("-j", "--jobs", type=int, default=0, help="worker processes (default: all cores)")
+    i.set_defaults(func=ingest)
+
+    x = commands.add_parser("run", help="run submission scripts in parallel sandboxes and collect their outputs")
+    x.add_argument("paths", nargs="+", help="scripts or directories holding them")
+    x.add_argument("--results", required=True,
+                   help="results directory: results.jsonl, one job directory per script, staged data")
+    x.add_argument("--script", default="train_updated.py", help="file name of the scripts in a directory")
+    x.add_argument("--data", help="directory with the datasets the scripts read (train_X.csv, ...), staged once")
+    x.add_argument("-j", "--jobs", type=int, default=0, help="jobs at once (default: cores / --cpus)")
+    x.add_argument("--cpus", type=int, default=1, help="cores per job")
+    x.add_argument("--cpu-time", type=int, help="CPU seconds per job")
+    x.add_argument("--memory", type=int, help="address space per job in MiB")
+    x.add_argument("--timeout", type=float, help="wall-clock seconds per job")
+    x.add_argument("--python", help="interpreter to run the scripts with (default: this one)")
+    x.add_argument("--metrics", action="store_true", help="compute runtime fairness metrics from each submission.csv")
+    x.set_defaults(func=run)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL);
+INSERT OR IGNORE INTO usage VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results
+    BEGIN UPDATE usage SET total = total + NEW.size; END;
+CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results
+    BEGIN UPDATE usage SET total = total - OLD.size; END;
+"""
+
+
+def content_key(source, ruleset):
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    h = hashlib.sha256(ruleset.encode("utf-8"))
+    h.update(b"\0")
+    h.update(source)
+    return h.hexdigest()
+
+
+# Scoring results keyed by content hash + rule-set version, stored in SQLite with size-bounded LRU
+# eviction. WAL mode and a busy timeout let batch workers and flake8 --jobs processes share one file;
+# each process opens its own connection through open_cache(), after prepare() set the file up.
+class ResultCache:
+    # last-access times are only refreshed this often, so warm reads don't turn into a write per file
+    touch_interval = 60
+    # the busy timeout doesn't cover switching a new file to WAL, so opening is retried with backoff
+    open_attempts = 5
+    open_backoff = 0.05
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        for attempt in range(self.open_attempts):
+            try:
+                self.db = self.connect(path)
+                break
+            except sqlite3.OperationalError:
+                if attempt == self.open_attempts - 1:
+                    raise
+                time.sleep(self.open_backoff * 2 ** attempt)
+
+    @staticmethod
+    def connect(path):
+        db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        try:
+            if db.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+                db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+        except sqlite3.OperationalError:
+            db.close()
+            raise
+        return db
+
+    def get(self, key):
+        row = self.db.execute("SELECT value, accessed FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        now = time.time()
+        if now - row[1] > self.touch_interval:
+            self.db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        data = json.dumps(value)
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.execute("DELETE FROM results WHERE key = ?", (key,))
+            self.db.execute("INSERT INTO results VALUES (?, ?, ?, ?)", (key, data, len(data), time.time()))
+            self.evict()
+
+    # drops least recently used entries until the store is back under max_bytes
+    def evict(self):
+        total = self.db.execute("SELECT total FROM usage").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in self.db.execute("SELECT key, size FROM results ORDER BY accessed"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.db.executemany("DELETE FROM results WHERE key = ?", doomed)
+
+    def close(self):
+        self.db.close()
+
+
+_open = {}
+
+
+# creates the schema and switches the file to WAL once, in the parent before any worker opens it;
+# a failure is left to the workers, which then score without the cache
+def prepare(path, max_bytes=DEFAULT_MAX_BYTES):
+    try:
+        ResultCache(path, max_bytes).close()
+    except sqlite3.OperationalError:
+        pass
+
+
+# one connection per process and path; connections are never reused across a fork. None when the
+# file can't be opened, callers then score without the cache
+def open_cache(path, max_bytes=DEFAULT_MAX_BYTES):
+    key = (os.getpid(), os.path.abspath(path))
+    if key not in _open:
+        try:
+            _open[key] = ResultCache(path, max_bytes)
+        except sqlite3.OperationalError as e:
+            print(f"Result cache {path} unavailable, scoring without it: {e}", file=sys.stderr)
+            _open[key] = None
+    return _open[key]
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import warnings
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from fairness_corpus import file_digest
+
+# bump when the on-disk layout changes; older entries are then simply not found
+STORE_VERSION = 1
+
+
+# a text column as small integer codes into its sorted distinct values
+class Categorical:
+    def __init__(self, codes, levels):
+        self.codes = codes
+        self.levels = levels
+
+    def __len__(self):
+        return len(self.codes)
+
+
+# smallest integer type holding every value, or the float type when the values aren't whole numbers
+def compact(numbers):
+    if not len(numbers) or not np.all(np.isfinite(numbers)) or not np.all(numbers == np.round(numbers)):
+        return numbers
+    low, high = int(numbers.min()), int(numbers.max())
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return numbers.astype(dtype)
+    return numbers
+
+
+def code_dtype(levels):
+    return np.uint8 if levels <= 1 << 8 else np.uint16 if levels <= 1 << 16 else np.uint32
+
+
+def categorical(values):
+    levels, codes = np.unique(values, return_inverse=True)
+    return Categorical(codes.astype(code_dtype(len(levels))), [str(level) for level in levels])
+
+
+# column -> numbers or Categorical, read by numpy's C parser instead of csv row by row. Columns are parsed
+# as numbers, which is the common case and several times faster, and only re-read as strings when one
+# isn't numeric. All columns are read when names is None.
+def read_columns(path, names=None):
+    with open(path, newline="") as f:
+        header = [h.strip().strip('"') for h in f.readline().rstrip("\r\n").split(",")]
+        names = header if names is None else names
+        missing = [name for name in names if name not in header]
+        if missing:
+            raise ValueError(f"missing column(s) {', '.join(missing)}")
+        usecols = [header.index(name) for name in names]
+        start = f.tell()
+        with warnings.catch_warnings():
+            # a header without rows is reported below, not warned about
+            warnings.simplefilter("ignore", UserWarning)
+            try:
+                table = np.loadtxt(f, delimiter=",", quotechar='"', ndmin=2, usecols=usecols)
+            except ValueError:
+                f.seek(start)
+                table = np.loadtxt(f, delimiter=",", quotechar='"', dtype=str, ndmin=2, usecols=usecols)
+    if not len(table):
+        raise ValueError("no rows")
+    columns = {}
+    for i, name in enumerate(names):
+        values = table[:, i]
+        if values.dtype.kind == "f":
+            columns[name] = compact(values)
+            continue
+        try:
+            columns[name] = compact(values.astype(float))
+        except ValueError:
+            columns[name] = categorical(values)
+    return columns
+
+
+# CSV files converted once into .npy columns, keyed by the file's content hash, so metric passes map
+# them from disk instead of parsing text again. Labels and group codes are stored in the smallest
+# integer type that holds them. Each entry is a directory <root>/<key[:2]>/<key> with meta.json and one
+# .npy file per column, written under a temporary name and renamed into place, so batch workers can
+# share a store. The hash of each CSV path is remembered under <root>/paths with the file's size and
+# mtime, and a file is only hashed again when those change.
+class ColumnStore:
+    def __init__(self, root):
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+        self.hashed = 0
+        os.makedirs(os.path.join(root, "paths"), exist_ok=True)
+
+    def key(self, path):
+        stat = os.stat(path)
+        index = os.path.join(self.root, "paths",
+                             hashlib.blake2b(os.path.abspath(path).encode(), digest_size=16).hexdigest() + ".json")
+        try:
+            with open(index) as f:
+                known = json.load(f)
+            if (known["size"], known["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                return known["key"]
+        except (OSError, ValueError, KeyError):
+            pass
+        self.hashed += 1
+        key = f"{file_digest(path)}-v{STORE_VERSION}"
+        fd, partial = tempfile.mkstemp(dir=os.path.dirname(index), prefix=".index-")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "key": key}, f)
+        os.replace(partial, index)
+        return key
+
+    def entry(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    # every column of the CSV, ingesting it first when its content isn't stored yet
+    def load(self, path, names=None):
+        key = self.key(path)
+        try:
+            columns = self.read(key, names)
+            self.hits += 1
+            return columns
+        except FileNotFoundError:
+            pass
+        self.misses += 1
+        columns = read_columns(path)
+        self.write(key, columns)
+        if names is None:
+            return columns
+        missing = [name for name in names if name not in columns]
+        if missing:
+            raise ValueError(f"missing column(s) {', '.join(missing)}")
+        return {name: columns[name] for name in names}
+
+    # the stored columns, memory-mapped read-only
+    def read(self, key, names=None):
+        directory = self.entry(key)
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        names = list(meta["columns"]) if names is None else names
+        missing = [name for name in names if name not in meta["columns"]]
+        if missing:
+            raise ValueError(f"missing column(s) {', '.join(missing)}")
+        columns = {}
+        for name in names:
+            info = meta["columns"][name]
+            data = np.load(os.path.join(directory, f"{info['file']}.npy"), mmap_mode="r")
+            columns[name] = Categorical(data, info["levels"]) if "levels" in info else data
+        return columns
+
+    def write(self, key, columns):
+        directory = self.entry(key)
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(directory), prefix=".ingest-")
+        try:
+            meta = {"columns": {}}
+            for i, (name, values) in enumerate(columns.items()):
+                # column names may be anything, so files are numbered
+                info = {"file": str(i)}
+                if isinstance(values, Categorical):
+                    info["levels"] = values.levels
+                    values = values.codes
+                np.save(os.path.join(staging, f"{i}.npy"), values)
+                meta["columns"][name] = info
+            with open(os.path.join(staging, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            os.rename(staging, directory)
+        except OSError:
+            # another worker stored the same content first
+            if not os.path.exists(os.path.join(directory, "meta.json")):
+                raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    # batch ingestion of one CSV; runs in the workers
+    def ingest(self, path):
+        try:
+            key = self.key(path)
+            cached = os.path.exists(os.path.join(self.entry(key), "meta.json"))
+            if not cached:
+                self.write(key, read_columns(path))
+        except (OSError, ValueError) as e:
+            return {"path": path, "key": None, "error": f"{type(e).__name__}: {e}", "cached": False}
+        return {"path": path, "key": key, "error": None, "cached": cached}
@@ -0,0 +1,97 @@
+import hashlib
+import os
+
+# editor, packaging and cache artifacts that only hold copies of real sources
+EXCLUDED_DIRS = {".ipynb_checkpoints", "__pycache__", ".git", ".hg", ".svn", ".tox", ".nox", ".venv", "venv",
+                 ".mypy_cache", ".pytest_cache", "node_modules"}
+EXCLUDED_DIR_SUFFIXES = (".egg-info",)
+HASH_CHUNK = 1 << 20
+
+
+def excluded(name):
+    return name in EXCLUDED_DIRS or name.endswith(EXCLUDED_DIR_SUFFIXES)
+
+
+# (path, size) of every file under root with one of the extensions, skipping excluded directories
+# without descending into them. Like os.walk, a directory's files come before its subdirectories,
+# each in sorted order. A path given directly is always included.
+def scan(root, extensions=(".py", ".ipynb")):
+    if not os.path.isdir(root):
+        # missing paths are passed on so the scorer reports them
+        yield root, os.path.getsize(root) if os.path.exists(root) else -1
+        return
+    try:
+        entries = sorted(os.scandir(root), key=lambda e: e.name)
+    except OSError:
+        return
+    subdirs = []
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if not excluded(entry.name):
+                subdirs.append(entry.path)
+        elif entry.name.endswith(extensions) and entry.is_file():
+            yield entry.path, entry.stat().st_size
+    for path in subdirs:
+        yield from scan(path, extensions)
+
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# The files of a corpus grouped by content. Only files whose size matches another file's are hashed,
+# so a corpus of distinct files costs one directory scan. Each group is scored once, through its
+# first path, and fan_out() copies the result to the other paths.
+class Corpus:
+    def __init__(self, files):
+        by_size = {}
+        order = {}
+        for path, size in files:
+            by_size.setdefault(size, []).append(path)
+            order[path] = len(order)
+        # first path of each group -> the other paths with the same bytes, in scan order
+        duplicates = {}
+        for paths in by_size.values():
+            if len(paths) == 1:
+                duplicates[paths[0]] = []
+                continue
+            groups = {}
+            for path in paths:
+                try:
+                    groups.setdefault(file_digest(path), []).append(path)
+                except OSError:
+                    # unreadable: score it on its own so the error shows up in its row
+                    groups[path] = [path]
+            for first, *rest in groups.values():
+                duplicates[first] = rest
+        self.duplicates = {path: duplicates[path] for path in sorted(duplicates, key=order.get)}
+        self.files = sum(len(rest) + 1 for rest in self.duplicates.values())
+
+    # paths to score, one per distinct content
+    def unique(self):
+        return list(self.duplicates)
+
+    # the row for a scored path followed by a copy for each of its duplicates
+    def fan_out(self, row, key="path"):
+        yield row
+        for path in self.duplicates.get(row[key], ()):
+            yield dict(row, **{key: path, "duplicate_of": row[key]})
+
+    def summary(self):
+        unique = len(self.duplicates)
+        return f"{self.files} files, {unique} unique ({self.files - unique} duplicates skipped)"
+
+
+def discover(roots, extensions=(".py", ".ipynb")):
+    seen = set()
+    files = []
+    for root in roots:
+        for path, size in scan(root, extensions):
+            if path not in seen:
+                seen.add(path)
+                files.append((path, size))
+    return Corpus(files)
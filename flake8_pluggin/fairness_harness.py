@@ -0,0 +1,232 @@
+import contextlib
+import os
+import queue
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import resource
+except ImportError:
+    # not on Windows, where jobs are not run at all
+    resource = None
+
+from fairness_columns import ColumnStore, np
+
+# thread pools of numpy/sklearn backends; each job gets as many threads as it has cores, so jobs packed
+# next to each other don't oversubscribe the machine
+THREAD_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS",
+               "VECLIB_MAXIMUM_THREADS")
+# "Test Accuracy: 0.85" / "Disparate Impact Ratio: [0.91]" lines a script prints
+STDOUT_METRIC = re.compile(r"^\s*([A-Za-z][\w \-]*?)\s*:\s*\[?\s*(-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)\s*\]?\s*$")
+# how often a job is checked for exit and timeout
+POLL_INTERVAL = 0.05
+
+
+def stdout_metrics(text):
+    metrics = {}
+    for line in text.splitlines():
+        match = STDOUT_METRIC.match(line)
+        if match:
+            metrics[match.group(1).strip().lower().replace(" ", "_").replace("-", "_")] = float(match.group(2))
+    return metrics
+
+
+# the job may have deleted a link itself
+def unlink(links):
+    for link in links:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(link)
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+# Copies the dataset files into <store>/data once, read-only, so every job reads the same staged copy
+# (and the same page cache) instead of the original. Files already staged with the same size and mtime
+# are kept. CSVs are also ingested into the column store at <store>/columns when numpy is installed,
+# for metric passes that map them. Returns the staged directory.
+def stage_data(source, store):
+    staged = os.path.join(store, "data")
+    os.makedirs(staged, exist_ok=True)
+    for entry in sorted(os.scandir(source), key=lambda e: e.name):
+        if entry.name.startswith(".") or not entry.is_file():
+            continue
+        target = os.path.join(staged, entry.name)
+        stat = entry.stat()
+        if os.path.exists(target):
+            current = os.stat(target)
+            if (current.st_size, current.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            os.chmod(target, 0o644)
+        partial = target + ".partial"
+        shutil.copy2(entry.path, partial)
+        os.chmod(partial, 0o444)
+        os.replace(partial, target)
+
+    if np is not None:
+        columns = ColumnStore(os.path.join(store, "columns"))
+        for name in sorted(os.listdir(staged)):
+            if name.endswith(".csv"):
+                columns.ingest(os.path.join(staged, name))
+    return staged
+
+
+# Runs submission scripts in a pool of sandboxes. Each job gets its own working directory under
+# <results>/jobs with a copy of the script and read-only links to the staged datasets, a fixed set of
+# cores (CPU affinity plus thread-pool variables), an RLIMIT_CPU / RLIMIT_AS limit and a wall-clock
+# timeout, and runs in its own session so a timeout kills everything it started. stdout, stderr and
+# whatever the script writes (submission.csv) stay in the job directory; one row per job goes to
+# <results>/results.jsonl. This isolates jobs from each other's files and resources, it is not a
+# security boundary. Jobs need POSIX process control (wait4, sessions); on other platforms every job
+# gets an error row. Affinity and the CPU and memory limits are applied on Linux.
+class Harness:
+    def __init__(self, results, data=None, cpus=1, cpu_time=None, memory=None, timeout=None, python=None):
+        self.results = results
+        # staged dataset directory linked into every sandbox
+        self.data = data
+        self.cpus = cpus
+        # seconds of CPU time, bytes of address space and wall-clock seconds per job, None for no limit
+        self.cpu_time = cpu_time
+        self.memory = memory
+        self.timeout = timeout
+        self.python = python or sys.executable
+
+    # core sets of the jobs that can run at once, cpus cores each
+    def slots(self, jobs=None):
+        cores = available_cores()
+        count = max(1, len(cores) // self.cpus)
+        if jobs:
+            count = min(count, jobs)
+        return [cores[i * self.cpus:(i + 1) * self.cpus] or cores for i in range(count)]
+
+    def sandbox(self, job, script):
+        workdir = os.path.join(self.results, "jobs", job)
+        shutil.rmtree(workdir, ignore_errors=True)
+        os.makedirs(workdir)
+        shutil.copy2(script, os.path.join(workdir, os.path.basename(script)))
+        links = []
+        if self.data:
+            for name in sorted(os.listdir(self.data)):
+                link = os.path.join(workdir, name)
+                os.symlink(os.path.abspath(os.path.join(self.data, name)), link)
+                links.append(link)
+        return workdir, links
+
+    def environment(self, workdir, cores):
+        env = dict(os.environ, HOME=workdir, PYTHONDONTWRITEBYTECODE="1", PYTHONUNBUFFERED="1")
+        for name in THREAD_VARS:
+            env[name] = str(len(cores))
+        return env
+
+    # applied right after the spawn, while the interpreter is still starting up, so no preexec_fn is needed
+    # (it isn't safe with threads, and run_all runs jobs from a thread pool)
+    def limit(self, pid, cores):
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(pid, cores)
+        # prlimit is Linux only
+        if not hasattr(resource, "prlimit"):
+            return
+        if self.cpu_time:
+            resource.prlimit(pid, resource.RLIMIT_CPU, (self.cpu_time, self.cpu_time + 1))
+        if self.memory:
+            resource.prlimit(pid, resource.RLIMIT_AS, (self.memory, self.memory))
+
+    def run(self, job, script, cores):
+        row = {"path": script, "job": job, "status": None, "returncode": None, "wall_s": None, "cpu_s": None,
+               "max_rss_kb": None, "stdout_metrics": {}, "submission": None, "error": None}
+        if not hasattr(os, "wait4"):
+            return dict(row, status="error", error="the harness needs POSIX process control (os.wait4)")
+        try:
+            workdir, links = self.sandbox(job, script)
+        except OSError as e:
+            return dict(row, status="error", error=f"{type(e).__name__}: {e}")
+
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            with open(os.path.join(workdir, "stdout.txt"), "wb") as out, \
+                    open(os.path.join(workdir, "stderr.txt"), "wb") as err:
+                proc = subprocess.Popen([self.python, os.path.basename(script)], cwd=workdir,
+                                        stdin=subprocess.DEVNULL, stdout=out, stderr=err,
+                                        env=self.environment(workdir, cores), start_new_session=True)
+        except (OSError, subprocess.SubprocessError) as e:
+            # e.g. a missing interpreter
+            unlink(links)
+            return dict(row, status="error", error=f"{type(e).__name__}: {e}")
+        try:
+            self.limit(proc.pid, cores)
+        except ProcessLookupError:
+            # already gone; wait4 below still collects it
+            pass
+        except (OSError, ValueError) as e:
+            # a limit above the hard limit; the job doesn't run unconstrained
+            os.killpg(proc.pid, signal.SIGKILL)
+            os.wait4(proc.pid, 0)
+            unlink(links)
+            return dict(row, status="error", error=f"{type(e).__name__}: {e}")
+        # wait4 instead of proc.wait(), for the job's own CPU time and peak memory
+        while True:
+            pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                break
+            if self.timeout and time.perf_counter() - start > self.timeout:
+                timed_out = True
+                os.killpg(proc.pid, signal.SIGKILL)
+                pid, status, usage = os.wait4(proc.pid, 0)
+                break
+            time.sleep(POLL_INTERVAL)
+        proc.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+        try:
+            # whatever the script left running in its session
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        unlink(links)
+
+        row.update(returncode=proc.returncode, wall_s=time.perf_counter() - start,
+                   cpu_s=usage.ru_utime + usage.ru_stime, max_rss_kb=usage.ru_maxrss)
+        if timed_out:
+            row["status"] = "timeout"
+        elif proc.returncode < 0:
+            # SIGXCPU / SIGKILL from the CPU limit, or killed from outside
+            row["status"] = "killed"
+            row["error"] = signal.Signals(-proc.returncode).name
+        else:
+            row["status"] = "ok" if proc.returncode == 0 else "failed"
+        with open(os.path.join(workdir, "stdout.txt"), errors="replace") as f:
+            row["stdout_metrics"] = stdout_metrics(f.read())
+        if row["status"] == "failed":
+            with open(os.path.join(workdir, "stderr.txt"), errors="replace") as f:
+                lines = f.read().strip().splitlines()
+            row["error"] = lines[-1] if lines else f"exit status {proc.returncode}"
+        submission = os.path.join(workdir, "submission.csv")
+        if os.path.exists(submission):
+            row["submission"] = submission
+        return row
+
+    # yields a row per script as jobs finish; every slot runs one job at a time on its own cores
+    def run_all(self, scripts, jobs=None):
+        slots = queue.Queue()
+        for cores in self.slots(jobs):
+            slots.put(cores)
+
+        def job(numbered):
+            number, script = numbered
+            cores = slots.get()
+            try:
+                name = os.path.basename(os.path.dirname(os.path.abspath(script))) or "script"
+                return self.run(f"{number:05d}-{name}", script, cores)
+            finally:
+                slots.put(cores)
+
+        with ThreadPoolExecutor(slots.qsize()) as pool:
+            for done in as_completed([pool.submit(job, numbered) for numbered in enumerate(scripts, 1)]):
+                yield done.result()
@@ -0,0 +1,181 @@
+import ast
+import hashlib
+import json
+import re
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from flake8_pluggin_eval import Fairnessevaluator
+
+# what reading a broken notebook raises, with either reader
+READ_ERRORS = (OSError, ValueError) + ((ijson.JSONError,) if ijson is not None else ())
+
+# IPython lines that aren't Python: `x = !ls` / `x = %env`, line magics, shell escapes and `obj?` help
+ASSIGNED_MAGIC = re.compile(r"^(\s*[\w.]+\s*=\s*)[!%]")
+HELP = re.compile(r"^\s*[\w.]+\?\??\s*$")
+# cell magics whose body is still Python; cells under any other cell magic (%%bash, %%html, ...) are dropped
+PYTHON_CELL_MAGICS = {"time", "timeit", "capture", "prun", "debug"}
+
+
+# (bracket depth, open string quote, backslash continuation) after a line, starting from depth and quote.
+# Only enough of Python's lexing to tell where a logical line starts: strings, comments and brackets.
+def scan_line(line, depth=0, quote=None):
+    i = 0
+    while i < len(line):
+        c = line[i]
+        if quote:
+            if c == "\\":
+                i += 2
+                continue
+            if line.startswith(quote, i):
+                i += len(quote)
+                quote = None
+                continue
+        elif c == "#":
+            return depth, None, False
+        elif c in "\"'":
+            quote = line[i:i + 3] if line[i:i + 3] in ('"""', "'''") else c
+            i += len(quote)
+            continue
+        elif c in "([{":
+            depth += 1
+        elif c in ")]}":
+            depth = max(0, depth - 1)
+        i += 1
+    continued = line.endswith("\\")
+    if quote is not None and len(quote) == 1 and not continued:
+        # an unterminated string ends with its line
+        quote = None
+    return depth, quote, continued and quote is None
+
+
+# cell source with IPython syntax replaced so that it parses and keeps its line numbers, None for a
+# cell that isn't Python at all. Only the start of a logical line can be IPython syntax; continuation
+# lines and lines inside triple-quoted strings are left alone.
+def strip_magics(source):
+    lines = source.split("\n")
+    first = lines[0].lstrip()
+    if first.startswith("%%"):
+        name = first[2:].split(None, 1)
+        if not name or name[0] not in PYTHON_CELL_MAGICS:
+            return None
+        lines[0] = ""
+    depth, quote, continued = 0, None, False
+    for i, line in enumerate(lines):
+        if not (depth or quote or continued):
+            match = ASSIGNED_MAGIC.match(line)
+            stripped = line.lstrip()
+            if match:
+                lines[i] = match.group(1) + "None"
+            elif stripped.startswith(("%", "!")) or HELP.match(line):
+                lines[i] = line[:len(line) - len(stripped)] + "pass"
+        depth, quote, continued = scan_line(lines[i], depth, quote)
+    return "\n".join(lines)
+
+
+# (cell number, source) for every code cell, numbered from 1 over all cells as the notebook shows them.
+# With ijson the file is read as a stream and only code sources are kept, so outputs and embedded
+# images are never held in memory; without it the whole notebook is loaded with json.
+# ijson's default 64 KiB buffer makes long base64 outputs cost ~10x the parse time, so read 1 MiB at a time.
+READ_BUFFER = 1 << 20
+
+
+def iter_code_cells(f):
+    if ijson is None:
+        for i, cell in enumerate(json.load(f).get("cells", []), 1):
+            if cell.get("cell_type") == "code":
+                source = cell.get("source", "")
+                yield i, source if isinstance(source, str) else "".join(source)
+        return
+
+    number = 0
+    cell_type = None
+    parts = []
+    for prefix, event, value in ijson.parse(f, buf_size=READ_BUFFER):
+        if prefix == "cells.item":
+            if event == "start_map":
+                number += 1
+                cell_type = None
+                parts = []
+            elif event == "end_map" and cell_type == "code":
+                yield number, "".join(parts)
+        elif event == "string":
+            if prefix == "cells.item.cell_type":
+                cell_type = value
+            elif prefix == "cells.item.source.item" or prefix == "cells.item.source":
+                parts.append(value)
+
+
+def read_cells(path):
+    cells = []
+    with open(path, "rb") as f:
+        for number, source in iter_code_cells(f):
+            source = strip_magics(source)
+            if source is not None and source.strip():
+                cells.append((number, source))
+    return cells
+
+
+# Scores a notebook's code cells as one script. Cells are parsed one at a time, so a broken cell is
+# skipped instead of failing the notebook, and walked in order into one symbol table, so an import
+# in one cell resolves names in the next. Findings are reported at (cell, line).
+class NotebookEvaluator(Fairnessevaluator):
+    _notebook_ruleset = None
+
+    def __init__(self, cells, filename=None):
+        super().__init__(None, filename=filename)
+        # (cell number, source) of the code cells, magics stripped
+        self.cells = cells
+        # (cell number, tree) of the cells that parse
+        self.trees = []
+        # "cell N: SyntaxError: ..." for the cells that don't
+        self.errors = []
+        # (cell, line, col, message)
+        self.issues = []
+
+    # the cells as one text, for the pre-scan and the result cache; outputs don't change the key
+    def code(self):
+        return "".join(f"# cell {number}\n{source}\n" for number, source in self.cells)
+
+    @classmethod
+    def ruleset_version(cls):
+        if cls._notebook_ruleset is None:
+            with open(__file__, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:16]
+            cls._notebook_ruleset = f"{Fairnessevaluator.ruleset_version()}-nb{digest}"
+        return cls._notebook_ruleset
+
+    def parse(self):
+        for number, source in self.cells:
+            try:
+                self.trees.append((number, ast.parse(source)))
+            except (SyntaxError, ValueError) as e:
+                self.errors.append(f"cell {number}: {type(e).__name__}: {e}")
+
+    def visit(self):
+        dispatch = self.recorders()
+        if dispatch is None:
+            return
+        for number, tree in self.trees:
+            self.symbols.mark(number)
+            self.walk(tree, dispatch)
+
+    # (cell, line, col) of a recorded node
+    def locate(self, node):
+        return self.symbols.segment(node), getattr(node, "lineno", 1), getattr(node, "col_offset", 0)
+
+    def report(self, check, code, vocab, weight, none_message):
+        found = self.found[check]
+        missing = [v for v in vocab if v not in found]
+        locations = {item: self.locate(node) for item, node in found.items()}
+        self.results[code] = {"found": list(found), "missing": missing, "points": weight if found else 0,
+                              "cells": {item: list(loc[:2]) for item, loc in locations.items()}}
+        if found:
+            self.score += weight
+            first = locations[next(iter(found))]
+            self.issues.append(first + (f"{code}: Found {', '.join(found)}, but didn’t find {', '.join(missing)}, +{weight}",))
+        else:
+            self.issues.append((self.cells[0][0] if self.cells else None, 1, 0, f"{code}: {none_message}"))
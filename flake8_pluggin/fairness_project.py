@@ -0,0 +1,115 @@
+import ast
+import os
+
+from flake8_pluggin_eval import Fairnessevaluator
+
+
+# module names a project's own files can be imported as: "pkg/prep.py" under the root gives pkg, prep
+# and pkg.prep, since scripts are usually run with their own directory on sys.path
+def local_modules(paths, root):
+    names = set()
+    for path in paths:
+        parts = os.path.splitext(os.path.relpath(path, root))[0].split(os.sep)
+        if parts[-1] == "__init__":
+            parts.pop()
+        names.update(p for p in parts if p and p != "..")
+        names.update(".".join(parts[i:]) for i in range(len(parts)))
+    return names
+
+
+# Every import statement of a project, taken from each file's symbol table after its walk. Once all files
+# are walked it knows which modules are the project's own, so imports between the submission's modules
+# are not mistaken for libraries, and each library import is fed to the import rules exactly once.
+class ImportIndex:
+    def __init__(self, paths, root):
+        self.local = local_modules(paths, root)
+        self.imports = []
+
+    def add(self, path, node):
+        self.imports.append((path, node))
+
+    def is_local(self, module):
+        return module in self.local or module.split(".", 1)[0] in self.local
+
+    # (path, node) for each import in walk order, with imports of project modules filtered out
+    def external(self):
+        for path, node in self.imports:
+            if isinstance(node, ast.ImportFrom):
+                if node.level == 0 and not self.is_local(node.module or ""):
+                    yield path, node
+                continue
+            names = [a for a in node.names if not self.is_local(a.name)]
+            if len(names) == len(node.names):
+                yield path, node
+            elif names:
+                yield path, ast.copy_location(ast.Import(names=names), node)
+
+
+# Scores all files of one submission as a unit: each file is parsed and walked once, findings are
+# merged across files (first occurrence wins) and the rules are reported once, so a submission that
+# splits preprocessing and training over several modules is scored like a single script.
+class ProjectEvaluator(Fairnessevaluator):
+    def __init__(self, trees, root):
+        super().__init__(None)
+        # {path: tree}, walked in this order
+        self.trees = trees
+        self.root = root
+        self.index = ImportIndex(list(trees), root)
+        # file each found node comes from
+        self.where = {}
+        # (path, line, col, message)
+        self.issues = []
+
+    def evaluate(self):
+        import_rules = [check for check in self.checks if ast.Import in self.collects[check]]
+        for path, tree in self.trees.items():
+            checker = Fairnessevaluator(tree, filename=path)
+            checker.checks = self.checks
+            checker.visit()
+            self.nodes_visited += checker.nodes_visited
+            for node in checker.symbols.imports:
+                self.index.add(path, node)
+            for check in self.checks:
+                if check in import_rules:
+                    continue
+                getattr(checker, "collect_" + check)()
+                for item, node in checker.found[check].items():
+                    if item not in self.found[check]:
+                        self.found[check][item] = node
+                        self.where[node] = path
+
+        # the import rules read the project's library imports instead of each file's
+        for path, node in self.index.external():
+            self.where[node] = path
+            self.symbols.imports.append(node)
+        for check in import_rules:
+            getattr(self, "collect_" + check)()
+
+        for check in self.checks:
+            getattr(self, "check_" + check)()
+
+    # the rule's message goes to the file (and line) of its first finding; other files with findings for
+    # the same rule point back to it. Rules with no findings are reported on the first file.
+    def report(self, check, code, vocab, weight, none_message):
+        found = self.found[check]
+        missing = [v for v in vocab if v not in found]
+        self.results[code] = {"found": list(found), "missing": missing, "points": weight if found else 0,
+                              "files": {item: self.where[node] for item, node in found.items()}}
+        if not found:
+            self.issues.append((next(iter(self.trees), None), 1, 0, f"{code}: {none_message}"))
+            return
+
+        self.score += weight
+        by_file = {}
+        for item, node in found.items():
+            by_file.setdefault(self.where[node], []).append((item, node))
+        first = None
+        for path, items in by_file.items():
+            node = items[0][1]
+            fstr = ", ".join(item for item, _ in items)
+            if first is None:
+                first = path
+                message = f"{code}: Found {fstr}, but didn’t find {', '.join(missing)}, +{weight}"
+            else:
+                message = f"{code}: Found {fstr}, credited in {os.path.relpath(first, self.root)}"
+            self.issues.append((path, getattr(node, "lineno", 1), getattr(node, "col_offset", 0), message))
@@ -0,0 +1,37 @@
+import json
+import re
+
+from flake8.formatting.default import Default
+
+from fairness_summary import CODES, SCORE_CODE, ScoreSummary
+
+SCORE_TEXT = re.compile(r"Fairness Score: (-?\d+)")
+
+
+# flake8 formatter (--format=fna-summary) that prints violations like the default formatter and, as
+# results arrive in the main process from every --jobs worker, collects each file's FNA100 score and
+# FNA hits. At the end it writes one summary to --fna-report (JSON, or CSV by extension), or prints
+# it after the violations when no report path is set.
+class FairnessReport(Default):
+    # Default.after_init would take "fna-summary" itself as a custom format string, so keep its error_format
+    def after_init(self):
+        self.summary = ScoreSummary()
+
+    def handle(self, error):
+        # flake8 splits plugin messages at the first space, so codes arrive as "FNA101:"
+        code = error.code.rstrip(":")
+        if code == SCORE_CODE:
+            match = SCORE_TEXT.search(error.text)
+            if match:
+                self.summary.add_score(error.filename, int(match.group(1)))
+        elif code in CODES and error.text.startswith("Found "):
+            self.summary.add_hit(error.filename, code)
+        super().handle(error)
+
+    def stop(self):
+        path = getattr(self.options, "fna_report", None)
+        if path:
+            self.summary.write(path)
+        else:
+            self._write(json.dumps(self.summary.summary(), indent=2))
+        super().stop()
@@ -0,0 +1,118 @@
+import unicodedata
+from collections import deque
+
+
+# Aho-Corasick automaton over a rule's terms: one pass over a name finds every term it contains,
+# so substring rules cost the same whether the vocabulary has 10 or 500 entries
+class SubstringMatcher:
+    def __init__(self, terms):
+        self.terms = tuple(terms)
+        goto = [{}]
+        out = [set()]
+        for i, term in enumerate(self.terms):
+            state = 0
+            for ch in term:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    out.append(set())
+                    goto[state][ch] = nxt
+                state = nxt
+            out[state].add(i)
+
+        # failure links, breadth first so shorter suffixes are resolved before they are needed
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] |= out[fail[nxt]]
+
+        self.goto = goto
+        self.fail = fail
+        self.out = [frozenset(o) for o in out]
+
+    # terms contained in text, in vocabulary order
+    def search(self, text):
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        matched = set()
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                matched |= out[state]
+        return [self.terms[i] for i in sorted(matched)]
+
+
+# a rule vocabulary compiled once: ordered terms for FNA messages, a frozen set for exact lookups
+# and a lazily built automaton for substring rules
+class Vocabulary:
+    def __init__(self, terms):
+        self.terms = tuple(terms)
+        self.lookup = frozenset(self.terms)
+        self._matcher = None
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, name):
+        return name in self.lookup
+
+    def substrings(self, text):
+        if self._matcher is None:
+            self._matcher = SubstringMatcher(self.terms)
+        return self._matcher.search(text)
+
+
+# Source as bytes in which every identifier appears as Python sees it, or None when that can't be
+# guaranteed. Identifiers are NFKC-normalized by the parser, so non-ASCII sources are normalized too.
+def scan_bytes(source):
+    if isinstance(source, bytes):
+        if source.isascii():
+            return source
+        try:
+            source = source.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+    elif source.isascii():
+        return source.encode("ascii")
+    return unicodedata.normalize("NFKC", source).encode("utf-8", "surrogatepass")
+
+
+# Conservative lexical pre-scan. Every rule matches identifiers against its vocabulary (exactly or as
+# a substring), so a rule can only fire if one of its terms occurs somewhere in the source text.
+# scan() returns the rules that may fire; the others can skip the AST work and still report the
+# same "not found" result. A plain `in` per term beats a regex alternation here and stops at the
+# first hit of each rule.
+class Prefilter:
+    def __init__(self, vocabularies):
+        self.rules = {rule: tuple(term.encode("utf-8") for term in vocab) for rule, vocab in vocabularies.items()}
+
+    def scan(self, source):
+        data = scan_bytes(source)
+        if data is None:
+            return set(self.rules)
+        return {rule for rule, terms in self.rules.items() if any(term in data for term in terms)}
+
+
+DATA_LIBS = Vocabulary(["pandas", "numpy", "sklearn", "datasets"])
+MISSING_VALUE_FUNCS = Vocabulary(["dropna", "fillna"])
+ENCODERS = Vocabulary(["get_dummies", "OneHotEncoder", "LabelEncoder"])
+BIAS_LIBS = Vocabulary(["aif360", "fairlearn", "equitas", "fairness_indicator"])
+METRICS = Vocabulary(["equalized_odds", "demographic_parity", "statistical_parity", "disparate_impact_ratio", "accuracy","average_abs_odds_difference", "average_odds_difference", "consistency","false_discovery_rate","Equal_opporutnity_differenace","Equalized_odds_difference","Error_rte_difference","Error_rate_ratio","false ommisionate_difference",
+                     # fairlearn.metrics
+                     "demographic_parity_difference", "demographic_parity_ratio", "equalized_odds_difference",
+                     "equalized_odds_ratio", "equal_opportunity_difference", "equal_opportunity_ratio"])
+TRAINING_TERMS = Vocabulary(["adversarial", "reweighting","DisparateImpactRemover","AdversarialDebiasing","ARTClassifier","PrejudiceRemover", "EqOddsPostprocessing","DeterministicReranking","GerryFairClassifier"])
+EVALUATION_FUNCS = Vocabulary(["audit_bias", "disparate_impact_ratio"])
@@ -0,0 +1,315 @@
+import itertools
+import math
+import os
+import warnings
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from fairness_columns import Categorical, ColumnStore, read_columns
+
+# the columns train_updated.py writes to submission.csv, and the group its disparate impact check
+# treats as privileged (priv_group=1)
+LABEL = "Actual_y"
+PREDICTION = "Predicted_y"
+PROTECTED = "sex"
+PRIVILEGED = "1"
+POSITIVE = "1"
+
+# attribute combinations up to this many subgroups are counted with a dense bincount
+DENSE_SUBGROUPS = 1 << 16
+# rows a subgroup needs before it counts towards the intersectional metrics
+MIN_SUPPORT = 30
+# counts held at once while bootstrapping, 32 MiB of int64
+BOOTSTRAP_CELLS = 1 << 22
+
+METRICS = ("accuracy", "disparate_impact", "statistical_parity_difference", "equal_opportunity_difference",
+           "average_odds_difference", "equalized_odds_difference", "error_rate_difference", "error_rate_ratio")
+SUBGROUP_METRICS = ("disparate_impact", "statistical_parity_difference", "equal_opportunity_difference",
+                    "equalized_odds_difference", "error_rate_difference", "error_rate_ratio")
+
+
+# numeric columns are compared as numbers, so "1", "1.0" and 1 all match the value 1
+def as_numbers(values):
+    if values.dtype.kind in "fiu":
+        return values
+    try:
+        return values.astype(float)
+    except ValueError:
+        return None
+
+
+def flags(values, value):
+    if isinstance(values, Categorical):
+        return flags(np.asarray(values.levels), value)[values.codes]
+    numbers = as_numbers(values)
+    if numbers is not None:
+        try:
+            return numbers == float(value)
+        except ValueError:
+            # a non-numeric value never matches a numeric column
+            return np.zeros(len(values), dtype=bool)
+    return values == str(value)
+
+
+# (codes, levels): a small integer code per row and the sorted distinct values they stand for
+def encode(values):
+    if isinstance(values, Categorical):
+        return values.codes, values.levels
+    numbers = as_numbers(values)
+    if numbers is not None:
+        levels, codes = np.unique(numbers, return_inverse=True)
+        return codes, [f"{level:g}" for level in levels]
+    levels, codes = np.unique(values, return_inverse=True)
+    return codes, [str(level) for level in levels]
+
+
+# confusion counts per group, shape (groups, 2, 2) indexed [group, actual, predicted], in one bincount
+def confusion_counts(actual, predicted, codes, groups):
+    index = codes.astype(np.intp) * 4 + actual.astype(np.intp) * 2 + predicted.astype(np.intp)
+    return np.bincount(index, minlength=groups * 4).reshape(groups, 2, 2)
+
+
+def _ratio(a, b):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.true_divide(a, b)
+
+
+# rates per group from counts of shape (..., groups, 2, 2); any leading axes (bootstrap replicates,
+# submissions) are kept
+def group_rates(counts):
+    tn, fp = counts[..., 0, 0], counts[..., 0, 1]
+    fn, tp = counts[..., 1, 0], counts[..., 1, 1]
+    n = tn + fp + fn + tp
+    return {"count": n, "selection_rate": _ratio(tp + fp, n), "true_positive_rate": _ratio(tp, tp + fn),
+            "false_positive_rate": _ratio(fp, fp + tn), "error_rate": _ratio(fp + fn, n),
+            "accuracy": _ratio(tp + tn, n)}
+
+
+# METRICS from counts of shape (..., groups, 2, 2); `privileged` is a boolean mask over the groups.
+# Every metric is an array over the leading axes; nan where a rate is undefined (an empty group).
+# The unprivileged groups are pooled, as aif360 does, and compared against the privileged group:
+# differences are unprivileged - privileged and ratios unprivileged / privileged.
+def metrics_from_counts(counts, privileged):
+    priv = counts[..., privileged, :, :].sum(axis=-3)
+    unpriv = counts.sum(axis=-3) - priv
+    rates = group_rates(np.stack([unpriv, priv], axis=-3))
+    u = {name: rate[..., 0] for name, rate in rates.items()}
+    p = {name: rate[..., 1] for name, rate in rates.items()}
+    tpr_diff = u["true_positive_rate"] - p["true_positive_rate"]
+    fpr_diff = u["false_positive_rate"] - p["false_positive_rate"]
+    total = unpriv + priv
+    return {
+        "accuracy": _ratio(total[..., 0, 0] + total[..., 1, 1], total.sum(axis=(-2, -1))),
+        "disparate_impact": _ratio(u["selection_rate"], p["selection_rate"]),
+        "statistical_parity_difference": u["selection_rate"] - p["selection_rate"],
+        "equal_opportunity_difference": tpr_diff,
+        "average_odds_difference": (tpr_diff + fpr_diff) / 2,
+        "equalized_odds_difference": np.maximum(np.abs(tpr_diff), np.abs(fpr_diff)),
+        "error_rate_difference": u["error_rate"] - p["error_rate"],
+        "error_rate_ratio": _ratio(u["error_rate"], p["error_rate"]),
+    }
+
+
+# Percentile bootstrap intervals for every metric. Metrics depend on the rows only through the confusion
+# counts, and resampling n rows with replacement gives counts that follow a multinomial over the
+# (group, actual, predicted) cells, so each replicate is drawn as one row of counts instead of n row
+# indices. Replicates are drawn `chunk` at a time, bounding memory to chunk x cells counts; the draws
+# don't depend on the chunk size, so a seed gives the same intervals however they are chunked.
+# Replicates where a metric is undefined are left out of its interval.
+def bootstrap_intervals(counts, privileged, replicates, seed=0, confidence=0.95, chunk=None):
+    rng = np.random.default_rng(seed)
+    n = int(counts.sum())
+    cells = counts.ravel() / n
+    chunk = chunk or max(1, BOOTSTRAP_CELLS // cells.size)
+    samples = {name: [] for name in METRICS}
+    for start in range(0, replicates, chunk):
+        size = min(chunk, replicates - start)
+        draws = rng.multinomial(n, cells, size=size).reshape((size,) + counts.shape)
+        for name, values in metrics_from_counts(draws, privileged).items():
+            samples[name].append(values)
+    tail = (1 - confidence) / 2 * 100
+    intervals = {}
+    for name, values in samples.items():
+        values = np.concatenate(values)
+        values = values[np.isfinite(values)]
+        intervals[name] = [float(v) for v in np.percentile(values, [tail, 100 - tail])] if len(values) else [None, None]
+    return intervals
+
+
+# a numeric column cut at the edges into labelled buckets: "<25", "25-45", "45-65", ">=65"
+def bucket(values, edges):
+    numbers = None if isinstance(values, Categorical) else as_numbers(values)
+    if numbers is None:
+        raise ValueError("only numeric columns can be bucketed")
+    edges = sorted(edges)
+    labels = [f"<{edges[0]:g}"] + [f"{a:g}-{b:g}" for a, b in zip(edges, edges[1:])] + [f">={edges[-1]:g}"]
+    return Categorical(np.digitize(numbers, edges).astype(np.uint8), labels)
+
+
+# one int64 id per row, combining the attribute codes in mixed radix (C order, like np.ravel_multi_index)
+def radix_ids(codes, sizes):
+    ids = np.zeros(len(codes[0]), dtype=np.int64)
+    for column, size in zip(codes, sizes):
+        ids = ids * size + column.astype(np.int64)
+    return ids
+
+
+# confusion counts of every combination of the attributes that occurs, shape (subgroups, 2, 2), and the
+# attribute codes of each subgroup, shape (subgroups, attributes). While the combinations fit a bincount
+# every one is counted and the empty ones dropped; past that only the ids that occur are numbered, so
+# the work stays proportional to the rows however many combinations the attributes allow.
+def subgroup_counts(actual, predicted, codes, sizes):
+    total = math.prod(sizes)
+    if total <= max(DENSE_SUBGROUPS, len(actual)):
+        counts = confusion_counts(actual, predicted, radix_ids(codes, sizes), total)
+        present = np.flatnonzero(counts.sum(axis=(1, 2)))
+        return counts[present], np.stack(np.unravel_index(present, sizes), axis=1)
+    if total < 1 << 63:
+        present, ids = np.unique(radix_ids(codes, sizes), return_inverse=True)
+        keys = np.stack(np.unravel_index(present, sizes), axis=1)
+    else:
+        keys, ids = np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)
+    return confusion_counts(actual, predicted, ids.reshape(-1), len(keys)), keys
+
+
+# SUBGROUP_METRICS from counts of shape (..., subgroups, 2, 2): the gap between the best and worst off
+# subgroup, as largest - smallest rate or smallest / largest rate, so 0 and 1 are parity
+def subgroup_metrics(counts):
+    rates = group_rates(counts)
+    with warnings.catch_warnings():
+        # a rate no subgroup defines is nan, which is what it should be
+        warnings.simplefilter("ignore", RuntimeWarning)
+        low = {name: np.nanmin(rate, axis=-1) for name, rate in rates.items()}
+        high = {name: np.nanmax(rate, axis=-1) for name, rate in rates.items()}
+    spread = {name: high[name] - low[name] for name in rates}
+    return {
+        "disparate_impact": _ratio(low["selection_rate"], high["selection_rate"]),
+        "statistical_parity_difference": spread["selection_rate"],
+        "equal_opportunity_difference": spread["true_positive_rate"],
+        "equalized_odds_difference": np.maximum(spread["true_positive_rate"], spread["false_positive_rate"]),
+        "error_rate_difference": spread["error_rate"],
+        "error_rate_ratio": _ratio(low["error_rate"], high["error_rate"]),
+    }
+
+
+# Intersectional analysis over several protected attributes (sex x race x age bucket): every combination
+# of up to max_order attributes is encoded into integer subgroup ids and counted with one bincount.
+# Subgroups with fewer than min_support rows are left out of the metrics, since a handful of rows
+# gives rates that are mostly noise. The attributes are read from the submission, or from a features
+# file next to it (test_X.csv) whose rows line up with the submission's.
+class Intersections:
+    def __init__(self, attributes, max_order=None, min_support=MIN_SUPPORT, buckets=None, features=None):
+        self.attributes = list(attributes)
+        self.max_order = max_order or len(self.attributes)
+        self.min_support = min_support
+        # attribute -> bucket edges, for numeric attributes such as age
+        self.buckets = buckets or {}
+        self.features = features
+
+    def combinations(self):
+        for order in range(1, min(self.max_order, len(self.attributes)) + 1):
+            yield from itertools.combinations(self.attributes, order)
+
+    # attribute -> (codes, levels), read with `read` like the submission itself
+    def load(self, path, read, rows):
+        source = os.path.join(os.path.dirname(path), self.features) if self.features else path
+        columns = read(source, self.attributes)
+        encoded = {}
+        for name, values in columns.items():
+            if name in self.buckets:
+                values = bucket(values, self.buckets[name])
+            if len(values) != rows:
+                raise ValueError(f"{os.path.basename(source)} has {len(values)} rows, the submission {rows}")
+            encoded[name] = encode(values)
+        return encoded
+
+    def compute(self, actual, predicted, encoded):
+        result = {}
+        for names in self.combinations():
+            codes = [encoded[name][0] for name in names]
+            levels = [encoded[name][1] for name in names]
+            counts, keys = subgroup_counts(actual, predicted, codes, [len(values) for values in levels])
+            supported = counts.sum(axis=(1, 2)) >= self.min_support
+            counts, keys = counts[supported], keys[supported]
+            rates = group_rates(counts)
+            subgroups = {}
+            for i, key in enumerate(keys):
+                label = ",".join(levels[j][code] for j, code in enumerate(key))
+                subgroups[label] = {name: plain(rate[i]) for name, rate in rates.items()}
+                subgroups[label]["count"] = int(subgroups[label]["count"])
+            metrics = subgroup_metrics(counts) if len(counts) else {name: np.nan for name in SUBGROUP_METRICS}
+            result[",".join(names)] = {"metrics": {name: plain(value) for name, value in metrics.items()},
+                                       "subgroups": subgroups, "unsupported": int((~supported).sum())}
+        return result
+
+
+# nan and inf don't survive JSON; undefined metrics are written as None
+def plain(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+# Reads one submission's outputs and computes every metric. All rows go through one bincount, so the
+# cost per file is the CSV parse plus a few array operations on (groups, 2, 2) counts.
+class SubmissionMetrics:
+    def __init__(self, label=LABEL, prediction=PREDICTION, protected=PROTECTED, privileged=PRIVILEGED,
+                 positive=POSITIVE, store=None, bootstrap=0, seed=0, confidence=0.95, intersections=None):
+        # ColumnStore directory the CSVs are read through, None to parse them every time
+        self.store = store
+        self.label = label
+        self.prediction = prediction
+        self.protected = protected
+        self.privileged = privileged
+        self.positive = positive
+        # bootstrap replicates for confidence intervals, 0 for point estimates only
+        self.bootstrap = bootstrap
+        self.seed = seed
+        self.confidence = confidence
+        # Intersections to compute over several protected attributes, None for the single one only
+        self.intersections = intersections
+
+    def read(self, path, names):
+        return ColumnStore(self.store).load(path, names) if self.store else read_columns(path, names)
+
+    def load(self, path):
+        columns = self.read(path, [self.label, self.prediction, self.protected])
+        codes, levels = encode(columns[self.protected])
+        actual = flags(columns[self.label], self.positive)
+        predicted = flags(columns[self.prediction], self.positive)
+        return actual, predicted, codes, levels
+
+    def privileged_mask(self, levels):
+        return flags(np.asarray(levels), self.privileged)
+
+    def compute(self, actual, predicted, codes, levels):
+        counts = confusion_counts(actual, predicted, codes, len(levels))
+        privileged = self.privileged_mask(levels)
+        metrics = metrics_from_counts(counts, privileged)
+        rates = group_rates(counts)
+        groups = {level: {name: plain(rate[i]) for name, rate in rates.items()} for i, level in enumerate(levels)}
+        for values in groups.values():
+            values["count"] = int(values["count"])
+        result = {"rows": int(len(codes)), "metrics": {name: plain(value) for name, value in metrics.items()},
+                  "groups": groups}
+        if self.bootstrap:
+            result["intervals"] = bootstrap_intervals(counts, privileged, self.bootstrap, self.seed, self.confidence)
+        return result
+
+    # result row for one submission.csv, with the error instead of metrics when it can't be read
+    def score(self, path):
+        try:
+            data = self.load(path)
+            encoded = self.intersections.load(path, self.read, len(data[0])) if self.intersections else None
+        except (OSError, ValueError) as e:
+            return {"path": path, "error": f"{type(e).__name__}: {e}", "rows": 0, "metrics": {}, "groups": {}}
+        result = dict({"path": path, "error": None}, **self.compute(*data))
+        if encoded is not None:
+            result["intersections"] = self.intersections.compute(data[0], data[1], encoded)
+        return result
+
+    # picklable for the batch workers
+    def __call__(self, path):
+        return self.score(path)
@@ -0,0 +1,74 @@
+import atexit
+import glob
+import json
+import multiprocessing
+import os
+import shutil
+import time
+
+
+# Per-file instrumentation: wall time, nodes dispatched and matches for each rule.
+# Only created when stats are enabled, so the uninstrumented path pays nothing.
+class RuleStats:
+    def __init__(self):
+        self.rules = {}
+        self.nodes = 0
+        self.walk_s = 0.0
+        self.total_s = 0.0
+
+    def entry(self, rule):
+        # skipped: 1 when the lexical pre-scan ruled the rule out, summed to a file count in the report
+        return self.rules.setdefault(rule, {"time_s": 0.0, "nodes": 0, "matches": 0, "skipped": 0})
+
+    def as_dict(self, filename, cached=False):
+        return {"file": filename, "cached": cached, "nodes": self.nodes, "walk_s": self.walk_s,
+                "total_s": self.total_s, "rules": self.rules}
+
+
+def spool_dir(path):
+    return path + ".parts"
+
+
+# Appends one file's stats to this process's spool file. Each flake8 --jobs worker writes its own
+# spool, so nothing interleaves; the main process merges them into the report when it exits.
+def record(path, stats):
+    with open(os.path.join(spool_dir(path), f"{os.getpid()}.jsonl"), "a") as f:
+        f.write(json.dumps(stats) + "\n")
+
+
+def merge(entries):
+    total = {"files": 0, "cached_files": 0, "nodes": 0, "walk_s": 0.0, "total_s": 0.0, "rules": {}}
+    for entry in entries:
+        total["files"] += 1
+        total["cached_files"] += entry["cached"]
+        total["nodes"] += entry["nodes"]
+        total["walk_s"] += entry["walk_s"]
+        total["total_s"] += entry["total_s"]
+        for rule, counts in entry["rules"].items():
+            merged = total["rules"].setdefault(rule, {"time_s": 0.0, "nodes": 0, "matches": 0, "skipped": 0})
+            for key, value in counts.items():
+                merged[key] = merged.get(key, 0) + value
+    return total
+
+
+def write_report(path):
+    entries = []
+    for part in sorted(glob.glob(os.path.join(spool_dir(path), "*.jsonl"))):
+        with open(part) as f:
+            entries += [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda e: e["file"] or "")
+    report = {"generated": time.strftime("%Y-%m-%dT%H:%M:%S"), "total": merge(entries), "files": entries}
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    shutil.rmtree(spool_dir(path), ignore_errors=True)
+    return report
+
+
+# Called while flake8 parses options. Only the main process owns the report: it clears spools left
+# by earlier runs and writes the merged JSON at exit; worker processes just append to the spool.
+def start(path):
+    if multiprocessing.parent_process() is not None:
+        return
+    shutil.rmtree(spool_dir(path), ignore_errors=True)
+    os.makedirs(spool_dir(path))
+    atexit.register(write_report, path)
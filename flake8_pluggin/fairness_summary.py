@@ -0,0 +1,83 @@
+import csv
+import json
+import statistics
+
+# FNA codes reported by the enabled rules; FNA100 carries the file's total score
+CODES = ["FNA101", "FNA103", "FNA104", "FNA105", "FNA106", "FNA107"]
+SCORE_CODE = "FNA100"
+PERCENTILES = [10, 25, 50, 75, 90]
+
+
+# linear interpolation between closest ranks, as numpy.percentile does by default
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    pos = (len(values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+# Collects per-file scores and FNA hits (rules that found something) and turns them into one
+# summary with per-file rows and aggregate statistics.
+class ScoreSummary:
+    def __init__(self):
+        self.files = {}
+
+    def file(self, path):
+        return self.files.setdefault(path, {"score": None, "hits": set()})
+
+    def add_score(self, path, score):
+        self.file(path)["score"] = score
+
+    def add_hit(self, path, code):
+        self.file(path)["hits"].add(code)
+
+    # a fairness_batch.score_file() row
+    def add_row(self, row):
+        if row["score"] is None:
+            return
+        self.add_score(row["path"], row["score"])
+        for code, result in row["results"].items():
+            if result["found"]:
+                self.add_hit(row["path"], code)
+
+    def summary(self):
+        scored = {path: f for path, f in self.files.items() if f["score"] is not None}
+        scores = [f["score"] for f in scored.values()]
+        aggregate = {"files": len(scored)}
+        if scores:
+            aggregate.update({
+                "mean": statistics.fmean(scores),
+                "stdev": statistics.pstdev(scores),
+                "min": min(scores),
+                "max": max(scores),
+                "percentiles": {f"p{q}": percentile(scores, q) for q in PERCENTILES},
+                "hit_rates": {code: sum(code in f["hits"] for f in scored.values()) / len(scored) for code in CODES},
+            })
+        files = [{"path": path, "score": f["score"], "hits": sorted(f["hits"])} for path, f in sorted(scored.items())]
+        return {"aggregate": aggregate, "files": files}
+
+    def write(self, path):
+        summary = self.summary()
+        if path.endswith(".csv"):
+            write_csv(summary, path)
+        else:
+            with open(path, "w") as f:
+                json.dump(summary, f, indent=2)
+        return summary
+
+
+# one row per file with 1/0 hits per code, followed by "(mean)" with hit rates and one row per percentile
+def write_csv(summary, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["path", "score"] + CODES)
+        for entry in summary["files"]:
+            writer.writerow([entry["path"], entry["score"]] + [int(code in entry["hits"]) for code in CODES])
+        aggregate = summary["aggregate"]
+        if aggregate["files"]:
+            writer.writerow(["(mean)", aggregate["mean"]] + [aggregate["hit_rates"][code] for code in CODES])
+            for name, value in aggregate["percentiles"].items():
+                writer.writerow([f"({name})", value] + [""] * len(CODES))
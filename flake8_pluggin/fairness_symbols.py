@@ -0,0 +1,150 @@
+import ast
+
+
+# "fm.metrics.demographic_parity_difference" for an attribute chain that starts at a plain name,
+# None for anything else (calls on call results, subscripts, ...)
+def dotted_name(node):
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+# Symbol table of one module, filled during the single walk and queried by every rule afterwards.
+# Import statements give the aliases (local name -> fully qualified name); names and calls are resolved
+# against them once the walk is done, so an import further down the tree still counts, and each name
+# is worked out once instead of once per rule. Every call gets its fully qualified name, but the rule
+# vocabularies are bare function names, so the rules match on its last part: a local model.fit and a
+# library function named fit still score the same.
+class SymbolTable:
+    def __init__(self):
+        self.aliases = {}
+        # Import / ImportFrom nodes in walk order
+        self.imports = []
+        # Name and Attribute nodes in walk order, see identifiers()
+        self.names_and_attributes = []
+        # FunctionDef and Call nodes in walk order, see named()
+        self.defs_and_calls = []
+        self._identifiers = None
+        self._named = None
+        # where each segment of a walk over several trees (notebook cells) starts in the lists above
+        self.marks = []
+        # recorded node -> segment label, built on the first segment() call
+        self._segments = None
+
+    # node type -> recorder for the node types the enabled rules read, plus imports whenever names or calls
+    # are read, since resolving them needs the aliases. Apart from imports the walk only appends nodes;
+    # names are worked out once the walk is done.
+    def recorders(self, node_types):
+        record = {
+            ast.Import: self.add_import,
+            ast.ImportFrom: self.add_import,
+            ast.Attribute: self.names_and_attributes.append,
+            ast.Name: self.names_and_attributes.append,
+            ast.FunctionDef: self.defs_and_calls.append,
+            ast.Call: self.defs_and_calls.append,
+        }
+        node_types = set(node_types)
+        if node_types & {ast.Call, ast.Name}:
+            node_types |= {ast.Import, ast.ImportFrom}
+        return {node_type: record[node_type] for node_type in node_types}
+
+    def add_import(self, node):
+        self.imports.append(node)
+        if isinstance(node, ast.Import):
+            for a in node.names:
+                if a.asname:
+                    self.aliases[a.asname] = a.name
+                else:
+                    # `import a.b` binds a
+                    head = a.name.split(".", 1)[0]
+                    self.aliases[head] = head
+        else:
+            module = "." * node.level + (node.module or "")
+            for a in node.names:
+                if a.name != "*":
+                    self.aliases[a.asname or a.name] = f"{module}.{a.name}" if module else a.name
+
+    # fully qualified name of a dotted name, with its first part resolved through the imports:
+    # fairlearn.metrics.MetricFrame for fm.MetricFrame after `import fairlearn.metrics as fm`
+    def qualify(self, name):
+        head, _, rest = name.partition(".")
+        target = self.aliases.get(head)
+        if target is None:
+            return name
+        return f"{target}.{rest}" if rest else target
+
+    # the name an imported local name stands for: OneHotEncoder for OHE after
+    # `from sklearn.preprocessing import OneHotEncoder as OHE`, the name itself when it isn't an alias
+    def resolve(self, name):
+        return self.qualify(name).rsplit(".", 1)[-1]
+
+    # fully qualified name of what a call calls, None when it isn't a plain dotted name. A method called
+    # on a local object stays as written (model.fit), since the object's type isn't known.
+    def qualified_call(self, node):
+        dotted = dotted_name(node.func)
+        return self.qualify(dotted) if dotted is not None else None
+
+    # (names, qualified name) of a call: the called name as written and the last part of its fully
+    # qualified name when that differs (`dir_(...)` after `import disparate_impact_ratio as dir_`).
+    # The rule vocabularies are bare function names, so rules match on these last parts.
+    def call_names(self, node):
+        fn = node.func
+        if type(fn) is ast.Attribute:
+            written = fn.attr
+        elif type(fn) is ast.Name:
+            written = fn.id
+        else:
+            return (None,), None
+        qualified = self.qualified_call(node)
+        resolved = qualified.rsplit(".", 1)[-1] if qualified is not None else written
+        return ((written,) if resolved == written else (written, resolved)), qualified
+
+    # identifier -> first Name or Attribute node using it, in walk order; an aliased name also counts as
+    # the name it was imported as. Identifier rules only need the first occurrence, and one entry per
+    # distinct name keeps this small on large files.
+    def identifiers(self):
+        if self._identifiers is None:
+            first = {}
+            for node in self.names_and_attributes:
+                if type(node) is ast.Name:
+                    first.setdefault(node.id, node)
+                    first.setdefault(self.resolve(node.id), node)
+                else:
+                    first.setdefault(node.attr, node)
+            self._identifiers = first
+        return self._identifiers
+
+    # (names, qualified name, node) for every def and call: the def's name and None, or call_names()
+    def named(self):
+        if self._named is None:
+            self._named = [((node.name,), None, node) if isinstance(node, ast.FunctionDef)
+                           else (*self.call_names(node), node) for node in self.defs_and_calls]
+        return self._named
+
+    # starts a new segment: nodes recorded from now on belong to `label`
+    def mark(self, label):
+        self.marks.append((len(self.imports), len(self.names_and_attributes), len(self.defs_and_calls), label))
+        self._segments = None
+
+    # label of the segment a recorded node was walked in, None before the first mark
+    def segment(self, node):
+        if self._segments is None:
+            lists = (self.imports, self.names_and_attributes, self.defs_and_calls)
+            ends = [mark[:3] for mark in self.marks[1:]] + [tuple(len(entries) for entries in lists)]
+            self._segments = {}
+            for mark, end in zip(self.marks, ends):
+                for column, entries in enumerate(lists):
+                    for recorded in entries[mark[column]:end[column]]:
+                        self._segments[recorded] = mark[3]
+        return self._segments.get(node)
+
+    # how many recorded nodes a rule reading these node types goes through
+    def count(self, node_types):
+        lists = {ast.Import: self.imports, ast.ImportFrom: self.imports, ast.Attribute: self.names_and_attributes,
+                 ast.Name: self.names_and_attributes, ast.FunctionDef: self.defs_and_calls, ast.Call: self.defs_and_calls}
+        return sum(len(entries) for entries in {id(lists[t]): lists[t] for t in node_types}.values())
@@ -1,29 +1,222 @@
 import ast
+import hashlib
 import sys 
+from time import perf_counter
 if sys.version_info < (3, 8):
     import importlib_metadata
 else: 
     import importlib.metadata as importlib_metadata
+
+import fairness_rules
+import fairness_stats
+import fairness_symbols
+from fairness_cache import DEFAULT_MAX_BYTES, content_key, open_cache, prepare
+from fairness_symbols import SymbolTable
+from fairness_rules import (DATA_LIBS, MISSING_VALUE_FUNCS, ENCODERS, BIAS_LIBS, METRICS,
+                            TRAINING_TERMS, EVALUATION_FUNCS)
+
 class Fairnessevaluator:
     name = __name__
     version = importlib_metadata.version(__name__)
 
-    def __init__(self, tree: ast.AST) -> None:
+    # rules reported by run(), in order; missing_value_handling is disabled
+    checks = ["data_collection", "categorical_encoding", "bias_mitigation",
+              "fairness_metrics", "model_training", "evaluation"]
+    # node types each rule reads from the symbol table; the single walk only records these
+    collects = {
+        "data_collection": (ast.Import, ast.ImportFrom),
+        "missing_value_handling": (ast.Attribute, ast.Name),
+        "categorical_encoding": (ast.Attribute, ast.Name),
+        "bias_mitigation": (ast.Import, ast.ImportFrom),
+        "fairness_metrics": (ast.FunctionDef, ast.Call),
+        "model_training": (ast.FunctionDef, ast.Call),
+        "evaluation": (ast.FunctionDef, ast.Call),
+    }
+    # vocabulary each rule matches against, compiled into the lexical pre-scan
+    vocabularies = {
+        "data_collection": DATA_LIBS,
+        "missing_value_handling": MISSING_VALUE_FUNCS,
+        "categorical_encoding": ENCODERS,
+        "bias_mitigation": BIAS_LIBS,
+        "fairness_metrics": METRICS,
+        "model_training": TRAINING_TERMS,
+        "evaluation": EVALUATION_FUNCS,
+    }
+    prefilter = fairness_rules.Prefilter(vocabularies)
+
+    # set from --fna-stats
+    stats_path = None
+    # set from --fna-cache / --fna-cache-size
+    cache_path = None
+    cache_max_bytes = DEFAULT_MAX_BYTES
+    _ruleset = None
+
+    def __init__(self, tree: ast.AST, lines=None, filename=None) -> None:
         self.tree = tree
+        self.lines = lines
+        self.filename = filename
+        # per-rule timings and counters, only collected with --fna-stats
+        self.stats = fairness_stats.RuleStats() if self.stats_path else None
         self.score = 0
         self.issues = []
+        self.nodes_visited = 0
+        # imports, identifiers, defs and calls recorded by the walk, shared by all rules
+        self.symbols = SymbolTable()
+        # per FNA code: found and missing items and the points awarded, for machine-readable output
+        self.results = {}
+        # found items per rule, kept in first-seen order and mapped to the node they were found at
+        self.found = {check: {} for check in self.collects}
+        # rules the pre-scan says may fire, None when the source wasn't scanned
+        self.possible = None
+
+    @classmethod
+    def add_options(cls, parser):
+        parser.add_option("--fna-cache", default=None, parse_from_config=True,
+                          help="SQLite file caching FNA results by file content (default: no cache)")
+        parser.add_option("--fna-cache-size", type=int, default=DEFAULT_MAX_BYTES, parse_from_config=True,
+                          help="maximum size of the FNA result cache in bytes")
+        parser.add_option("--fna-report", default=None, parse_from_config=True,
+                          help="with --format=fna-summary, write the score summary to this JSON or CSV file")
+        parser.add_option("--fna-stats", default=None, parse_from_config=True,
+                          help="write per-rule timings and counters for every file to this JSON report")
+
+    @classmethod
+    def parse_options(cls, options):
+        cls.cache_path = options.fna_cache
+        cls.cache_max_bytes = options.fna_cache_size
+        if cls.cache_path:
+            # before flake8 starts its --jobs processes
+            prepare(cls.cache_path, cls.cache_max_bytes)
+        cls.stats_path = options.fna_stats
+        if cls.stats_path:
+            fairness_stats.start(cls.stats_path)
+
+    # plugin version plus a digest of the rule definitions, so editing a rule invalidates cached results
+    @classmethod
+    def ruleset_version(cls):
+        if cls._ruleset is None:
+            h = hashlib.sha256()
+            for path in (__file__, fairness_rules.__file__, fairness_symbols.__file__):
+                with open(path, "rb") as f:
+                    h.update(f.read())
+            cls._ruleset = f"{cls.version}-{h.hexdigest()[:16]}"
+        return cls._ruleset
+
     def run(self): 
-        self.check_data_collection()
-        # self.check_missing_value_handling
-        self.check_categorical_encoding()
-        self.check_bias_mitigation()
-        self.check_fairness_metrics()
-        self.check_model_training()
-        self.check_evaluation()
+        start = perf_counter()
+        cached = False
+        source = "".join(self.lines) if self.lines is not None else None
+        if source is not None:
+            self.prescan(source)
+        cache = open_cache(self.cache_path, self.cache_max_bytes) if self.cache_path else None
+        if cache is not None and source is not None:
+            cached = self.evaluate_cached(cache, self.raw_source(source))
+        else:
+            self.evaluate()
+        if self.stats is not None:
+            self.stats.total_s = perf_counter() - start
+            fairness_stats.record(self.stats_path, self.stats.as_dict(self.filename, cached))
 
         for line, col, msg in self.issues:
             yield line, col, msg, type(self)
-        print(f"Fairness Score: {self.score}")
+        # the total goes through flake8's report pipeline with the file name, for --format=fna-summary
+        yield 1, 0, f"FNA100: Fairness Score: {self.score}", type(self)
+
+    # the file's bytes, which the batch scorer hashes too, so both share cache entries; flake8's decoded
+    # lines when there is no file to read (stdin)
+    def raw_source(self, source):
+        if self.filename and self.filename not in ("-", "stdin"):
+            try:
+                with open(self.filename, "rb") as f:
+                    return f.read()
+            except OSError:
+                pass
+        return source
+
+    # rules whose vocabulary doesn't occur in the source are not fed any nodes; they still report their
+    # "not found" message, so the result is the same as without the scan
+    def prescan(self, source):
+        self.possible = self.prefilter.scan(source)
+        return self.possible
+
+    def skipped_rules(self):
+        if self.possible is None:
+            return []
+        return [check for check in self.checks if check not in self.possible]
+
+    # scores the tree without printing, used directly by the batch scorer
+    def evaluate(self):
+        if self.stats is not None:
+            return self.evaluate_instrumented()
+        self.visit()
+        self.collect()
+        for check in self.checks:
+            getattr(self, "check_" + check)()
+
+    def evaluate_instrumented(self):
+        start = perf_counter()
+        self.visit()
+        self.stats.walk_s = perf_counter() - start
+        self.stats.nodes = self.nodes_visited
+        skipped = self.skipped_rules()
+        for check in self.checks:
+            entry = self.stats.entry(check)
+            start = perf_counter()
+            if check not in skipped:
+                getattr(self, "collect_" + check)()
+                entry["nodes"] += self.symbols.count(self.collects[check])
+            getattr(self, "check_" + check)()
+            entry["time_s"] += perf_counter() - start
+            entry["matches"] = len(self.found[check])
+        for check in self.skipped_rules():
+            self.stats.entry(check)["skipped"] += 1
+
+    # evaluate(), or restore a previous result for identical source and rules from the cache;
+    # returns whether the cache was hit
+    def evaluate_cached(self, cache, source):
+        key = content_key(source, self.ruleset_version())
+        cached = cache.get(key)
+        if cached is not None:
+            self.restore(cached)
+            return True
+        self.evaluate()
+        cache.put(key, self.cache_entry())
+        return False
+
+    def cache_entry(self):
+        return {"score": self.score, "issues": self.issues, "results": self.results}
+
+    def restore(self, entry):
+        self.score = entry["score"]
+        self.issues = [tuple(issue) for issue in entry["issues"]]
+        self.results = entry["results"]
+
+    # one ast.walk fills the symbol table with the node types the enabled rules read; no walk at all
+    # when the pre-scan ruled out every rule
+    def visit(self):
+        dispatch = self.recorders()
+        if dispatch:
+            self.walk(self.tree, dispatch)
+
+    def recorders(self):
+        skipped = self.skipped_rules()
+        node_types = [t for check in self.checks if check not in skipped for t in self.collects[check]]
+        return self.symbols.recorders(node_types) if node_types else None
+
+    def walk(self, tree, dispatch):
+        for node in ast.walk(tree):
+            self.nodes_visited += 1
+            record = dispatch.get(type(node))
+            if record is not None:
+                record(node)
+
+    # every enabled rule queries the symbol table for its items
+    def collect(self):
+        skipped = self.skipped_rules()
+        for check in self.checks:
+            if check not in skipped:
+                getattr(self, "collect_" + check)()
+
     # format on how the error message should look like, it takes as input the line, column and the message   
     def add_issue(self, node, message, deduction=0):
         lineno = getattr(node, 'lineno', 1)
@@ -31,200 +224,122 @@ class Fairnessevaluator:
         self.issues.append((lineno, col_offset, message))
         self.score -= deduction    
 
-    def check_data_collection(self):
-        libs = ["pandas", "numpy", "sklearn", "datasets"]
-        found = []
-        for node in ast.walk(self.tree):
-            if isinstance(node, ast.Import):
-                for a in node.names:
-                    if a.name in libs and a.name not in found:
-                        found.append(a.name)
-            elif isinstance(node, ast.ImportFrom):
-                mod = node.module.split(".",1)[0] if node.module else ""
-                if mod in libs and mod not in found:
-                    found.append(mod)
-
-        missing = [l for l in libs if l not in found]
-        weight = 15
-        anchor = next(ast.walk(self.tree))
+    # shared "Found ..., but didn't find ..." report for a rule once the walk is done
+    def report(self, check, code, vocab, weight, none_message):
+        found = self.found[check]
+        missing = [v for v in vocab if v not in found]
+        anchor = self.tree
+        self.results[code] = {"found": list(found), "missing": missing, "points": weight if found else 0}
 
         if found:
             self.score += weight
             fstr = ", ".join(found)
             mstr = ", ".join(missing)
             self.add_issue(anchor,
-                f"FNA101: Found {fstr}, but didn’t find {mstr}, +{weight}"
+                f"{code}: Found {fstr}, but didn’t find {mstr}, +{weight}"
             )
         else:
             # no items , no +score, just message
-            self.add_issue(anchor,
-                "FNA101: No dataset processing library found (e.g., pandas, numpy, sklearn, datasets)"
-            )
+            self.add_issue(anchor, f"{code}: {none_message}")
+
+    def collect_data_collection(self):
+        found = self.found["data_collection"]
+        for node in self.symbols.imports:
+            if isinstance(node, ast.Import):
+                for a in node.names:
+                    if a.name in DATA_LIBS:
+                        found.setdefault(a.name, node)
+            else:
+                mod = node.module.split(".",1)[0] if node.module else ""
+                if mod in DATA_LIBS:
+                    found.setdefault(mod, node)
+
+    def check_data_collection(self):
+        self.report("data_collection", "FNA101", DATA_LIBS, 15,
+            "No dataset processing library found (e.g., pandas, numpy, sklearn, datasets)"
+        )
+
+    def collect_missing_value_handling(self):
+        found = self.found["missing_value_handling"]
+        lookup = MISSING_VALUE_FUNCS.lookup
+        for name, node in self.symbols.identifiers().items():
+            if name in lookup:
+                found.setdefault(name, node)
 
     def check_missing_value_handling(self):
-        funcs = ["dropna", "fillna"]
-        found = []
-        for node in ast.walk(self.tree):
-            if isinstance(node, ast.Attribute) and node.attr in funcs:
-                if node.attr not in found: found.append(node.attr)
-            elif isinstance(node, ast.Name) and node.id in funcs:
-                if node.id not in found: found.append(node.id)
-
-        missing = [f for f in funcs if f not in found]
-        weight = 10
-        anchor = next(ast.walk(self.tree))
+        self.report("missing_value_handling", "FNA102", MISSING_VALUE_FUNCS, 10,
+            "No handling of missing values detected (e.g., dropna, fillna)"
+        )
 
-        if found:
-            self.score += weight
-            fstr = ", ".join(found)
-            mstr = ", ".join(missing)
-            self.add_issue(anchor,
-                f"FNA102: Found {fstr}, but didn’t find {mstr}, +{weight}"
-            )
-        else:
-            self.add_issue(anchor,
-                "FNA102: No handling of missing values detected (e.g., dropna, fillna)"
-            )
+    def collect_categorical_encoding(self):
+        found = self.found["categorical_encoding"]
+        lookup = ENCODERS.lookup
+        for name, node in self.symbols.identifiers().items():
+            if name in lookup:
+                found.setdefault(name, node)
 
     def check_categorical_encoding(self):
-        encs = ["get_dummies", "OneHotEncoder", "LabelEncoder"]
-        found = []
-        for node in ast.walk(self.tree):
-            if isinstance(node, ast.Attribute) and node.attr in encs:
-                if node.attr not in found: found.append(node.attr)
-            elif isinstance(node, ast.Name) and node.id in encs:
-                if node.id not in found: found.append(node.id)
-
-        missing = [e for e in encs if e not in found]
-        weight = 10
-        anchor = next(ast.walk(self.tree))
+        self.report("categorical_encoding", "FNA103", ENCODERS, 10,
+            "No categorical encoding found (e.g., get_dummies, OneHotEncoder, LabelEncoder)"
+        )
 
-        if found:
-            self.score += weight
-            fstr = ", ".join(found)
-            mstr = ", ".join(missing)
-            self.add_issue(anchor,
-                f"FNA103: Found {fstr}, but didn’t find {mstr}, +{weight}"
-            )
-        else:
-            self.add_issue(anchor,
-                "FNA103: No categorical encoding found (e.g., get_dummies, OneHotEncoder, LabelEncoder)"
-                
-            )
-        
-    def check_bias_mitigation(self):
-        libs = ["aif360", "fairlearn", "equitas", "fairness_indicator"]
-        found = []
-        for node in ast.walk(self.tree):
+    def collect_bias_mitigation(self):
+        found = self.found["bias_mitigation"]
+        for node in self.symbols.imports:
             if isinstance(node, ast.Import):
                 for a in node.names:
-                    if a.name.split(".",1)[0] in libs and a.name.split(".",1)[0] not in found:
-                        found.append(a.name.split(".",1)[0])
-            elif isinstance(node, ast.ImportFrom):
+                    mod = a.name.split(".",1)[0]
+                    if mod in BIAS_LIBS:
+                        found.setdefault(mod, node)
+            else:
                 mod = node.module.split(".",1)[0] if node.module else ""
-                if mod in libs and mod not in found:
-                    found.append(mod)
+                if mod in BIAS_LIBS:
+                    found.setdefault(mod, node)
 
-        missing = [l for l in libs if l not in found]
-        weight = 15
-        anchor = next(ast.walk(self.tree))
+    def check_bias_mitigation(self):
+        self.report("bias_mitigation", "FNA104", BIAS_LIBS, 15,
+            "No bias mitigation techniques found (e.g., aif360, fairlearn, equitas, fairness_indicator)"
+        )
 
-        if found:
-            self.score += weight
-            fstr = ", ".join(found)
-            mstr = ", ".join(missing)
-            self.add_issue(anchor,
-                f"FNA104: Found {fstr}, but didn’t find {mstr}, +{weight}"
-            )
-        else:
-            self.add_issue(anchor,
-                "FNA104: No bias mitigation techniques found (e.g., aif360, fairlearn, equitas, fairness_indicator)"
-            )
+    def collect_fairness_metrics(self):
+        found = self.found["fairness_metrics"]
+        lookup = METRICS.lookup
+        for names, _, node in self.symbols.named():
+            for name in names:
+                if name in lookup:
+                    found.setdefault(name, node)
 
     def check_fairness_metrics(self):
-        mets = ["equalized_odds", "demographic_parity", "statistical_parity", "disparate_impact_ratio", "accuracy","average_abs_odds_difference", "average_odds_difference", "consistency","false_discovery_rate","Equal_opporutnity_differenace","Equalized_odds_difference","Error_rte_difference","Error_rate_ratio","false ommisionate_difference"]
-        found = []
-        for node in ast.walk(self.tree):
-            if isinstance(node, ast.FunctionDef) and node.name in mets:
-                if node.name not in found: found.append(node.name)
-            elif isinstance(node, ast.Call):
-                fn = node.func
-                name = fn.id if isinstance(fn, ast.Name) else fn.attr if isinstance(fn, ast.Attribute) else None
-                if name in mets and name not in found:
-                    found.append(name)
-
-        missing = [m for m in mets if m not in found]
-        weight = 10
-        anchor = next(ast.walk(self.tree))
+        self.report("fairness_metrics", "FNA105", METRICS, 10,
+            "No fairness metrics function found (e.g., equalized_odds, demographic_parity, statistical_parity, disparate_impact_ratio)"
+        )
+
+    def collect_model_training(self):
+        found = self.found["model_training"]
+        lookup = TRAINING_TERMS.lookup
+        for names, _, node in self.symbols.named():
+            if type(node) is ast.FunctionDef:
+                for t in TRAINING_TERMS.substrings(node.name):
+                    found.setdefault(t, node)
+                continue
+            for name in names:
+                if name in lookup:
+                    found.setdefault(name, node)
 
-        if found:
-            self.score += weight
-            fstr = ", ".join(found)
-            mstr = ", ".join(missing)
-            self.add_issue(anchor,
-                f"FNA105: Found {fstr}, but didn’t find {mstr}, +{weight}"
-            )
-        else:
-            self.add_issue(anchor,
-                "FNA105: No fairness metrics function found (e.g., equalized_odds, demographic_parity, statistical_parity, disparate_impact_ratio)"
-                           
-            )
-         
     def check_model_training(self):
-        terms = ["adversarial", "reweighting","DisparateImpactRemover","AdversarialDebiasing","ARTClassifier","PrejudiceRemover", "EqOddsPostprocessing","DeterministicReranking","GerryFairClassifier"]
-        found = []
-        for node in ast.walk(self.tree):
-            if isinstance(node, ast.FunctionDef) and any(t in node.name for t in terms):
-                for t in terms:
-                    if t in node.name and t not in found: found.append(t)
-            elif isinstance(node, ast.Call):
-                fn = node.func
-                name = fn.id if isinstance(fn, ast.Name) else fn.attr if isinstance(fn, ast.Attribute) else None
-                if name in terms and name not in found:
-                    found.append(name)
-
-        missing = [t for t in terms if t not in found]
-        weight = 10
-        anchor = next(ast.walk(self.tree))
+        self.report("model_training", "FNA106", TRAINING_TERMS, 10,
+            "No fairness-aware training techniques found (e.g., adversarial, reweighting,DisparateImpactRemover,AdversarialDebiasing,ARTClassifier,PrejudiceRemover, EqOddsPostprocessing,DeterministicReranking,GerryFairClassifier)"
+        )
 
-        if found:
-            self.score += weight
-            fstr = ", ".join(found)
-            mstr = ", ".join(missing)
-            self.add_issue(anchor,
-                f"FNA106: Found {fstr}, but didn’t find {mstr}, +{weight}"
-            )
-        else:
-            self.add_issue(anchor,
-                "FNA106: No fairness-aware training techniques found (e.g., adversarial, reweighting,DisparateImpactRemover,AdversarialDebiasing,ARTClassifier,PrejudiceRemover, EqOddsPostprocessing,DeterministicReranking,GerryFairClassifier)"
-                
-            )
+    def collect_evaluation(self):
+        found = self.found["evaluation"]
+        lookup = EVALUATION_FUNCS.lookup
+        for names, _, node in self.symbols.named():
+            for name in names:
+                if name in lookup:
+                    found.setdefault(name, node)
 
     def check_evaluation(self):
-        funcs = ["audit_bias", "disparate_impact_ratio"]
-        found = []
-        for node in ast.walk(self.tree):
-            if isinstance(node, ast.FunctionDef) and node.name in funcs:
-                if node.name not in found: found.append(node.name)
-            elif isinstance(node, ast.Call):
-                fn = node.func
-                name = fn.id if isinstance(fn, ast.Name) else fn.attr if isinstance(fn, ast.Attribute) else None
-                if name in funcs and name not in found:
-                    found.append(name)
-
-        missing = [f for f in funcs if f not in found]
-        weight = 10
-        anchor = next(ast.walk(self.tree))
-
-        if found:
-            self.score += weight
-            fstr = ", ".join(found)
-            mstr = ", ".join(missing)
-            self.add_issue(anchor,
-                f"FNA107: Found {fstr}, but didn’t find {mstr}, +{weight}"
-            )
-        else:
-            self.add_issue(anchor,
-                "FNA107: No fairness evaluation or auditing function found (e.g., audit_bias, disparate_impact_ratio)"
-                
-            )
+        self.report("evaluation", "FNA107", EVALUATION_FUNCS, 10,
+            "No fairness evaluation or auditing function found (e.g., audit_bias, disparate_impact_ratio)"
+        )
@@ -0,0 +1,16 @@
+import ast
+from benchmarks.bench_fairness import bench_size, generate_script
+
+def test_generated_script_has_exact_size_and_parses():
+    for lines in (1, 10, 250):
+        source = generate_script(lines, seed=3)
+        assert source.count("\n") == lines
+        ast.parse(source)
+
+def test_vocab_rate_controls_findings():
+    plain = bench_size(200, repeat=1, vocab_rate=0.0)
+    rich = bench_size(200, repeat=1, vocab_rate=1.0)
+    assert plain["score"] == 0
+    assert rich["score"] > 0
+    assert set(rich["rules_s"]) == {"data_collection", "categorical_encoding", "bias_mitigation",
+                                    "fairness_metrics", "model_training", "evaluation"}
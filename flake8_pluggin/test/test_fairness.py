@@ -82,3 +82,18 @@ def test_flags_missing_fairness_training():
 
     # should flag missing training techniques
     assert any(msg.startswith("FNA106: No fairness-aware training") for _, _, msg, _ in issues)
+
+def test_single_walk_visits_each_node_once():
+    code = '''
+        import pandas as pd
+        from aif360.sklearn.metrics import disparate_impact_ratio
+
+        def adversarial_training(data):
+            return pd.get_dummies(data)
+    '''
+    tree = ast.parse(textwrap.dedent(code))
+    checker = Fairnessevaluator(tree)
+    list(checker.run())
+
+    # all rules are fed from one walk, so every node is visited exactly once
+    assert checker.nodes_visited == sum(1 for _ in ast.walk(tree))
@@ -0,0 +1,49 @@
+import csv
+import json
+from fairness_batch import main, score_file
+
+TRAIN = '''
+import pandas as pd
+from aif360.sklearn.metrics import disparate_impact_ratio
+di = disparate_impact_ratio(y_true, y_pred, prot_attr=prot_attr)
+'''
+
+def write_corpus(tmp_path):
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    (tmp_path / "train.py").write_text(TRAIN)
+    (sub / "utils.py").write_text("def helper():\n    return 1\n")
+    (sub / "broken.py").write_text("def broken(:\n")
+    (sub / "notes.txt").write_text("import pandas")
+
+def test_score_file_reports_found_and_missing(tmp_path):
+    write_corpus(tmp_path)
+    row = score_file(str(tmp_path / "train.py"))
+    assert row["score"] == 50
+    assert row["results"]["FNA104"]["found"] == ["aif360"]
+    assert "fairlearn" in row["results"]["FNA104"]["missing"]
+
+def test_score_file_reports_syntax_errors(tmp_path):
+    write_corpus(tmp_path)
+    row = score_file(str(tmp_path / "sub" / "broken.py"))
+    assert row["score"] is None
+    assert row["error"].startswith("SyntaxError")
+
+def test_batch_jsonl_with_process_pool(tmp_path):
+    write_corpus(tmp_path)
+    out = tmp_path / "scores.jsonl"
+    assert main(["batch", str(tmp_path), "-o", str(out), "-j", "2"]) == 0
+
+    rows = {json.loads(line)["path"]: json.loads(line) for line in out.read_text().splitlines()}
+    assert len(rows) == 3
+    assert rows[str(tmp_path / "train.py")]["score"] == 50
+    assert rows[str(tmp_path / "sub" / "utils.py")]["score"] == 0
+
+def test_batch_csv(tmp_path):
+    write_corpus(tmp_path)
+    out = tmp_path / "scores.csv"
+    assert main(["batch", str(tmp_path / "train.py"), "-o", str(out), "-j", "1"]) == 0
+
+    rows = list(csv.DictReader(out.open()))
+    assert rows[0]["score"] == "50"
+    assert rows[0]["FNA101_found"] == "pandas"
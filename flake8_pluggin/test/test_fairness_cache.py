@@ -0,0 +1,80 @@
+import ast
+import json
+from fairness_batch import main
+from fairness_cache import ResultCache, content_key, prepare
+from flake8_pluggin_eval import Fairnessevaluator
+
+SOURCE = "import pandas as pd\nfrom fairlearn.metrics import demographic_parity\n"
+
+def test_key_depends_on_content_and_ruleset():
+    assert content_key(SOURCE, "0.1.0-a") == content_key(SOURCE.encode(), "0.1.0-a")
+    assert content_key(SOURCE, "0.1.0-a") != content_key(SOURCE, "0.1.0-b")
+    assert content_key(SOURCE, "0.1.0-a") != content_key(SOURCE + "\n", "0.1.0-a")
+
+def test_get_put_and_counters(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.db"))
+    assert cache.get("k") is None
+    cache.put("k", {"score": 30})
+    assert cache.get("k") == {"score": 30}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_lru_eviction_keeps_store_under_limit(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.db"), max_bytes=100)
+    cache.put("old", {"pad": "x" * 40})
+    cache.put("new", {"pad": "y" * 40})
+    cache.put("newest", {"pad": "z" * 40})
+    assert cache.get("old") is None
+    assert cache.get("newest") is not None
+    total = cache.db.execute("SELECT total FROM usage").fetchone()[0]
+    assert total <= 100
+
+def test_cached_run_matches_fresh_run(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.db"))
+    fresh = Fairnessevaluator(ast.parse(SOURCE))
+    fresh.evaluate_cached(cache, SOURCE)
+    warm = Fairnessevaluator(ast.parse(SOURCE))
+    warm.evaluate_cached(cache, SOURCE)
+
+    assert cache.hits == 1
+    assert warm.issues == fresh.issues
+    assert warm.score == fresh.score == 30
+
+def test_flake8_and_batch_share_cache_entries(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "s.py"
+    # flake8 hands the plugin newline-normalized lines
+    path.write_bytes(SOURCE.replace("\n", "\r\n").encode())
+    db = str(tmp_path / "cache.db")
+    monkeypatch.setattr(Fairnessevaluator, "cache_path", db)
+    list(Fairnessevaluator(ast.parse(SOURCE), SOURCE.splitlines(True), str(path)).run())
+
+    main(["batch", str(path), "-o", str(tmp_path / "out.jsonl"), "-j", "1", "--cache", db])
+    assert "Scored 1 files (1 from cache)" in capsys.readouterr().err
+
+def test_batch_reuses_cache_across_workers(tmp_path, capsys):
+    for i in range(6):
+        # distinct contents, identical files would be scored only once anyway
+        (tmp_path / f"s{i}.py").write_text(SOURCE + f"# script {i}\n")
+    db = str(tmp_path / "cache.db")
+    out = str(tmp_path / "out.jsonl")
+    main(["batch", str(tmp_path), "-o", out, "-j", "3", "--cache", db])
+    main(["batch", str(tmp_path), "-o", out, "-j", "3", "--cache", db])
+
+    assert "Scored 6 files (6 from cache)" in capsys.readouterr().err
+    rows = [json.loads(line) for line in open(out)]
+    assert all(row["score"] == 30 for row in rows)
+
+def test_prepare_switches_to_wal_once(tmp_path):
+    db = str(tmp_path / "cache.db")
+    prepare(db)
+    cache = ResultCache(db)
+    assert cache.db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert cache.get("k") is None
+
+def test_batch_scores_without_an_unusable_cache(tmp_path, capsys):
+    (tmp_path / "s.py").write_text(SOURCE)
+    out = str(tmp_path / "out.jsonl")
+    main(["batch", str(tmp_path), "-o", out, "-j", "1", "--cache", str(tmp_path / "missing" / "cache.db")])
+
+    err = capsys.readouterr().err
+    assert "scoring without it" in err and "Scored 1 files (0 from cache)" in err
+    assert [json.loads(line)["score"] for line in open(out)] == [30]
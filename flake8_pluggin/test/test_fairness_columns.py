@@ -0,0 +1,78 @@
+import os
+import pytest
+from fairness_batch import main
+
+np = pytest.importorskip("numpy")
+from fairness_columns import Categorical, ColumnStore, read_columns
+from fairness_runtime import SubmissionMetrics
+
+TEST_X = "age,fnlwgt,sex,race\n39,77516,1,White\n50,83311,0,Black\n38,215646,1,White\n"
+SUBMISSION = "Actual_y,Predicted_y,sex\n1,1,1\n0,1,0\n1,0,1\n0,0,0\n"
+
+def test_columns_get_compact_types(tmp_path):
+    path = tmp_path / "test_X.csv"
+    path.write_text(TEST_X)
+    columns = read_columns(str(path))
+
+    assert columns["age"].dtype == np.int8
+    assert columns["fnlwgt"].dtype == np.int32
+    assert isinstance(columns["race"], Categorical)
+    assert columns["race"].codes.dtype == np.uint8
+    assert columns["race"].levels == ["Black", "White"]
+    assert columns["race"].codes.tolist() == [1, 0, 1]
+
+def test_store_ingests_once_and_maps_afterwards(tmp_path):
+    path = tmp_path / "test_X.csv"
+    path.write_text(TEST_X)
+    store = ColumnStore(str(tmp_path / "store"))
+
+    first = store.load(str(path), ["age", "race"])
+    again = store.load(str(path), ["age", "race"])
+    assert (store.misses, store.hits) == (1, 1)
+    assert isinstance(again["age"], np.memmap)
+    assert not again["age"].flags.writeable
+    assert again["age"].tolist() == first["age"].tolist() == [39, 50, 38]
+    assert again["race"].levels == ["Black", "White"]
+
+    # same content under another name is the same entry
+    copy = tmp_path / "copy.csv"
+    copy.write_text(TEST_X)
+    assert store.ingest(str(copy))["cached"]
+    with pytest.raises(ValueError):
+        store.load(str(path), ["income"])
+
+def test_unchanged_files_are_not_hashed_again(tmp_path):
+    path = tmp_path / "test_X.csv"
+    path.write_text(TEST_X)
+    store = ColumnStore(str(tmp_path / "store"))
+    store.load(str(path))
+
+    store = ColumnStore(str(tmp_path / "store"))
+    store.load(str(path))
+    assert (store.hashed, store.hits) == (0, 1)
+    path.write_text(TEST_X.replace("39", "41"))
+    os.utime(path, ns=(0, 1))
+    assert store.load(str(path))["age"].tolist() == [41, 50, 38]
+    assert (store.hashed, store.misses) == (1, 1)
+
+def test_metrics_are_the_same_through_the_store(tmp_path):
+    path = str(tmp_path / "submission.csv")
+    with open(path, "w") as f:
+        f.write(SUBMISSION)
+    direct = SubmissionMetrics().score(path)
+    stored = SubmissionMetrics(store=str(tmp_path / "store")).score(path)
+    assert stored == direct
+    assert SubmissionMetrics(store=str(tmp_path / "store")).score(path) == direct
+
+def test_ingest_command(tmp_path, capsys):
+    (tmp_path / "run").mkdir()
+    (tmp_path / "run" / "submission.csv").write_text(SUBMISSION)
+    (tmp_path / "run" / "test_X.csv").write_text(TEST_X)
+    (tmp_path / "run" / "empty.csv").write_text("a,b\n")
+    store = str(tmp_path / "store")
+
+    assert main(["ingest", str(tmp_path / "run"), "--store", store, "-j", "1"]) == 0
+    assert "Ingested 2 files" in capsys.readouterr().err
+    assert main(["ingest", str(tmp_path / "run"), "--store", store, "-j", "1"]) == 0
+    assert "Ingested 0 files into" in capsys.readouterr().err
+    assert len([d for d in os.listdir(store) if not d.startswith(".")]) >= 1
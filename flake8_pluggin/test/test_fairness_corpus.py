@@ -0,0 +1,50 @@
+import json
+from fairness_batch import main
+from fairness_corpus import discover, scan
+
+TRAIN = "import pandas as pd\nfrom aif360.sklearn.metrics import disparate_impact_ratio\n"
+
+def write_tree(root):
+    for folder in ("LLm_evaluation", "flake8_pluggin", "flake8_pluggin/.ipynb_checkpoints",
+                   "flake8_pluggin/__pycache__", "flake8_pluggin/pkg.egg-info", "flake8_pluggin/test"):
+        (root / folder).mkdir(parents=True, exist_ok=True)
+    (root / "LLm_evaluation" / "train_updated.py").write_text(TRAIN)
+    (root / "flake8_pluggin" / "train_updated.py").write_text(TRAIN)
+    (root / "flake8_pluggin" / ".ipynb_checkpoints" / "train_updated-checkpoint.py").write_text(TRAIN)
+    (root / "flake8_pluggin" / "__pycache__" / "stale.py").write_text(TRAIN)
+    (root / "flake8_pluggin" / "pkg.egg-info" / "setup.py").write_text("")
+    (root / "flake8_pluggin" / "eval.py").write_text("import numpy\n")
+    (root / "flake8_pluggin" / "test" / "test_eval.py").write_text("import numpy as np\n")
+
+def test_scan_skips_artifacts(tmp_path):
+    write_tree(tmp_path)
+    paths = [p[len(str(tmp_path)) + 1:] for p, _ in scan(str(tmp_path))]
+    assert paths == ["LLm_evaluation/train_updated.py", "flake8_pluggin/eval.py",
+                     "flake8_pluggin/train_updated.py", "flake8_pluggin/test/test_eval.py"]
+
+def test_identical_files_are_grouped(tmp_path):
+    write_tree(tmp_path)
+    corpus = discover([str(tmp_path)])
+    first = str(tmp_path / "LLm_evaluation" / "train_updated.py")
+    copy = str(tmp_path / "flake8_pluggin" / "train_updated.py")
+
+    assert corpus.files == 4
+    assert corpus.duplicates[first] == [copy]
+    assert len(corpus.unique()) == 3
+    assert list(corpus.fan_out({"path": first, "score": 50})) == [
+        {"path": first, "score": 50}, {"path": copy, "score": 50, "duplicate_of": first}]
+
+def test_missing_paths_are_passed_on(tmp_path):
+    assert discover([str(tmp_path / "nope.py")]).unique() == [str(tmp_path / "nope.py")]
+
+def test_batch_scores_each_content_once(tmp_path, capsys):
+    write_tree(tmp_path)
+    out = tmp_path / "scores.jsonl"
+    assert main(["batch", str(tmp_path), "-o", str(out), "-j", "1"]) == 0
+
+    rows = {json.loads(line)["path"]: json.loads(line) for line in out.read_text().splitlines()}
+    assert len(rows) == 4
+    assert rows[str(tmp_path / "flake8_pluggin" / "train_updated.py")]["score"] == 30
+    err = capsys.readouterr().err
+    assert "Found 4 files, 3 unique (1 duplicates skipped)" in err
+    assert "Scored 3 files" in err
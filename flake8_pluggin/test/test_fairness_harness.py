@@ -0,0 +1,127 @@
+import json
+import os
+import stat
+import sys
+import pytest
+from fairness_batch import main
+from fairness_harness import Harness, stage_data, stdout_metrics
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="the harness needs POSIX process control")
+
+TRAIN = '''
+rows = open("test_X.csv").read().splitlines()[1:]
+with open("submission.csv", "w") as f:
+    f.write("Actual_y,Predicted_y,sex\\n")
+    for row in rows:
+        sex = row.split(",")[1]
+        f.write(f"{sex},1,{sex}\\n")
+print("Train Accuracy:", 0.9)
+print("Disparate Impact Ratio: [0.8]")
+print("done")
+'''
+
+SCRIPTS = {
+    "good": TRAIN,
+    "broken": "raise ValueError('bad data')\n",
+    "slow": "import time\ntime.sleep(30)\n",
+    "greedy": "block = bytearray(1 << 30)\n",
+    "spinning": "while True:\n    pass\n",
+}
+
+def write_benchmark(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "test_X.csv").write_text("age,sex\n39,1\n50,0\n38,1\n")
+    for name, source in SCRIPTS.items():
+        (tmp_path / "subs" / name).mkdir(parents=True)
+        (tmp_path / "subs" / name / "train_updated.py").write_text(source)
+    return data
+
+def test_stdout_metrics():
+    assert stdout_metrics("Train Accuracy: 0.91\nDisparate Impact Ratio: [0.8]\nloss=3\nF1-score : 1e-3\n") == \
+        {"train_accuracy": 0.91, "disparate_impact_ratio": 0.8, "f1_score": 0.001}
+
+def test_data_is_staged_once_read_only(tmp_path):
+    data = write_benchmark(tmp_path)
+    staged = stage_data(str(data), str(tmp_path / "results"))
+    target = os.path.join(staged, "test_X.csv")
+    assert not os.stat(target).st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+    inode = os.stat(target).st_ino
+    stage_data(str(data), str(tmp_path / "results"))
+    assert os.stat(target).st_ino == inode
+
+def test_jobs_run_with_limits(tmp_path):
+    data = write_benchmark(tmp_path)
+    results = str(tmp_path / "results")
+    harness = Harness(results, stage_data(str(data), results), cpu_time=1, memory=512 * 1024 * 1024, timeout=3)
+    scripts = [str(tmp_path / "subs" / name / "train_updated.py") for name in SCRIPTS]
+    rows = {os.path.basename(os.path.dirname(row["path"])): row for row in harness.run_all(scripts, jobs=2)}
+
+    good = rows["good"]
+    assert good["status"] == "ok"
+    assert good["stdout_metrics"] == {"train_accuracy": 0.9, "disparate_impact_ratio": 0.8}
+    with open(good["submission"]) as f:
+        assert f.read() == "Actual_y,Predicted_y,sex\n1,1,1\n0,1,0\n1,1,1\n"
+    # the dataset links are gone, the outputs stay
+    assert sorted(os.listdir(os.path.dirname(good["submission"]))) == \
+        ["stderr.txt", "stdout.txt", "submission.csv", "train_updated.py"]
+
+    assert rows["broken"]["status"] == "failed"
+    assert rows["broken"]["error"] == "ValueError: bad data"
+    assert rows["greedy"]["status"] == "failed"
+    assert rows["greedy"]["error"] == "MemoryError"
+    assert rows["spinning"]["status"] == "killed"
+    assert rows["spinning"]["error"] in ("SIGXCPU", "SIGKILL")
+    assert rows["slow"]["status"] == "timeout"
+    assert rows["slow"]["wall_s"] < 10
+
+def test_run_command_collects_results(tmp_path, capsys):
+    pytest.importorskip("numpy")
+    data = write_benchmark(tmp_path)
+    results = tmp_path / "results"
+    assert main(["run", str(tmp_path / "subs" / "good"), str(tmp_path / "subs" / "broken"), "--results", str(results),
+                 "--data", str(data), "--timeout", "20", "--metrics"]) == 0
+
+    rows = [json.loads(line) for line in (results / "results.jsonl").read_text().splitlines()]
+    assert sorted(row["status"] for row in rows) == ["failed", "ok"]
+    good = next(row for row in rows if row["status"] == "ok")
+    assert good["runtime"]["metrics"]["accuracy"] == pytest.approx(2 / 3)
+    assert good["runtime"]["metrics"]["disparate_impact"] == 1.0
+    assert "Ran 2 submissions: 1 failed, 1 ok" in capsys.readouterr().err
+    assert os.listdir(results / "columns")
+
+def test_spawn_failures_become_error_rows(tmp_path):
+    data = write_benchmark(tmp_path)
+    results = str(tmp_path / "results")
+    harness = Harness(results, stage_data(str(data), results), python=str(tmp_path / "no-such-python"))
+    scripts = [str(tmp_path / "subs" / name / "train_updated.py") for name in ("good", "broken")]
+    rows = list(harness.run_all(scripts))
+
+    assert [row["status"] for row in rows] == ["error", "error"]
+    assert all(row["error"].startswith("FileNotFoundError") for row in rows)
+    for name in ("00001-good", "00002-broken"):
+        assert sorted(os.listdir(os.path.join(results, "jobs", name))) == ["stderr.txt", "stdout.txt", "train_updated.py"]
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="limits are applied on Linux")
+def test_limits_are_applied_to_the_child(tmp_path):
+    script = tmp_path / "limits.py"
+    script.write_text("import os, resource\nprint('cpu:', resource.getrlimit(resource.RLIMIT_CPU)[0])\n"
+                      "print('cores:', len(os.sched_getaffinity(0)))\n")
+    row = Harness(str(tmp_path / "results"), cpu_time=7).run("limits", str(script), [0])
+    assert row["stdout_metrics"] == {"cpu": 7.0, "cores": 1.0}
+
+def test_submission_deleting_its_input(tmp_path):
+    data = write_benchmark(tmp_path)
+    (tmp_path / "subs" / "tidy").mkdir()
+    (tmp_path / "subs" / "tidy" / "train_updated.py").write_text(
+        "import os\nos.remove('test_X.csv')\nraise SystemExit('no data')\n")
+    results = str(tmp_path / "results")
+    harness = Harness(results, stage_data(str(data), results))
+    scripts = [str(tmp_path / "subs" / name / "train_updated.py") for name in ("tidy", "good")]
+    rows = {os.path.basename(os.path.dirname(row["path"])): row for row in harness.run_all(scripts, jobs=1)}
+
+    assert rows["tidy"]["status"] == "failed"
+    assert rows["tidy"]["error"] == "no data"
+    assert rows["good"]["status"] == "ok"
+    # the staged copy is untouched
+    assert os.path.exists(os.path.join(results, "data", "test_X.csv"))
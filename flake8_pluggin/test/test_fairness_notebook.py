@@ -0,0 +1,79 @@
+import json
+import pytest
+import fairness_notebook
+from fairness_batch import main, score_notebook
+from fairness_notebook import iter_code_cells, strip_magics
+
+def code(source, outputs=()):
+    return {"cell_type": "code", "execution_count": 1, "metadata": {}, "outputs": list(outputs),
+            "source": source.splitlines(True)}
+
+PNG = {"output_type": "display_data", "metadata": {}, "data": {"image/png": "iVBORw0KGgo" * 20000}}
+
+def write_notebook(path):
+    cells = [
+        {"cell_type": "markdown", "metadata": {}, "source": ["# Fairness audit"]},
+        code("%matplotlib inline\nimport pandas as pd\n!pip install fairlearn\n"
+             "from fairlearn.metrics import demographic_parity_difference as dpd\n", [PNG]),
+        code("%%bash\necho not python\n"),
+        code("def broken(:\n"),
+        code("df = pd.read_csv('adult.csv')\nfiles = !ls\ndf?\ngap = dpd(y, y_pred, sensitive_features=df.sex)\n", [PNG]),
+    ]
+    path.write_text(json.dumps({"cells": cells, "metadata": {}, "nbformat": 4, "nbformat_minor": 5}))
+
+def test_strip_magics_keeps_line_numbers():
+    assert strip_magics("%time x = 1\nfiles = !ls\ndf.head?\nfor i in x:\n    !echo $i") == \
+        "pass\nfiles = None\npass\nfor i in x:\n    pass"
+    assert strip_magics("%%timeit\nx = 1") == "\nx = 1"
+    assert strip_magics("%%bash\nls") is None
+
+def test_strip_magics_leaves_continuation_lines_alone():
+    for source in ('msg = ("acc %.2f"\n       % acc)', "ok = (a\n      != b)", "ratio = a \\\n    % b",
+                   'doc = """\n!not a shell escape\n%not a magic\nhelp?\n"""',
+                   "s = 'it''s' # (\n%time x = 1"):
+        stripped = strip_magics(source)
+        compile(stripped, "cell", "exec")
+        assert stripped.count("\n") == source.count("\n")
+    assert strip_magics('msg = ("acc %.2f"\n       % acc)') == 'msg = ("acc %.2f"\n       % acc)'
+    assert strip_magics('doc = """\n!x\n"""\n!ls') == 'doc = """\n!x\n"""\npass'
+    assert strip_magics("s = 'it''s' # (\n%time x = 1") == "s = 'it''s' # (\npass"
+
+@pytest.fixture(params=["json", "ijson"])
+def reader(request, monkeypatch):
+    if request.param == "ijson":
+        pytest.importorskip("ijson")
+    else:
+        monkeypatch.setattr(fairness_notebook, "ijson", None)
+    return request.param
+
+def test_code_cells_are_streamed_with_their_numbers(tmp_path, reader):
+    write_notebook(tmp_path / "audit.ipynb")
+    with open(tmp_path / "audit.ipynb", "rb") as f:
+        cells = list(iter_code_cells(f))
+    assert [number for number, _ in cells] == [2, 3, 4, 5]
+    assert cells[3][1].startswith("df = pd.read_csv")
+
+def test_notebook_findings_map_to_cell_and_line(tmp_path, reader):
+    write_notebook(tmp_path / "audit.ipynb")
+    row = score_notebook(str(tmp_path / "audit.ipynb"))
+
+    assert row["score"] == 40
+    assert row["error"] == "cell 4: SyntaxError: invalid syntax (<unknown>, line 1)"
+    # the alias imported in cell 2 resolves the call in cell 5
+    assert row["results"]["FNA105"]["cells"] == {"demographic_parity_difference": [5, 4]}
+    assert row["results"]["FNA104"]["cells"] == {"fairlearn": [2, 4]}
+    assert (2, 2, 0, "FNA101: Found pandas, but didn’t find numpy, sklearn, datasets, +15") in row["issues"]
+
+def test_batch_scores_notebooks_and_caches_by_code(tmp_path):
+    write_notebook(tmp_path / "audit.ipynb")
+    out = tmp_path / "scores.jsonl"
+    cache = str(tmp_path / "cache.sqlite")
+    assert main(["batch", str(tmp_path), "-o", str(out), "-j", "1", "--cache", cache]) == 0
+
+    # new outputs, same code: still a cache hit
+    nb = json.loads((tmp_path / "audit.ipynb").read_text())
+    nb["cells"][1]["outputs"] = []
+    (tmp_path / "audit.ipynb").write_text(json.dumps(nb))
+    assert main(["batch", str(tmp_path), "-o", str(out), "-j", "1", "--cache", cache]) == 0
+    row = json.loads(out.read_text())
+    assert row["cached"] and row["score"] == 40
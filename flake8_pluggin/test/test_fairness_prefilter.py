@@ -0,0 +1,56 @@
+import ast
+import json
+from benchmarks.bench_fairness import generate_script
+from fairness_batch import main
+from flake8_pluggin_eval import Fairnessevaluator
+
+def score(source, prescan):
+    checker = Fairnessevaluator(ast.parse(source))
+    if prescan:
+        checker.prescan(source)
+    checker.evaluate()
+    return checker
+
+def test_prescan_gives_identical_results():
+    for seed in range(20):
+        source = generate_script(60, vocab_rate=seed / 40, seed=seed)
+        plain, scanned = score(source, False), score(source, True)
+        assert (scanned.score, scanned.issues, scanned.results) == (plain.score, plain.issues, plain.results)
+
+def test_prescan_skips_rules_and_walk():
+    checker = score("import os\nprint(os.getcwd())\n", True)
+    assert checker.skipped_rules() == Fairnessevaluator.checks
+    assert checker.nodes_visited == 0
+    assert checker.score == 0
+
+    checker = score("import pandas as pd\n", True)
+    assert checker.skipped_rules() == [c for c in Fairnessevaluator.checks if c != "data_collection"]
+    assert checker.score == 15
+
+def test_prescan_sees_identifiers_as_python_does():
+    # fullwidth letters are NFKC-normalized by the parser, "ｐandas" is the module pandas
+    assert "data_collection" in Fairnessevaluator.prefilter.scan("import ｐandas\n")
+    assert score("import ｐandas\n", True).score == 15
+    # undecodable bytes can't be scanned safely, so every rule stays on
+    assert Fairnessevaluator.prefilter.scan(b"# \xe9\nx = 1\n") == set(Fairnessevaluator.vocabularies)
+
+def test_batch_reports_skip_rate(tmp_path, capsys):
+    (tmp_path / "train.py").write_text("import pandas as pd\n")
+    (tmp_path / "util.py").write_text("def helper():\n    return 1\n")
+    assert main(["batch", str(tmp_path), "-o", str(tmp_path / "out.jsonl"), "-j", "1", "--skip-unmatched"]) == 0
+    assert "Pre-scan skipped 11 of 12 rule runs (91.7%), 1 of 2 files not parsed or syntax-checked" in capsys.readouterr().err
+
+def test_unparsed_files_are_cached_apart_from_checked_ones(tmp_path, capsys):
+    (tmp_path / "broken.py").write_text("def helper(:\n    return 1\n")
+    db = str(tmp_path / "cache.db")
+    out = str(tmp_path / "out.jsonl")
+
+    def run(*options):
+        main(["batch", str(tmp_path / "broken.py"), "-o", out, "-j", "1", "--cache", db, *options])
+        return json.loads(open(out).read())
+
+    # not syntax-checked, so the error goes unreported
+    assert run("--skip-unmatched")["error"] is None
+    assert run("--skip-unmatched")["cached"]
+    assert "Scored 1 files (1 from cache)" in capsys.readouterr().err
+    assert run()["error"].startswith("SyntaxError")
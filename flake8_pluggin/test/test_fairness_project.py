@@ -0,0 +1,68 @@
+import ast
+import json
+from fairness_batch import main, score_project
+from fairness_project import ImportIndex, ProjectEvaluator
+from flake8_pluggin_eval import Fairnessevaluator
+
+PREP = '''
+import pandas as pd
+import numpy as np, datasets
+def load():
+    return pd.get_dummies(pd.read_csv("data.csv"))
+'''
+
+TRAIN = '''
+import pandas as pd
+from pkg.prep import load
+from aif360.sklearn.metrics import disparate_impact_ratio
+di = disparate_impact_ratio(y_true, y_pred, prot_attr=prot_attr)
+'''
+
+def write_project(root):
+    (root / "pkg").mkdir()
+    (root / "pkg" / "__init__.py").write_text("")
+    (root / "pkg" / "prep.py").write_text(PREP)
+    (root / "datasets.py").write_text("rows = []\n")
+    (root / "train.py").write_text(TRAIN)
+
+def test_project_is_scored_as_one_unit(tmp_path):
+    write_project(tmp_path)
+    row = score_project(str(tmp_path))
+
+    assert row["files"] == 4
+    # pandas counted once, the local datasets.py is not a library, encoding comes from pkg/prep.py
+    assert row["results"]["FNA101"]["found"] == ["pandas", "numpy"]
+    assert row["results"]["FNA103"]["files"] == {"get_dummies": str(tmp_path / "pkg" / "prep.py")}
+    assert row["score"] == 60
+
+def test_findings_are_attributed_to_their_file(tmp_path):
+    write_project(tmp_path)
+    issues = {(path, msg.split(":")[0]): (line, msg) for path, line, col, msg in score_project(str(tmp_path))["issues"]}
+
+    assert issues[(str(tmp_path / "train.py"), "FNA104")][0] == 4
+    assert issues[(str(tmp_path / "pkg" / "prep.py"), "FNA101")] == (3, "FNA101: Found numpy, credited in train.py")
+
+def test_single_file_project_matches_file_mode():
+    tree = ast.parse(TRAIN + PREP)
+    checker = Fairnessevaluator(tree)
+    checker.evaluate()
+    project = ProjectEvaluator({"/src/train.py": tree}, "/src")
+    project.evaluate()
+
+    assert project.score == checker.score
+    assert {code: r["found"] for code, r in project.results.items()} == {code: r["found"] for code, r in checker.results.items()}
+
+def test_index_filters_project_imports():
+    index = ImportIndex(["/src/pkg/prep.py", "/src/train.py"], "/src")
+    tree = ast.parse("import pkg.prep, pandas\nfrom . import prep\nfrom prep import load\nimport sklearn")
+    for node in tree.body:
+        index.add("/src/train.py", node)
+
+    assert [ast.unparse(node) for _, node in index.external()] == ["import pandas", "import sklearn"]
+
+def test_batch_project_mode(tmp_path):
+    write_project(tmp_path)
+    out = tmp_path / "projects.jsonl"
+    assert main(["batch", "--project", str(tmp_path), "-o", str(out), "-j", "1"]) == 0
+    rows = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [row["score"] for row in rows] == [60]
@@ -0,0 +1,24 @@
+import random
+from fairness_rules import SubstringMatcher, Vocabulary, TRAINING_TERMS
+
+def naive(terms, text):
+    return [t for t in terms if t in text]
+
+def test_matcher_agrees_with_naive_substring_search():
+    terms = ["he", "she", "his", "hers", "adversarial", "reweighting", "sarial", "a"]
+    matcher = SubstringMatcher(terms)
+    rng = random.Random(0)
+    for _ in range(500):
+        text = "".join(rng.choice("ahersviltdwg_") for _ in range(rng.randint(0, 30)))
+        assert matcher.search(text) == naive(terms, text)
+
+def test_training_terms_found_in_vocabulary_order():
+    assert TRAINING_TERMS.substrings("reweighting_then_adversarial") == ["adversarial", "reweighting"]
+    assert TRAINING_TERMS.substrings("train_model") == []
+
+def test_large_rule_pack():
+    terms = [f"metric_{i}_difference" for i in range(500)]
+    vocab = Vocabulary(terms)
+    assert "metric_42_difference" in vocab
+    assert "metric_42" not in vocab
+    assert vocab.substrings("compute_metric_499_difference_now") == ["metric_499_difference"]
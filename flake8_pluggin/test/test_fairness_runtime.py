@@ -0,0 +1,201 @@
+import csv
+import json
+import random
+import pytest
+from fairness_batch import main
+
+np = pytest.importorskip("numpy")
+import fairness_runtime
+from fairness_runtime import (Intersections, SubmissionMetrics, bootstrap_intervals, confusion_counts,
+                              metrics_from_counts, subgroup_counts)
+
+def write_submission(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Actual_y", "Predicted_y", "sex"])
+        writer.writerows(rows)
+
+def random_rows(seed, n=500):
+    rng = random.Random(seed)
+    return [(rng.randint(0, 1), rng.randint(0, 1), rng.choice([0, 1, 1])) for _ in range(n)]
+
+# the same metrics worked out row by row
+def reference(rows):
+    def rate(pairs, actual=None):
+        pairs = [p for a, p in pairs if actual is None or a == actual]
+        return sum(pairs) / len(pairs)
+    priv = [(a, p) for a, p, s in rows if s == 1]
+    unpriv = [(a, p) for a, p, s in rows if s != 1]
+    err = lambda pairs: sum(a != p for a, p in pairs) / len(pairs)
+    tpr = rate(unpriv, 1) - rate(priv, 1)
+    fpr = rate(unpriv, 0) - rate(priv, 0)
+    return {
+        "accuracy": sum(a == p for a, p, _ in rows) / len(rows),
+        "disparate_impact": rate(unpriv) / rate(priv),
+        "statistical_parity_difference": rate(unpriv) - rate(priv),
+        "equal_opportunity_difference": tpr,
+        "average_odds_difference": (tpr + fpr) / 2,
+        "equalized_odds_difference": max(abs(tpr), abs(fpr)),
+        "error_rate_difference": err(unpriv) - err(priv),
+        "error_rate_ratio": err(unpriv) / err(priv),
+    }
+
+def test_metrics_match_row_by_row_reference(tmp_path):
+    rows = random_rows(1)
+    path = str(tmp_path / "submission.csv")
+    write_submission(path, rows)
+    result = SubmissionMetrics().score(path)
+
+    assert result["error"] is None
+    assert result["rows"] == 500
+    expected = reference(rows)
+    assert result["metrics"] == pytest.approx(expected)
+    assert result["groups"]["1"]["count"] == sum(s == 1 for _, _, s in rows)
+
+def test_metrics_keep_leading_axes():
+    counts = np.stack([confusion_counts(np.array([1, 0, 1, 1]), np.array([1, 0, 0, 1]), np.array([0, 0, 1, 1]), 2),
+                       confusion_counts(np.array([1, 1, 0, 0]), np.array([1, 1, 1, 0]), np.array([0, 1, 0, 1]), 2)])
+    metrics = metrics_from_counts(counts, np.array([False, True]))
+    assert metrics["accuracy"].shape == (2,)
+    assert metrics["accuracy"].tolist() == [0.75, 0.75]
+
+def test_string_labels_and_missing_groups(tmp_path):
+    path = str(tmp_path / "submission.csv")
+    with open(path, "w") as f:
+        f.write('Actual_y,Predicted_y,sex\n">50K",">50K",Male\n<=50K,>50K,Female\n')
+    result = SubmissionMetrics(privileged="Male", positive=">50K").score(path)
+    assert result["metrics"]["disparate_impact"] == 1.0
+    # nobody in the privileged group has a negative label, so the odds are undefined
+    assert result["metrics"]["average_odds_difference"] is None
+
+    result = SubmissionMetrics(privileged="Other", positive=">50K").score(path)
+    assert result["metrics"]["disparate_impact"] is None
+
+def test_unreadable_submissions_report_errors(tmp_path):
+    path = tmp_path / "submission.csv"
+    path.write_text("y,pred\n1,1\n")
+    assert SubmissionMetrics().score(str(path))["error"] == "ValueError: missing column(s) Actual_y, Predicted_y, sex"
+    path.write_text("Actual_y,Predicted_y,sex\n")
+    assert SubmissionMetrics().score(str(path))["error"] == "ValueError: no rows"
+
+def test_runtime_command_scores_every_submission(tmp_path, capsys):
+    for i in range(3):
+        (tmp_path / f"run{i}").mkdir()
+        write_submission(tmp_path / f"run{i}" / "submission.csv", random_rows(i % 2))
+    out = tmp_path / "metrics.csv"
+    assert main(["runtime", str(tmp_path), "-o", str(out), "-j", "2"]) == 0
+
+    with open(out) as f:
+        rows = {row["path"]: row for row in csv.DictReader(f)}
+    assert len(rows) == 3
+    first = rows[str(tmp_path / "run0" / "submission.csv")]
+    assert float(first["disparate_impact"]) == pytest.approx(reference(random_rows(0))["disparate_impact"])
+    assert rows[str(tmp_path / "run2" / "submission.csv")]["disparate_impact"] == first["disparate_impact"]
+    err = capsys.readouterr().err
+    assert "Found 3 files, 2 unique" in err
+    assert "Computed metrics for 2 submissions (0 unreadable)" in err
+
+    assert main(["runtime", str(tmp_path / "run1" / "submission.csv"), "-j", "1"]) == 0
+    row = json.loads(capsys.readouterr().out)
+    assert set(row["groups"]) == {"0", "1"}
+
+def test_bootstrap_intervals_are_reproducible_and_bracket_the_estimate(tmp_path):
+    path = str(tmp_path / "submission.csv")
+    write_submission(path, random_rows(3, 300))
+    result = SubmissionMetrics(bootstrap=500, seed=7).score(path)
+
+    for name, (low, high) in result["intervals"].items():
+        assert low <= result["metrics"][name] <= high, name
+    assert SubmissionMetrics(bootstrap=500, seed=7).score(path)["intervals"] == result["intervals"]
+    assert SubmissionMetrics(bootstrap=500, seed=8).score(path)["intervals"] != result["intervals"]
+    wider = SubmissionMetrics(bootstrap=500, seed=7, confidence=0.99).score(path)["intervals"]
+    assert wider["accuracy"][0] <= result["intervals"]["accuracy"][0]
+
+def test_bootstrap_chunking_does_not_change_draws():
+    counts = np.array([[[40, 10], [5, 45]], [[30, 20], [15, 35]]])
+    privileged = np.array([False, True])
+    whole = bootstrap_intervals(counts, privileged, 200, seed=1)
+    assert bootstrap_intervals(counts, privileged, 200, seed=1, chunk=7) == whole
+
+def test_bootstrap_matches_row_resampling_spread():
+    rows = np.array(random_rows(5, 400))
+    counts = confusion_counts(rows[:, 0], rows[:, 1], rows[:, 2], 2)
+    low, high = bootstrap_intervals(counts, np.array([False, True]), 2000, seed=0)["accuracy"]
+    rng = np.random.default_rng(0)
+    correct = rows[:, 0] == rows[:, 1]
+    accuracies = [correct[rng.integers(0, len(rows), len(rows))].mean() for _ in range(2000)]
+    assert low == pytest.approx(np.percentile(accuracies, 2.5), abs=0.01)
+    assert high == pytest.approx(np.percentile(accuracies, 97.5), abs=0.01)
+
+def test_runtime_command_writes_intervals(tmp_path):
+    write_submission(tmp_path / "submission.csv", random_rows(0))
+    out = tmp_path / "metrics.csv"
+    assert main(["runtime", str(tmp_path), "-o", str(out), "-j", "1", "--bootstrap", "100", "--seed", "3"]) == 0
+    with open(out) as f:
+        row = next(csv.DictReader(f))
+    assert float(row["disparate_impact_low"]) <= float(row["disparate_impact"]) <= float(row["disparate_impact_high"])
+
+def write_intersectional(tmp_path, n=2400):
+    rng = random.Random(11)
+    rows = [(rng.randint(0, 1), rng.randint(0, 1), rng.choice([0, 1]), rng.choice(["White", "Black", "Asian"]),
+             rng.randint(17, 80)) for _ in range(n)]
+    write_submission(tmp_path / "submission.csv", [row[:3] for row in rows])
+    with open(tmp_path / "test_X.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["age", "race", "sex"])
+        writer.writerows((age, race, sex) for _, _, sex, race, age in rows)
+    return rows
+
+def test_intersections_match_groupby(tmp_path):
+    rows = write_intersectional(tmp_path)
+    intersections = Intersections(["sex", "race", "age"], buckets={"age": [25, 45, 65]}, features="test_X.csv",
+                                  min_support=60)
+    result = SubmissionMetrics(intersections=intersections).score(str(tmp_path / "submission.csv"))
+
+    assert list(result["intersections"]) == ["sex", "race", "age", "sex,race", "sex,age", "race,age", "sex,race,age"]
+    age = lambda a: "<25" if a < 25 else "25-45" if a < 45 else "45-65" if a < 65 else ">=65"
+    groups = {}
+    for actual, predicted, sex, race, a in rows:
+        groups.setdefault(f"{sex},{race},{age(a)}", []).append((actual, predicted))
+    combined = result["intersections"]["sex,race,age"]
+    supported = {key: pairs for key, pairs in groups.items() if len(pairs) >= 60}
+    assert 0 < len(supported) < len(groups)
+    assert set(combined["subgroups"]) == set(supported)
+    assert combined["unsupported"] == len(groups) - len(supported)
+    rates = {key: sum(p for _, p in pairs) / len(pairs) for key, pairs in supported.items()}
+    for key, rate in rates.items():
+        assert combined["subgroups"][key]["selection_rate"] == pytest.approx(rate)
+    assert combined["metrics"]["disparate_impact"] == pytest.approx(min(rates.values()) / max(rates.values()))
+    assert combined["metrics"]["statistical_parity_difference"] == pytest.approx(max(rates.values()) - min(rates.values()))
+
+    intersections.min_support = 10000
+    result = SubmissionMetrics(intersections=intersections).score(str(tmp_path / "submission.csv"))
+    assert result["intersections"]["sex"]["metrics"]["disparate_impact"] is None
+    assert result["intersections"]["sex"]["unsupported"] == 2
+
+def test_sparse_subgroup_ids_match_dense(monkeypatch):
+    rng = np.random.default_rng(0)
+    actual, predicted = rng.integers(0, 2, 1000), rng.integers(0, 2, 1000)
+    codes = [rng.integers(0, 7, 1000), rng.integers(0, 50, 1000), rng.integers(0, 3, 1000)]
+    dense = subgroup_counts(actual, predicted, codes, [7, 50, 3])
+    monkeypatch.setattr(fairness_runtime, "DENSE_SUBGROUPS", 1)
+    sparse = subgroup_counts(actual, predicted, codes, [7, 50, 3])
+    assert (dense[0] == sparse[0]).all() and (dense[1] == sparse[1]).all()
+    # more combinations than an int64 can number
+    wide = subgroup_counts(actual, predicted, codes * 8, [7, 50, 3] * 8)
+    assert wide[0].sum() == 1000
+    assert len(wide[0]) == len(dense[0])
+
+def test_intersections_report_unreadable_features(tmp_path):
+    write_intersectional(tmp_path)
+    (tmp_path / "test_X.csv").write_text("age,race,sex\n30,White,1\n")
+    intersections = Intersections(["sex", "race"], features="test_X.csv")
+    result = SubmissionMetrics(intersections=intersections).score(str(tmp_path / "submission.csv"))
+    assert result["error"] == "ValueError: test_X.csv has 1 rows, the submission 2400"
+
+def test_runtime_command_intersections(tmp_path, capsys):
+    write_intersectional(tmp_path)
+    assert main(["runtime", str(tmp_path / "submission.csv"), "-j", "1", "--features", "test_X.csv",
+                 "--intersect", "sex", "--intersect", "age", "--bucket", "age=40", "--max-order", "2"]) == 0
+    row = json.loads(capsys.readouterr().out)
+    assert set(row["intersections"]["sex,age"]["subgroups"]) == {"0,<40", "0,>=40", "1,<40", "1,>=40"}
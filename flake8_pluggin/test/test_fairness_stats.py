@@ -0,0 +1,43 @@
+import ast
+import json
+import os
+import fairness_stats
+from flake8_pluggin_eval import Fairnessevaluator
+
+SOURCE = '''
+import pandas as pd
+from aif360.sklearn.metrics import disparate_impact_ratio
+di = disparate_impact_ratio(y_true, y_pred, prot_attr=prot_attr)
+'''
+
+def test_instrumented_run_matches_plain_run():
+    plain = Fairnessevaluator(ast.parse(SOURCE))
+    plain.evaluate()
+    checker = Fairnessevaluator(ast.parse(SOURCE))
+    checker.stats = fairness_stats.RuleStats()
+    checker.evaluate()
+
+    assert checker.issues == plain.issues
+    assert checker.stats.nodes == plain.nodes_visited
+    assert checker.stats.rules["data_collection"] == {
+        "time_s": checker.stats.rules["data_collection"]["time_s"], "nodes": 2, "matches": 1, "skipped": 0}
+    assert checker.stats.rules["evaluation"]["matches"] == 1
+
+def test_stats_off_by_default():
+    assert Fairnessevaluator(ast.parse(SOURCE)).stats is None
+
+def test_report_merges_spools_from_several_processes(tmp_path):
+    path = str(tmp_path / "stats.json")
+    os.makedirs(fairness_stats.spool_dir(path))
+    entry = {"file": "a.py", "cached": False, "nodes": 10, "walk_s": 0.5, "total_s": 1.0,
+             "rules": {"evaluation": {"time_s": 0.25, "nodes": 3, "matches": 1}}}
+    for pid, name in ((101, "a.py"), (202, "b.py")):
+        with open(os.path.join(fairness_stats.spool_dir(path), f"{pid}.jsonl"), "w") as f:
+            f.write(json.dumps(dict(entry, file=name)) + "\n")
+
+    report = fairness_stats.write_report(path)
+    assert [e["file"] for e in report["files"]] == ["a.py", "b.py"]
+    assert report["total"]["files"] == 2
+    assert report["total"]["rules"]["evaluation"] == {"time_s": 0.5, "nodes": 6, "matches": 2, "skipped": 0}
+    assert json.load(open(path)) == report
+    assert not os.path.exists(fairness_stats.spool_dir(path))
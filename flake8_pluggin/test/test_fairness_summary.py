@@ -0,0 +1,60 @@
+import ast
+import csv
+import json
+import os
+import subprocess
+import sys
+import pytest
+from fairness_summary import ScoreSummary, percentile
+from flake8_pluggin_eval import Fairnessevaluator
+
+def test_score_is_reported_instead_of_printed(capsys):
+    checker = Fairnessevaluator(ast.parse("import pandas as pd"))
+    issues = list(checker.run())
+
+    assert issues[-1][2] == "FNA100: Fairness Score: 15"
+    assert capsys.readouterr().out == ""
+
+def test_percentile_interpolates():
+    assert percentile([0, 10, 20, 30], 50) == 15
+    assert percentile([5], 90) == 5
+    assert percentile([], 50) is None
+
+def test_summary_aggregates_scores_and_hit_rates(tmp_path):
+    summary = ScoreSummary()
+    summary.add_score("a.py", 50)
+    summary.add_hit("a.py", "FNA101")
+    summary.add_hit("a.py", "FNA105")
+    summary.add_score("b.py", 15)
+    summary.add_hit("b.py", "FNA101")
+    result = summary.summary()
+
+    assert result["aggregate"]["files"] == 2
+    assert result["aggregate"]["mean"] == 32.5
+    assert result["aggregate"]["hit_rates"]["FNA101"] == 1.0
+    assert result["aggregate"]["hit_rates"]["FNA105"] == 0.5
+    assert result["files"][0] == {"path": "a.py", "score": 50, "hits": ["FNA101", "FNA105"]}
+
+    path = str(tmp_path / "summary.csv")
+    summary.write(path)
+    with open(path) as f:
+        rows = list(csv.reader(f))
+    assert rows[0][:3] == ["path", "score", "FNA101"]
+    assert rows[3][:2] == ["(mean)", "32.5"]
+
+def test_flake8_formatter_collects_every_job(tmp_path):
+    pytest.importorskip("flake8")
+    for i in range(4):
+        (tmp_path / f"script_{i}.py").write_text("import pandas as pd\n" * (i + 1))
+    report = tmp_path / "summary.json"
+    proc = subprocess.run(
+        [sys.executable, "-m", "flake8", "--select", "FNA", "--format", "fna-summary", "-j", "2",
+         "--fna-report", str(report), str(tmp_path)],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+    if "fna-summary" in proc.stderr:
+        pytest.skip("formatter entry point is not installed")
+
+    assert "FNA100: Fairness Score: 15" in proc.stdout
+    summary = json.loads(report.read_text())
+    assert summary["aggregate"]["files"] == 4
+    assert summary["aggregate"]["hit_rates"]["FNA101"] == 1.0
@@ -0,0 +1,81 @@
+import ast
+import textwrap
+from fairness_symbols import SymbolTable
+from flake8_pluggin_eval import Fairnessevaluator
+
+def evaluate(code):
+    checker = Fairnessevaluator(ast.parse(textwrap.dedent(code)))
+    checker.evaluate()
+    return checker
+
+def test_aliased_import_is_resolved():
+    checker = evaluate('''
+        from aif360.sklearn.metrics import disparate_impact_ratio as dir_
+        di = dir_(y_true, y_pred, prot_attr=prot_attr)
+    ''')
+    assert checker.results["FNA105"]["found"] == ["disparate_impact_ratio"]
+    assert checker.results["FNA107"]["found"] == ["disparate_impact_ratio"]
+    assert checker.score == 35
+
+def test_module_alias_attribute_chain():
+    checker = evaluate('''
+        import fairlearn.metrics as fm
+        gap = fm.demographic_parity_difference(y_true, y_pred, sensitive_features=sex)
+    ''')
+    assert checker.results["FNA104"]["found"] == ["fairlearn"]
+    assert checker.results["FNA105"]["found"] == ["demographic_parity_difference"]
+
+def test_import_below_the_call_still_resolves():
+    # the walk is breadth first, so the nested import is recorded after the module-level call
+    checker = evaluate('''
+        if True:
+            with ctx():
+                from fairlearn.metrics import equalized_odds_difference as eod
+        gap = eod(y_true, y_pred, sensitive_features=sex)
+    ''')
+    assert checker.results["FNA105"]["found"] == ["equalized_odds_difference"]
+
+def test_identifier_rules_see_through_aliases():
+    checker = evaluate('''
+        from sklearn.preprocessing import OneHotEncoder as OHE
+        from pandas import get_dummies as dummies
+        encoded = OHE().fit_transform(frame)
+        flags = dummies(frame["sex"])
+    ''')
+    assert sorted(checker.results["FNA103"]["found"]) == ["OneHotEncoder", "get_dummies"]
+
+def test_symbol_table_resolves_aliases():
+    table = SymbolTable()
+    tree = ast.parse("import fairlearn.metrics as fm\nimport numpy\nfrom .utils import audit as a\nfrom x import *")
+    for node in tree.body:
+        table.add_import(node)
+
+    assert table.qualify("fm.MetricFrame") == "fairlearn.metrics.MetricFrame"
+    assert table.qualify("numpy.linalg.norm") == "numpy.linalg.norm"
+    assert table.qualify("a") == ".utils.audit"
+    assert table.qualify("pd.read_csv") == "pd.read_csv"
+    assert table.resolve("a") == "audit"
+    assert table.resolve("pd") == "pd"
+
+    def call(source):
+        return table.call_names(ast.parse(source).body[0].value)
+
+    assert call("a(1)") == (("a", "audit"), ".utils.audit")
+    assert call("fm.demographic_parity_difference(y)") == \
+        (("demographic_parity_difference",), "fairlearn.metrics.demographic_parity_difference")
+    # a method on a local object can't be qualified further
+    assert call("model.fit(X, y)") == (("fit",), "model.fit")
+    assert call("make()(X)") == ((None,), None)
+
+def test_segments_of_recorded_nodes():
+    table = SymbolTable()
+    dispatch = table.recorders([ast.Name, ast.Attribute, ast.Call])
+    for label, source in (("first", "import pandas as pd\nx = pd.read_csv(path)"), ("second", "y = x.dropna()")):
+        table.mark(label)
+        for node in ast.walk(ast.parse(source)):
+            if type(node) in dispatch:
+                dispatch[type(node)](node)
+    assert table.segment(table.imports[0]) == "first"
+    assert [table.segment(node) for node in table.defs_and_calls] == ["first", "second"]
+    assert table.segment(table.identifiers()["dropna"]) == "second"
+    assert table.segment(ast.Name("unrecorded")) is None
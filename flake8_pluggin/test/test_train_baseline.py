@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+pytest.importorskip("aif360")
+import train_baseline
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def write_split(directory, labels=(0, 1), sexes=(0, 1)):
+    rng = np.random.default_rng(0)
+    for part, rows in (("train", 80), ("test", 30)):
+        sex = rng.integers(0, 2, rows)
+        age = rng.integers(18, 70, rows)
+        hours = rng.integers(10, 60, rows)
+        label = (age + hours + 10 * sex + rng.integers(0, 30, rows) > 90).astype(int)
+        with open(os.path.join(directory, f"{part}_X.csv"), "w") as f:
+            f.write("age,hours,sex\n")
+            f.writelines(f"{a},{h},{sexes[s]}\n" for a, h, s in zip(age, hours, sex))
+        with open(os.path.join(directory, f"{part}_y.csv"), "w") as f:
+            f.write("income\n")
+            f.writelines(f"{labels[y]}\n" for y in label)
+
+def metrics(text):
+    return [line for line in text.splitlines() if line.startswith(("Train Accuracy", "Disparate Impact", "Test Accuracy"))]
+
+def test_same_results_as_the_reference(tmp_path, capsys):
+    pytest.importorskip("ucimlrepo")
+    write_split(str(tmp_path))
+    reference = subprocess.run([sys.executable, os.path.join(HERE, "..", "train_updated.py")], cwd=tmp_path,
+                               capture_output=True, text=True, check=True)
+    expected = (tmp_path / "submission.csv").read_text()
+
+    out = str(tmp_path / "fast.csv")
+    for cache in ("", str(tmp_path / "cache"), str(tmp_path / "cache")):
+        train_baseline.main(["--data", str(tmp_path), "--search", "grid", "--jobs", "1", "--cache", cache,
+                             "--output", out])
+        assert metrics(capsys.readouterr().out) == metrics(reference.stdout)
+        with open(out) as f:
+            assert f.read() == expected
+
+def test_text_columns_are_cached_as_mappable_arrays(tmp_path):
+    write_split(str(tmp_path), labels=("<=50K", ">50K"), sexes=("Female", "Male"))
+    cache = str(tmp_path / "cache")
+    first = train_baseline.load(str(tmp_path), cache)
+    again = train_baseline.load(str(tmp_path), cache)
+    assert all(isinstance(array, np.memmap) for array in again)
+    assert set(again[1]) == {"<=50K", ">50K"}
+    assert again[4].tolist() == first[4].tolist()
+    assert set(again[4]) == {"Female", "Male"}
+    assert again[2].dtype == np.float64
+    # one entry, no staging directories left behind
+    assert len(os.listdir(cache)) == 1